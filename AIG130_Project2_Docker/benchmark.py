@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Scaling benchmarks of the pipeline stages on synthetic data
+
+Runs load_bitcoin_data, validate_data, create_features, train_models,
+predict_all, evaluate_models and generate_all_plots on synthetic data of
+several sizes, recording wall time, CPU time and peak RSS of every stage
+(and of every model fit/predict call) with the run profiler. Each size
+runs in a fresh interpreter, so memory held by one size never inflates the
+next, and a size that runs out of memory fails on its own.
+
+Results are written to results/benchmark.json and compared with a stored
+baseline; the script exits with status 1 if any stage got slower or
+heavier than the baseline by more than the threshold. Everything runs
+offline on synthetic data.
+
+Usage:
+    python benchmark.py --sizes 25000 250000 --save-baseline   # record a baseline
+    python benchmark.py --sizes 25000 250000                   # compare against it
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import config
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    params = config.BENCHMARK_PARAMS
+    parser = argparse.ArgumentParser(description='Benchmark the pipeline stages across dataset sizes')
+    parser.add_argument('--sizes', type=int, nargs='+', default=params['sizes'],
+                        help='Rows of synthetic data per run')
+    parser.add_argument('--repeats', type=int, default=params['repeats'],
+                        help='Runs per size; the fastest time and lowest memory are kept')
+    parser.add_argument('--threshold', type=float, default=params['threshold'],
+                        help='Relative increase over the baseline that fails the benchmark')
+    parser.add_argument('--baseline', type=str, default=str(config.BENCHMARK_BASELINE_FILE),
+                        help='Baseline JSON file')
+    parser.add_argument('--output', type=str, default=str(config.RESULTS_DIR / "benchmark.json"),
+                        help='Where to write the results')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='Store the results as the baseline (sizes not run are kept) instead of comparing')
+    parser.add_argument('--verbose', action='store_true', help='Show the pipeline logs')
+    parser.add_argument('--run-size', type=int, help=argparse.SUPPRESS)  # Worker mode: one run of one size
+    return parser.parse_args()
+
+
+def run_size(n_rows: int, output_path: Path, verbose: bool = False):
+    """
+    Run every benchmarked stage once on synthetic data and write the profile
+
+    Args:
+        n_rows: Rows of synthetic data
+        output_path: JSON file receiving {section name: measurements}
+        verbose: Keep the pipeline's INFO logs
+    """
+    import logging
+    from src.data_loader import generate_synthetic_bitcoin_data, load_bitcoin_data, validate_data
+    from src.feature_engineering import (
+        create_features,
+        get_feature_columns,
+        split_features_target,
+        chronological_train_test_split
+    )
+    from src.models import ModelTrainer
+    from src.evaluate import evaluate_models
+    from src.visualization import generate_all_plots
+    from src.profiler import RunProfiler, profiled
+
+    if not verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+    os.environ['USE_S3'] = 'false'  # Always read the local synthetic file
+
+    with tempfile.TemporaryDirectory(prefix="benchmark_") as work_dir:
+        work_dir = Path(work_dir)
+        data_path = work_dir / "data.csv"
+        # Minute bars: 25M hourly bars would run past the pandas Timestamp range
+        generate_synthetic_bitcoin_data(n_rows, seed=config.RANDOM_SEED, freq='min').to_csv(data_path)
+
+        profiler = RunProfiler().activate()
+        with profiled('load_bitcoin_data', 'stage'):
+            df = load_bitcoin_data(data_path)
+        with profiled('validate_data', 'stage'):
+            validate_data(df)
+        with profiled('create_features', 'stage'):
+            df_features = create_features(
+                df,
+                ma_windows=config.MOVING_AVERAGE_WINDOWS,
+                lag_periods=config.LAG_FEATURES,
+                horizons=config.FORECAST_HORIZONS
+            )
+            feature_cols = get_feature_columns(df_features)
+            X, y = split_features_target(df_features, feature_cols, horizons=config.FORECAST_HORIZONS)
+            X_train, X_test, y_train, y_test = chronological_train_test_split(
+                X, y, split_ratio=config.TRAIN_TEST_SPLIT_RATIO
+            )
+        with profiled('train_models', 'stage'):
+            trainer = ModelTrainer(config.MODEL_PARAMS)
+            trainer.initialize_models()
+            trainer.fit_scaler(X_train)
+            trainer.train_models(X_train, y_train)
+        with profiled('predict_all', 'stage'):
+            predictions_dict = trainer.predict_all(X_test)
+        with profiled('evaluate_models', 'stage'):
+            comparison_df = evaluate_models(predictions_dict, y_test, horizons=config.FORECAST_HORIZONS)
+        with profiled('generate_all_plots', 'stage'):
+            y_test_primary = y_test if y_test.ndim == 1 else y_test.iloc[:, 0]
+            predictions_primary = {
+                name: pred if pred.ndim == 1 else pred[:, 0] for name, pred in predictions_dict.items()
+            }
+            generate_all_plots(
+                comparison_df, y_test_primary, predictions_primary, trainer.models, feature_cols,
+                work_dir / "plots", max_points=config.PLOT_MAX_POINTS
+            )
+        report = profiler.finish(work_dir / "profile.json")
+
+    sections = {
+        entry['name']: {key: entry[key] for key in ('kind', 'calls', 'wall_s', 'cpu_s', 'peak_rss_mb',
+                                                    'child_peak_rss_mb')}
+        for entry in report['sections']
+    }
+    with open(output_path, 'w') as f:
+        json.dump(sections, f)
+
+
+def benchmark_size(n_rows: int, repeats: int, verbose: bool) -> dict:
+    """
+    Benchmark one size in fresh interpreters, keeping the best of the repeats
+
+    Returns:
+        Dictionary of {section name: measurements}, or {'error': message} if a run failed
+    """
+    best = {}
+    for _ in range(repeats):
+        with tempfile.TemporaryDirectory(prefix="benchmark_") as tmp_dir:
+            output_path = Path(tmp_dir) / "sections.json"
+            command = [sys.executable, __file__, '--run-size', str(n_rows), '--output', str(output_path)]
+            if verbose:
+                command.append('--verbose')
+            returncode = subprocess.run(command).returncode
+            if returncode != 0:
+                # e.g. -9 when the kernel's OOM killer ends the run
+                return {'error': f"run exited with status {returncode}"}
+            with open(output_path) as f:
+                sections = json.load(f)
+
+        for name, measured in sections.items():
+            if name not in best:
+                best[name] = measured
+                continue
+            for key in ('wall_s', 'cpu_s', 'peak_rss_mb', 'child_peak_rss_mb'):
+                if measured[key] is not None:
+                    kept = best[name][key]
+                    best[name][key] = measured[key] if kept is None else min(kept, measured[key])
+    return best
+
+
+def machine_info() -> dict:
+    """Describe the machine, since timings only compare on the same hardware"""
+    return {'platform': platform.platform(), 'python': platform.python_version(), 'cpus': os.cpu_count()}
+
+
+def find_regressions(results: dict, baseline: dict, threshold: float) -> list:
+    """
+    Compare wall time and peak RSS (own and of child processes) of every section with the baseline
+
+    Increases below BENCHMARK_PARAMS['min_wall_s'] / ['min_rss_mb'] are
+    ignored, so millisecond-scale stages do not fail on noise.
+
+    Returns:
+        List of (size, section, metric, baseline value, current value)
+    """
+    floors = {
+        'wall_s': config.BENCHMARK_PARAMS['min_wall_s'],
+        'peak_rss_mb': config.BENCHMARK_PARAMS['min_rss_mb'],
+        'child_peak_rss_mb': config.BENCHMARK_PARAMS['min_rss_mb']
+    }
+    regressions = []
+    for size, sections in results['sizes'].items():
+        baseline_sections = baseline['sizes'].get(size)
+        if baseline_sections is None:
+            continue
+        if 'error' in sections:
+            if 'error' not in baseline_sections:
+                regressions.append((size, 'run', sections['error'], None, None))
+            continue
+        for name, current in sections.items():
+            previous = baseline_sections.get(name)
+            if previous is None:
+                continue
+            for metric, floor in floors.items():
+                old, new = previous.get(metric), current.get(metric)
+                if old is None or new is None:
+                    continue
+                if new > old * (1 + threshold) and new - old > floor:
+                    regressions.append((size, name, metric, old, new))
+    return regressions
+
+
+def print_results(results: dict, baseline: dict):
+    """Print every stage per size, with the change against the baseline wall time"""
+    for size, sections in results['sizes'].items():
+        print("=" * 70)
+        print(f"{int(size):,} ROWS")
+        print("=" * 70)
+        if 'error' in sections:
+            print(f"FAILED: {sections['error']}")
+            continue
+        print(f"{'Section':<28} {'Wall (s)':>10} {'CPU (s)':>10} {'Peak RSS (MB)':>14} {'vs baseline':>12}")
+        baseline_sections = baseline.get('sizes', {}).get(size, {})
+        for name, measured in sections.items():
+            peak = f"{measured['peak_rss_mb']:,.0f}" if measured['peak_rss_mb'] is not None else "-"
+            previous = baseline_sections.get(name, {}).get('wall_s')
+            change = f"{measured['wall_s'] / previous - 1:+.0%}" if previous else "-"
+            label = name if measured['kind'] == 'stage' else f"  {name}"
+            print(f"{label[:28]:<28} {measured['wall_s']:>10.2f} {measured['cpu_s']:>10.2f} {peak:>14} {change:>12}")
+
+
+def main():
+    args = parse_arguments()
+    if args.run_size is not None:
+        run_size(args.run_size, Path(args.output), args.verbose)
+        return
+
+    results = {'machine': machine_info(), 'sizes': {}}
+    for n_rows in args.sizes:
+        print(f"Benchmarking {n_rows:,} rows...", flush=True)
+        results['sizes'][str(n_rows)] = benchmark_size(n_rows, args.repeats, args.verbose)
+
+    output_path = Path(args.output)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    baseline_path = Path(args.baseline)
+    baseline = {'sizes': {}}
+    if baseline_path.exists():
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+
+    if args.save_baseline:
+        print_results(results, {})
+        baseline['machine'] = results['machine']
+        baseline['sizes'].update(results['sizes'])
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(baseline_path, 'w') as f:
+            json.dump(baseline, f, indent=2)
+        print("=" * 70)
+        print(f"Baseline saved to {baseline_path}")
+        return
+
+    print_results(results, baseline)
+    print("=" * 70)
+    if not baseline['sizes']:
+        print(f"No baseline at {baseline_path}; run with --save-baseline to record one")
+        return
+    if baseline.get('machine') != results['machine']:
+        print(f"WARNING: baseline was recorded on {baseline.get('machine')}; timings may not be comparable")
+
+    regressions = find_regressions(results, baseline, args.threshold)
+    if not regressions:
+        print(f"No regressions beyond {args.threshold:.0%} of the baseline")
+        return
+
+    print(f"REGRESSIONS (more than {args.threshold:.0%} above the baseline):")
+    for size, name, metric, old, new in regressions:
+        if old is None:
+            print(f"  {int(size):>12,} rows  {name}: {metric}")
+        else:
+            print(f"  {int(size):>12,} rows  {name:<28} {metric}: {old:,.2f} -> {new:,.2f} ({new / old - 1:+.0%})")
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 """
 Configuration settings for Bitcoin Price Prediction Pipeline
 """
+import json
 import os
 from pathlib import Path
 
@@ -11,9 +12,12 @@ MODELS_DIR = BASE_DIR / "models"
 RESULTS_DIR = BASE_DIR / "results"
 PLOTS_DIR = RESULTS_DIR / "plots"
 
-# Create directories if they don't exist
-for directory in [DATA_DIR, MODELS_DIR, RESULTS_DIR, PLOTS_DIR]:
-    directory.mkdir(parents=True, exist_ok=True)
+
+def ensure_directories():
+    """Create the data, model and results directories (not done at import time)"""
+    for directory in [DATA_DIR, MODELS_DIR, RESULTS_DIR, PLOTS_DIR]:
+        directory.mkdir(parents=True, exist_ok=True)
+
 
 # Data settings
 DATA_FILE = "btc_1h_data_2018_to_2025.csv"
@@ -29,9 +33,54 @@ AWS_REGION = os.environ.get("AWS_DEFAULT_REGION", "us-east-1")
 MOVING_AVERAGE_WINDOWS = [5, 10]
 LAG_FEATURES = [1, 2]
 
+# Forecast horizons in hours; one shared fit per model serves all of them.
+# The first horizon is the primary one used for plots and model ranking.
+FORECAST_HORIZONS = [1, 4, 24]
+
 # Model settings
 TRAIN_TEST_SPLIT_RATIO = 0.8
 
+# Stacked ensemble settings (meta-model on chronological out-of-fold predictions)
+STACKING_PARAMS = {
+    "enabled": True,
+    "n_splits": 3
+}
+STACKING_CACHE_DIR = MODELS_DIR / "stacking"  # Cached out-of-fold predictions
+
+# Knowledge distillation settings (compact student of a slower teacher model)
+DISTILLATION_PARAMS = {
+    "enabled": True,
+    "teacher": "Random Forest",
+    "max_depth": 8,
+    "synthetic_ratio": 1.0,  # Jittered rows per training row
+    "jitter": 0.1  # Noise std in scaled feature units
+}
+
+# Early-exit Random Forest inference (stop evaluating trees once a row's mean is certain)
+EARLY_EXIT_PARAMS = {
+    "block_size": 10,  # Trees evaluated per block
+    "min_trees": 20,  # Never stop before this many trees
+    "tolerance_pct": 0.5,  # Stop when the CI half-width is below this % of the predicted price
+    "z": 1.96  # 95% confidence interval
+}
+EARLY_EXIT_LIVE = os.environ.get("EARLY_EXIT", "false").lower() == "true"  # Use in inference/serve modes
+
+# Prediction interval settings (spread across Random Forest trees)
+INTERVAL_QUANTILES = [0.05, 0.95]
+INTERVAL_CHUNK_SIZE = 10000  # Rows per chunk; memory is n_trees x chunk size
+
+# Batch inference settings
+PREDICTIONS_DIR = RESULTS_DIR / "predictions"
+INFERENCE_CHUNK_SIZE = 50000  # Rows scored per chunk (bounds memory usage)
+
+# Prediction server settings
+SERVING_HOST = os.environ.get("SERVING_HOST", "127.0.0.1")
+SERVING_PORT = int(os.environ.get("SERVING_PORT", "8080"))
+SERVING_MAX_BATCH_SIZE = 256  # Max rows coalesced into one model call
+SERVING_MAX_WAIT_MS = 2.0  # Max time the first request waits for others to join its batch
+# Models scored by the inference and serve modes, comma-separated (empty = all, e.g. "Distilled Tree" for low latency)
+SERVING_MODELS = [name.strip() for name in os.environ.get("SERVING_MODELS", "").split(",") if name.strip()] or None
+
 # Model hyperparameters
 MODEL_PARAMS = {
     "decision_tree": {
@@ -49,10 +98,110 @@ MODEL_PARAMS = {
     "linear_regression": {}
 }
 
+# Cost micro-benchmark of every model on the test split (ModelTrainer.benchmark_models)
+MODEL_BENCHMARK_PARAMS = {
+    "n_single_rows": 200,  # Rows predicted one at a time for the p50/p99 latency
+    "batch_repeats": 3  # Timed predictions over the whole test split; the fastest counts
+}
+
+# Weights of the combined cost/accuracy ranking in find_best_models; each column is
+# min-max scaled across models (0 = best, 1 = worst) before weighting
+MODEL_SELECTION_OBJECTIVE = {
+    "RMSE": 1.0,
+    "p99 Latency (ms)": 0.25,
+    "Memory (MB)": 0.1
+}
+
+# Hyperparameter tuning settings (successive halving / Hyperband on chronological folds)
+TUNING_PARAMS = {
+    "n_splits": 3,
+    "eta": 3,  # Keep the best 1/eta configs and multiply the budget by eta per rung
+    "max_rungs": 3,  # Most aggressive bracket starts at budget eta^-(max_rungs - 1)
+    "hyperband": True,
+    "n_workers": None  # Worker processes (None = CPU count)
+}
+TUNING_SEARCH_SPACE = {
+    "decision_tree": {
+        "max_depth": [4, 6, 8, 10, 15, None],
+        "min_samples_leaf": [1, 5, 10, 20, 50]
+    },
+    "random_forest": {
+        "max_depth": [6, 10, 15, None],
+        "min_samples_split": [2, 10, 20, 50],
+        "min_samples_leaf": [1, 5, 10, 20],
+        "max_features": [1.0, 0.5, "sqrt"]
+    }
+}
+
+# Tuned hyperparameters written by `main.py --mode tune` override the defaults above
+TUNED_PARAMS_FILE = MODELS_DIR / "tuned_params.json"
+if TUNED_PARAMS_FILE.exists():
+    with open(TUNED_PARAMS_FILE) as f:
+        for model_key, tuned in json.load(f).items():
+            MODEL_PARAMS.setdefault(model_key, {}).update(tuned)
+
+# Moving-block bootstrap confidence intervals for the evaluation metrics
+BOOTSTRAP_PARAMS = {
+    "n_replicates": 2000,
+    "block_length": None,  # Rows per block (None = n ** (1/3))
+    "confidence": 0.95,
+    "chunk_bytes": 64 * 2 ** 20,  # Memory budget per vectorized chunk of replicates (per worker)
+    "n_jobs": -1
+}
+
+# Permutation feature importance on the test split
+PERMUTATION_IMPORTANCE_PARAMS = {
+    "n_repeats": 10,  # Shuffles per feature
+    "confidence": 0.95,
+    "n_jobs": -1
+}
+
+# Drift monitoring: histogram sketches of features and predictions
+DRIFT_PARAMS = {
+    "n_bins": 20,  # Equal-frequency bins per column on the training data
+    "psi_threshold": 0.2  # PSI above which a column counts as drifted
+}
+
+# Prometheus-format run metrics: a textfile-collector file written at the end of every run,
+# and an optional local /metrics endpoint while the run lasts (serve mode always has one)
+METRICS_TEXTFILE = Path(os.environ.get("METRICS_TEXTFILE", RESULTS_DIR / "metrics.prom"))
+METRICS_PORT = int(os.environ["METRICS_PORT"]) if os.environ.get("METRICS_PORT") else None
+
+# Stage checkpoints of the training pipeline (--resume / --from-stage)
+CHECKPOINT_DIR = Path(os.environ.get("CHECKPOINT_DIR", BASE_DIR / "checkpoints"))
+
+# Append-only history of every run's metrics, timings and model sizes
+RUN_HISTORY_DIR = RESULTS_DIR / "run_history"
+
+# Segmented evaluation: per calendar period and per volatility regime
+SEGMENT_PARAMS = {
+    "period_freq": "M",  # Pandas period frequency of the calendar segments
+    "n_volatility_buckets": 5  # Quantile buckets of the volatility feature
+}
+
+# Backtest of threshold long/short strategies on the predictions
+BACKTEST_PARAMS = {
+    "thresholds": [0.0, 0.001, 0.002, 0.003, 0.005, 0.01],  # On the predicted return
+    "fee_bps": 10.0,  # Per unit of turnover
+    "slippage_bps": 5.0,
+    "max_position": 1.0,  # Fraction of equity
+    "allow_short": True
+}
+
+# Scaling benchmarks (benchmark.py) on synthetic data
+BENCHMARK_PARAMS = {
+    "sizes": [25_000, 250_000, 2_500_000, 25_000_000],  # Rows of synthetic data per run
+    "repeats": 1,  # Runs per size; the fastest is kept
+    "threshold": 0.25,  # Relative increase over the baseline that counts as a regression
+    "min_wall_s": 0.5,  # Time and memory increases below these are treated as noise
+    "min_rss_mb": 50.0
+}
+BENCHMARK_BASELINE_FILE = BASE_DIR / "benchmarks" / "baseline.json"
+
 # Visualization settings
 PLOT_STYLE = 'seaborn-v0_8'
 FIGURE_DPI = 100
-PLOT_SAMPLE_SIZE = 500  # Number of predictions to show in plots
+PLOT_MAX_POINTS = 2000  # Points per series in the predictions plot (min/max downsampled)
 
 # Evaluation metrics
 METRICS = ["RMSE", "MAE", "R²", "MAPE"]
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Load generator for the local prediction server
+
+Fires concurrent /predict requests at a running `main.py --mode serve`
+instance and reports client-side p50/p99 latency and throughput, followed
+by the server's own statistics.
+
+Usage:
+    python main.py --mode serve &
+    python load_test.py --requests 2000 --concurrency 16
+"""
+import argparse
+import json
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='Benchmark the local prediction server')
+    parser.add_argument('--url', type=str, default='http://127.0.0.1:8080', help='Server base URL')
+    parser.add_argument('--requests', type=int, default=1000, help='Total number of requests')
+    parser.add_argument('--concurrency', type=int, default=16, help='Number of concurrent clients')
+    parser.add_argument('--bars-per-request', type=int, default=1, help='Bars scored per request')
+    return parser.parse_args()
+
+
+def make_bars(n_bars: int, start: pd.Timestamp, rng: np.random.Generator, input_cols: list) -> list:
+    """Create random but valid OHLCV bars, plus any other input columns the server requires"""
+    bars = []
+    for i in range(n_bars):
+        close = rng.normal(110000, 2000)
+        open_ = close * rng.uniform(0.98, 1.02)
+        bar = {
+            'timestamp': (start + pd.Timedelta(hours=i)).isoformat(),
+            'Open': open_,
+            'High': max(open_, close) * rng.uniform(1.0, 1.03),
+            'Low': min(open_, close) * rng.uniform(0.97, 1.0),
+            'Close': close,
+            'Volume': rng.uniform(1000000, 5000000)
+        }
+        for col in input_cols:
+            bar.setdefault(col, rng.uniform(1000, 100000))
+        bars.append(bar)
+    return bars
+
+
+def post_json(url: str, payload: dict) -> dict:
+    """POST a JSON payload and decode the JSON response"""
+    request = urllib.request.Request(
+        url, data=json.dumps(payload).encode(), headers={'Content-Type': 'application/json'}
+    )
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())
+
+
+def main():
+    args = parse_arguments()
+    rng = np.random.default_rng(42)
+    start = pd.Timestamp.now().floor('h')
+    with urllib.request.urlopen(f"{args.url}/health") as response:
+        input_cols = json.loads(response.read()).get('input_cols', [])
+    payloads = [
+        {'bars': make_bars(args.bars_per_request, start, rng, input_cols)} for _ in range(args.requests)
+    ]
+
+    def send(payload):
+        started = time.perf_counter()
+        post_json(f"{args.url}/predict", payload)
+        return time.perf_counter() - started
+
+    wall_started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        latencies = np.array(list(pool.map(send, payloads))) * 1000
+    wall_time = time.perf_counter() - wall_started
+
+    print("=" * 70)
+    print("LOAD TEST RESULTS (client side)")
+    print("=" * 70)
+    print(f"Requests:     {args.requests} ({args.concurrency} concurrent, "
+          f"{args.bars_per_request} bars each)")
+    print(f"p50 latency:  {np.percentile(latencies, 50):.2f} ms")
+    print(f"p99 latency:  {np.percentile(latencies, 99):.2f} ms")
+    print(f"Throughput:   {args.requests / wall_time:.1f} requests/s")
+
+    with urllib.request.urlopen(f"{args.url}/stats") as response:
+        stats = json.loads(response.read())
+    print("=" * 70)
+    print("SERVER STATS")
+    print("=" * 70)
+    for key, value in stats.items():
+        print(f"{key:15s} {value:.2f}" if isinstance(value, float) else f"{key:15s} {value}")
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
@@ -13,21 +13,15 @@ import argparse
 import logging
 from pathlib import Path
 import sys
+import time
 
 # Add src to path
 sys.path.insert(0, str(Path(__file__).parent))
 
 import config
-from src.data_loader import load_bitcoin_data, validate_data
-from src.feature_engineering import (
-    create_features,
-    get_feature_columns,
-    split_features_target,
-    chronological_train_test_split
-)
-from src.models import ModelTrainer
-from src.evaluate import evaluate_models, find_best_models, save_results, print_summary
-from src.visualization import generate_all_plots
+
+# Subsystems (pandas, sklearn, matplotlib, ...) are imported inside the stage
+# that needs them, so e.g. inference never pays for the plotting stack.
 
 # Configure logging
 logging.basicConfig(
@@ -37,6 +31,10 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+# Stage names of the training pipeline, in order (see build_training_pipeline)
+TRAINING_STAGES = ['load', 'features', 'split', 'train', 'evaluate', 'plots', 'upload', 'history']
+
+
 def parse_arguments():
     """Parse command line arguments"""
     parser = argparse.ArgumentParser(
@@ -47,9 +45,10 @@ def parse_arguments():
     parser.add_argument(
         '--mode',
         type=str,
-        choices=['train', 'inference', 'evaluate'],
+        choices=['train', 'inference', 'serve', 'tune'],
         default='train',
-        help='Pipeline mode: train (full pipeline), inference (predictions only), evaluate (metrics only)'
+        help='Pipeline mode: train (full pipeline), inference (predictions only), '
+             'serve (long-running prediction server), tune (hyperparameter search)'
     )
 
     parser.add_argument(
@@ -78,43 +77,312 @@ def parse_arguments():
         help='Load models from specified directory'
     )
 
+    parser.add_argument(
+        '--start-date',
+        type=str,
+        help='Inference mode: first timestamp to score (default: after last scored row)'
+    )
+
+    parser.add_argument(
+        '--end-date',
+        type=str,
+        help='Inference mode: last timestamp to score (default: end of data)'
+    )
+
+    parser.add_argument(
+        '--chunk-size',
+        type=int,
+        default=config.INFERENCE_CHUNK_SIZE,
+        help='Inference mode: number of rows scored per chunk'
+    )
+
+    parser.add_argument(
+        '--early-exit',
+        action=argparse.BooleanOptionalAction,
+        default=config.EARLY_EXIT_LIVE,
+        help='Inference/serve modes: stop evaluating Random Forest trees once a row is certain '
+             '(default: EARLY_EXIT environment variable)'
+    )
+
+    parser.add_argument(
+        '--port',
+        type=int,
+        default=config.SERVING_PORT,
+        help='Serve mode: TCP port of the prediction server'
+    )
+
+    parser.add_argument(
+        '--max-wait-ms',
+        type=float,
+        default=config.SERVING_MAX_WAIT_MS,
+        help='Serve mode: maximum time a request waits to be micro-batched'
+    )
+
+    parser.add_argument(
+        '--models',
+        nargs='+',
+        default=config.SERVING_MODELS,
+        help="Inference/serve modes: score only these models, e.g. --models 'Distilled Tree' "
+             "(default: SERVING_MODELS, or every saved model)"
+    )
+
+    parser.add_argument(
+        '--max-batch-size',
+        type=int,
+        default=config.SERVING_MAX_BATCH_SIZE,
+        help='Serve mode: maximum rows per micro-batch'
+    )
+
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='Train mode: continue after the last stage with a valid checkpoint'
+    )
+
+    parser.add_argument(
+        '--from-stage',
+        type=str,
+        choices=TRAINING_STAGES,
+        help='Train mode: rerun from this stage, loading earlier stages from their checkpoints '
+             '(earlier stages without one, like plots, are rerun when needed)'
+    )
+
+    parser.add_argument(
+        '--profile',
+        nargs='*',
+        choices=['tracemalloc', 'cprofile'],
+        help='Record wall time, CPU time and peak RSS of every stage and model fit/predict call in '
+             'results/profile.json; optionally add tracemalloc top allocators and/or cProfile output'
+    )
+
+    parser.add_argument(
+        '--metrics-file',
+        type=str,
+        default=str(config.METRICS_TEXTFILE),
+        help='Prometheus textfile-collector file the run metrics are written to at the end of the run'
+    )
+
+    parser.add_argument(
+        '--metrics-port',
+        type=int,
+        default=config.METRICS_PORT,
+        help='Also serve the run metrics on http://127.0.0.1:PORT/metrics while the run lasts'
+    )
+
+    parser.add_argument(
+        '--profile-startup',
+        action='store_true',
+        help='Log how long every module import took (like python -X importtime)'
+    )
+
     return parser.parse_args()
 
 
-def main():
-    """Main pipeline execution"""
-    args = parse_arguments()
+def run_inference(args):
+    """Batch-score new rows with stored models (no training, evaluation or plots)"""
+    from src.inference import DRIFT_DIR, WATERMARK_FILE, partition_overlaps, read_watermark, run_batch_inference
+    from src.pipeline import record_stage_metrics
+    import pandas as pd
+
+    models_dir = Path(args.load_models) if args.load_models else config.MODELS_DIR
+    start = pd.Timestamp(args.start_date) if args.start_date else None
+    end = pd.Timestamp(args.end_date) if args.end_date else None
 
+    if config.USE_S3:
+        # The container starts empty: restore the watermark, or the run would rescore
+        # everything, and the partitions the scored range merges into. Older partitions
+        # are left in S3, so the cost follows the new rows, not the whole history.
+        from src.s3_uploader import download_directory_from_s3
+        download_directory_from_s3(config.S3_BUCKET, "predictions", config.PREDICTIONS_DIR,
+                                   include=lambda key: key == WATERMARK_FILE)
+        watermark = read_watermark(config.PREDICTIONS_DIR)
+        first = start if start is not None else (
+            watermark + pd.Timedelta(1, unit='ns') if watermark is not None else None
+        )
+        n_files = download_directory_from_s3(config.S3_BUCKET, "predictions", config.PREDICTIONS_DIR,
+                                             include=lambda key: partition_overlaps(key, first, end))
+        logger.info(f"Restored {n_files} prediction files overlapping the scored range")
+
+    logger.info(f"\n[1/1] Scoring data with models from {models_dir}...")
+    started = time.perf_counter()
+    stats = run_batch_inference(
+        data_path=Path(args.data_path),
+        models_dir=models_dir,
+        output_dir=config.PREDICTIONS_DIR,
+        chunk_size=args.chunk_size,
+        start=start,
+        end=end,
+        early_exit=config.EARLY_EXIT_PARAMS if args.early_exit else None,
+        psi_threshold=config.DRIFT_PARAMS['psi_threshold'],
+        model_names=args.models
+    )
+    record_stage_metrics('inference', time.perf_counter() - started, stats['rows'])
+
+    logger.info("\n" + "="*70)
+    logger.info("INFERENCE COMPLETED SUCCESSFULLY")
     logger.info("="*70)
-    logger.info("BITCOIN PRICE PREDICTION PIPELINE")
+    logger.info(f"Rows scored: {stats['rows']} in {stats['chunks']} chunks")
+    if 'max_psi' in stats:
+        logger.info(f"Max drift PSI: {stats['max_psi']:.3f} "
+                    f"({len(stats['drifted_columns'])} drifted columns)")
+    logger.info(f"Predictions saved to: {config.PREDICTIONS_DIR}")
     logger.info("="*70)
-    logger.info(f"Mode: {args.mode}")
-    logger.info(f"Data path: {args.data_path}")
 
-    # Step 1: Load and validate data
+    # Upload the partitioned predictions dataset if running in AWS environment
+    if config.USE_S3:
+        try:
+            from src.s3_uploader import upload_directory_to_s3, upload_file_to_s3
+
+            # Only the rewritten partitions, each mirrored so merged-away part files go remotely too
+            n_files = 0
+            for part_dir in sorted(stats['partitions']):
+                prefix = f"predictions/{part_dir.relative_to(config.PREDICTIONS_DIR).as_posix()}"
+                n_files += upload_directory_to_s3(part_dir, config.S3_BUCKET, prefix, delete_missing=True)
+            watermark_path = config.PREDICTIONS_DIR / WATERMARK_FILE
+            if watermark_path.exists():
+                upload_file_to_s3(watermark_path, config.S3_BUCKET, f"predictions/{WATERMARK_FILE}")
+            if (config.PREDICTIONS_DIR / DRIFT_DIR).exists():
+                n_files += upload_directory_to_s3(config.PREDICTIONS_DIR / DRIFT_DIR, config.S3_BUCKET,
+                                                  f"predictions/{DRIFT_DIR}")
+            logger.info(f"Uploaded {n_files} prediction files to s3://{config.S3_BUCKET}/predictions/")
+        except Exception as e:
+            logger.error(f"Failed to upload predictions to S3: {e}", exc_info=True)
+
+
+def run_serve(args):
+    """Start the long-running prediction server with warm models"""
+    from src.serving import PredictionService, run_server
+
+    models_dir = Path(args.load_models) if args.load_models else config.MODELS_DIR
+    service = PredictionService(
+        models_dir=models_dir,
+        data_path=Path(args.data_path),
+        max_batch_size=args.max_batch_size,
+        max_wait_ms=args.max_wait_ms,
+        early_exit=config.EARLY_EXIT_PARAMS if args.early_exit else None,
+        psi_threshold=config.DRIFT_PARAMS['psi_threshold'],
+        model_names=args.models
+    )
+    run_server(service, config.SERVING_HOST, args.port)
+
+
+def run_tuning(args):
+    """Search MODEL_PARAMS with successive halving and write a config overlay"""
+    from src.data_loader import load_bitcoin_data, validate_data
+    from src.feature_engineering import (
+        create_features,
+        get_feature_columns,
+        split_features_target,
+        chronological_train_test_split
+    )
+    from src.models import ModelTrainer
+    from src.tuning import tune_models, save_tuned_params
+
+    logger.info("\n[1/3] Loading Bitcoin data...")
+    df = load_bitcoin_data(Path(args.data_path))
+    validate_data(df)
+
+    logger.info("\n[2/3] Engineering features...")
+    df_features = create_features(
+        df,
+        ma_windows=config.MOVING_AVERAGE_WINDOWS,
+        lag_periods=config.LAG_FEATURES,
+        horizons=config.FORECAST_HORIZONS
+    )
+    feature_cols = get_feature_columns(df_features)
+    X, y = split_features_target(df_features, feature_cols, horizons=config.FORECAST_HORIZONS)
+
+    # Tune on the training split only; the test split stays untouched
+    X_train, _, y_train, _ = chronological_train_test_split(
+        X, y, split_ratio=config.TRAIN_TEST_SPLIT_RATIO
+    )
+    trainer = ModelTrainer(config.MODEL_PARAMS)
+    trainer.fit_scaler(X_train)
+
+    logger.info("\n[3/3] Tuning hyperparameters...")
+    results = tune_models(
+        trainer.transform_features(X_train),
+        y_train.to_numpy(),
+        config.MODEL_PARAMS,
+        config.TUNING_SEARCH_SPACE,
+        n_splits=config.TUNING_PARAMS['n_splits'],
+        eta=config.TUNING_PARAMS['eta'],
+        max_rungs=config.TUNING_PARAMS['max_rungs'],
+        hyperband=config.TUNING_PARAMS['hyperband'],
+        n_workers=config.TUNING_PARAMS['n_workers'],
+        seed=config.RANDOM_SEED
+    )
+    save_tuned_params(results, config.TUNED_PARAMS_FILE)
+
+    if config.USE_S3:
+        try:
+            import os
+            from datetime import datetime
+            from src.s3_uploader import upload_file_to_s3
+
+            # Next to the models of the same run ID, like upload_results_to_s3 does
+            run_id = os.environ.get('GITHUB_SHA') or datetime.now().strftime("%Y%m%d_%H%M%S")
+            upload_file_to_s3(config.TUNED_PARAMS_FILE, config.S3_BUCKET,
+                              f"models/{run_id}/{config.TUNED_PARAMS_FILE.name}")
+        except Exception as e:
+            logger.error(f"Failed to upload tuned parameters to S3: {e}", exc_info=True)
+
+    logger.info("\n" + "="*70)
+    logger.info("TUNING COMPLETED SUCCESSFULLY")
+    logger.info("="*70)
+    logger.info(f"Tuned parameters saved to: {config.TUNED_PARAMS_FILE}")
+    logger.info("Run --mode train to retrain with them")
+    logger.info("="*70)
+
+
+def stage_load(args):
+    """Load and validate the raw data"""
+    from src.data_loader import load_bitcoin_data, validate_data
+
     logger.info("\n[1/6] Loading Bitcoin data...")
-    data_path = Path(args.data_path)
-    df = load_bitcoin_data(data_path)
+    df = load_bitcoin_data(Path(args.data_path))
     validate_data(df)
+    return {'df': df}
+
+
+def stage_features(df):
+    """Engineer features and targets"""
+    from src.feature_engineering import create_features, get_feature_columns, split_features_target
 
-    # Step 2: Feature engineering
     logger.info("\n[2/6] Engineering features...")
     df_features = create_features(
         df,
         ma_windows=config.MOVING_AVERAGE_WINDOWS,
-        lag_periods=config.LAG_FEATURES
+        lag_periods=config.LAG_FEATURES,
+        horizons=config.FORECAST_HORIZONS
     )
 
     feature_cols = get_feature_columns(df_features)
-    X, y = split_features_target(df_features, feature_cols)
+    X, y = split_features_target(df_features, feature_cols, horizons=config.FORECAST_HORIZONS)
+    return {'df_features': df_features, 'feature_cols': feature_cols, 'X': X, 'y': y}
+
+
+def stage_split(X, y):
+    """Chronological train/test split"""
+    from src.feature_engineering import chronological_train_test_split
 
-    # Step 3: Split data
     logger.info("\n[3/6] Splitting data...")
     X_train, X_test, y_train, y_test = chronological_train_test_split(
         X, y, split_ratio=config.TRAIN_TEST_SPLIT_RATIO
     )
+    return {'X_train': X_train, 'X_test': X_test, 'y_train': y_train, 'y_test': y_test}
+
+
+def stage_train(args, feature_cols, X_train, X_test, y_train):
+    """Train (or load) the models, the stacked ensemble, the distilled model and the drift sketch"""
+    import pandas as pd
+    from src.feature_engineering import save_feature_state
+    from src.models import ModelTrainer, DISTILLED_MODEL_NAME
+    from src.evaluate import save_results
+    from src.drift import DRIFT_SKETCH_FILE, HistogramSketch
+    from src.inference import predictions_to_frame
+    from src.metrics import METRICS
 
-    # Step 4: Train models
     logger.info("\n[4/6] Training models...")
     trainer = ModelTrainer(config.MODEL_PARAMS)
 
@@ -125,45 +393,219 @@ def main():
         trainer.initialize_models()
         trainer.fit_scaler(X_train)
         trainer.train_models(X_train, y_train)
+        for name, seconds in trainer.fit_times.items():
+            METRICS.set('model_fit_seconds', seconds, help_text="Wall time of each model's fit", model=name)
 
         if args.save_models:
             trainer.save_models(config.MODELS_DIR)
+            save_feature_state(
+                config.MODELS_DIR,
+                feature_cols,
+                ma_windows=config.MOVING_AVERAGE_WINDOWS,
+                lag_periods=config.LAG_FEATURES,
+                horizons=config.FORECAST_HORIZONS
+            )
+
+    # Stacked ensemble on top of the base models
+    ensemble = None
+    if config.STACKING_PARAMS['enabled']:
+        from src.ensemble import ENSEMBLE_FILE, StackedEnsemble, fit_stacked_ensemble
+
+        ensemble_path = (Path(args.load_models) if args.load_models else config.MODELS_DIR) / ENSEMBLE_FILE
+        if args.load_models and ensemble_path.exists():
+            ensemble = StackedEnsemble.load(ensemble_path)
+        else:
+            ensemble = fit_stacked_ensemble(
+                trainer, X_train, y_train,
+                n_splits=config.STACKING_PARAMS['n_splits'],
+                cache_dir=config.STACKING_CACHE_DIR
+            )
+            if args.save_models:
+                ensemble.save(config.MODELS_DIR / ENSEMBLE_FILE)
+
+    # Compact student of the slowest model, for latency-critical callers
+    if config.DISTILLATION_PARAMS['enabled'] and DISTILLED_MODEL_NAME not in trainer.models:
+        distillation_report = trainer.distill(
+            X_train,
+            X_test,
+            teacher=config.DISTILLATION_PARAMS['teacher'],
+            max_depth=config.DISTILLATION_PARAMS['max_depth'],
+            synthetic_ratio=config.DISTILLATION_PARAMS['synthetic_ratio'],
+            jitter=config.DISTILLATION_PARAMS['jitter'],
+            seed=config.RANDOM_SEED
+        )
+        save_results(distillation_report, config.RESULTS_DIR / "distillation_report.csv")
+        if args.save_models:
+            trainer.save_model(DISTILLED_MODEL_NAME, config.MODELS_DIR)
+
+    # Reference distributions of features and predictions, stored next to scaler.pkl
+    sketch_path = (Path(args.load_models) if args.load_models else config.MODELS_DIR) / DRIFT_SKETCH_FILE
+    if args.load_models and sketch_path.exists():
+        reference_sketch = HistogramSketch.load(sketch_path)
+    else:
+        train_predictions = predictions_to_frame(
+            trainer.predict_all(X_train), config.FORECAST_HORIZONS, X_train.index
+        )
+        reference_sketch = HistogramSketch.from_reference(
+            pd.concat([X_train, train_predictions], axis=1), n_bins=config.DRIFT_PARAMS['n_bins']
+        )
+        if args.save_models:
+            reference_sketch.save(config.MODELS_DIR / DRIFT_SKETCH_FILE)
+
+    return {'trainer': trainer, 'ensemble': ensemble, 'reference_sketch': reference_sketch}
+
+
+def stage_evaluate(trainer, ensemble, reference_sketch, df_features, feature_cols, X_test, y_test):
+    """Evaluate every model: metrics, intervals, drift, bootstrap, segments, backtest and importance"""
+    import pandas as pd
+    from src.drift import drift_scores, log_drift
+    from src.inference import predictions_to_frame
+    from src.evaluate import (
+        evaluate_models,
+        evaluate_early_exit,
+        evaluate_segments,
+        find_best_models,
+        save_results,
+        print_summary
+    )
 
-    # Step 5: Evaluate models
     logger.info("\n[5/6] Evaluating models...")
     predictions_dict = trainer.predict_all(X_test)
+    if ensemble is not None:
+        predictions_dict['Stacked Ensemble'] = ensemble.predict_from_base(predictions_dict)
+
+    # How far the test period has drifted from the training data
+    test_sketch = reference_sketch.empty_copy().update(pd.concat(
+        [X_test, predictions_to_frame(predictions_dict, config.FORECAST_HORIZONS, X_test.index)], axis=1
+    ))
+    drift_df = drift_scores(reference_sketch, test_sketch, config.DRIFT_PARAMS['psi_threshold'])
+    log_drift(drift_df, "test split")
+    save_results(drift_df, config.RESULTS_DIR / "drift_report.csv")
+
+    # Primary (first) horizon for intervals and plots
+    y_test_primary = y_test if y_test.ndim == 1 else y_test.iloc[:, 0]
+    predictions_primary = {
+        name: pred if pred.ndim == 1 else pred[:, 0] for name, pred in predictions_dict.items()
+    }
+
+    intervals = {}
+    if 'Random Forest' in trainer.models:
+        rf_intervals = trainer.predict_intervals(
+            X_test,
+            model_name='Random Forest',
+            quantiles=config.INTERVAL_QUANTILES,
+            chunk_size=config.INTERVAL_CHUNK_SIZE
+        )
+        lower, upper = min(config.INTERVAL_QUANTILES), max(config.INTERVAL_QUANTILES)
+        intervals['Random Forest'] = (rf_intervals[f'q{lower:g}'], rf_intervals[f'q{upper:g}'])
 
-    comparison_df = evaluate_models(predictions_dict, y_test)
-    best_models = find_best_models(comparison_df)
+    # What each model costs to train, store and run, measured by one harness
+    costs_df = trainer.benchmark_models(X_test, **config.MODEL_BENCHMARK_PARAMS)
+    if ensemble is not None:
+        costs_df.loc['Stacked Ensemble'] = ensemble.costs(costs_df)
+
+    comparison_df = evaluate_models(
+        predictions_dict, y_test, intervals=intervals, horizons=config.FORECAST_HORIZONS, costs=costs_df
+    )
+    best_models = find_best_models(comparison_df, objective=config.MODEL_SELECTION_OBJECTIVE)
+
+    # Confidence intervals that respect autocorrelation, for metrics and model differences
+    from src.bootstrap import block_bootstrap_metrics
+    ci_df, pairwise_df = block_bootstrap_metrics(
+        predictions_primary, y_test_primary, seed=config.RANDOM_SEED, **config.BOOTSTRAP_PARAMS
+    )
+    comparison_df = comparison_df.join(ci_df)
+    save_results(pairwise_df, config.RESULTS_DIR / "pairwise_bootstrap.csv")
+
+    # Where in time and in which market regime each model breaks down
+    segment_df = evaluate_segments(
+        predictions_primary, y_test_primary, volatility=X_test['volatility'], **config.SEGMENT_PARAMS
+    )
+    save_results(segment_df, config.RESULTS_DIR / "segment_metrics.csv")
+
+    # What trading on the predictions would have earned after costs
+    from src.backtest import backtest_strategies
+    backtest_df, equity_df = backtest_strategies(
+        predictions_primary, df_features.loc[X_test.index, ['Open', 'High', 'Low', 'Close', 'Volume']],
+        **config.BACKTEST_PARAMS
+    )
+    save_results(backtest_df, config.RESULTS_DIR / "backtest_results.csv")
+
+    # Which features each model relies on, comparable across models
+    from src.importance import permutation_importance
+    importance_df = permutation_importance(
+        trainer.models, trainer.transform_features(X_test), y_test, feature_cols,
+        seed=config.RANDOM_SEED, **config.PERMUTATION_IMPORTANCE_PARAMS
+    )
+    save_results(importance_df, config.RESULTS_DIR / "permutation_importance.csv")
+
+    # How much work early-exit inference saves, and what it costs in accuracy
+    if 'Random Forest' in trainer.models:
+        started = time.perf_counter()
+        trainer.predict('Random Forest', X_test)
+        full_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        early_exit_pred, n_trees = trainer.predict_progressive(
+            X_test, model_name='Random Forest', **config.EARLY_EXIT_PARAMS
+        )
+        early_exit_seconds = time.perf_counter() - started
+        early_exit_report = evaluate_early_exit(
+            y_test, predictions_dict['Random Forest'], early_exit_pred, n_trees,
+            total_trees=len(trainer.models['Random Forest'].estimators_),
+            full_seconds=full_seconds, early_exit_seconds=early_exit_seconds
+        )
+        save_results(pd.DataFrame([early_exit_report], index=pd.Index(['Random Forest'], name='model')),
+                     config.RESULTS_DIR / "early_exit_report.csv")
 
     # Save results
     results_file = config.RESULTS_DIR / "model_comparison.csv"
     save_results(comparison_df, results_file)
     print_summary(comparison_df)
 
-    # Step 6: Generate visualizations
-    if not args.skip_plots:
-        logger.info("\n[6/6] Generating visualizations...")
-        generate_all_plots(
-            comparison_df,
-            y_test,
-            predictions_dict,
-            trainer.models,
-            feature_cols,
-            config.PLOTS_DIR
-        )
-    else:
+    # Every numeric comparison column (accuracy, intervals, costs) as one labelled gauge
+    from src.metrics import METRICS
+    for metric, values in comparison_df.select_dtypes('number').items():
+        for model, value in values.dropna().items():
+            METRICS.set('model_metric', value, help_text="Evaluation metrics and costs of each model",
+                        model=model, metric=metric)
+
+    return {
+        'comparison_df': comparison_df,
+        'y_test_primary': y_test_primary,
+        'predictions_primary': predictions_primary,
+        'segment_df': segment_df,
+        'equity_df': equity_df,
+        'importance_df': importance_df
+    }
+
+
+def stage_plots(args, comparison_df, y_test_primary, predictions_primary, trainer, feature_cols,
+                segment_df, equity_df, importance_df):
+    """Start rendering the plots in worker processes; unchanged plots are skipped"""
+    if args.skip_plots:
         logger.info("\n[6/6] Skipping visualizations (--skip-plots flag)")
+        return {'plot_jobs': None}
+
+    logger.info("\n[6/6] Generating visualizations...")
+    from src.visualization import generate_all_plots
+    plot_jobs = generate_all_plots(
+        comparison_df,
+        y_test_primary,
+        predictions_primary,
+        trainer.models,
+        feature_cols,
+        config.PLOTS_DIR,
+        segment_df=segment_df,
+        equity_df=equity_df,
+        importance_df=importance_df,
+        max_points=config.PLOT_MAX_POINTS,
+        wait=False
+    )
+    return {'plot_jobs': plot_jobs}
 
-    logger.info("\n" + "="*70)
-    logger.info("PIPELINE COMPLETED SUCCESSFULLY")
-    logger.info("="*70)
-    logger.info(f"Results saved to: {config.RESULTS_DIR}")
-    logger.info(f"Models saved to: {config.MODELS_DIR}")
-    logger.info(f"Plots saved to: {config.PLOTS_DIR}")
-    logger.info("="*70)
 
-    # Upload results to S3 if running in AWS environment
+def stage_upload(plot_jobs):
+    """Upload results to S3 (while the plots finish), then wait for the plots and report failed ones"""
     if config.USE_S3:
         logger.info("")
         try:
@@ -173,17 +615,200 @@ def main():
             # Get run ID from environment (GitHub commit SHA if available)
             run_id = os.environ.get('GITHUB_SHA', None)
 
+            # Results and models upload while the plots are still rendering
             upload_results_to_s3(
                 results_dir=config.RESULTS_DIR,
                 models_dir=config.MODELS_DIR,
                 plots_dir=config.PLOTS_DIR,
                 s3_bucket=config.S3_BUCKET,
-                run_id=run_id
+                run_id=run_id,
+                wait_for_plots=plot_jobs.wait if plot_jobs is not None else None
             )
         except Exception as e:
             logger.error(f"Failed to upload results to S3: {e}", exc_info=True)
             logger.warning("Pipeline completed but results upload failed")
 
+    failed_plots = plot_jobs.wait() if plot_jobs is not None else []
+    return {'failed_plots': failed_plots}
+
+
+def stage_history(df, trainer, ensemble, comparison_df, timings, failed_plots):
+    """Append this run to the history instead of only overwriting model_comparison.csv"""
+    from src.run_history import RunHistoryStore, config_hash, fingerprint_data, model_sizes_kb
+
+    # Stages restored from checkpoints are not in timings
+    timings = {**timings, 'total': sum(timings.values())}
+    sizes = model_sizes_kb(trainer.models)
+    if ensemble is not None:
+        sizes['Stacked Ensemble'] = model_sizes_kb({'ensemble': ensemble})['ensemble']
+    store = RunHistoryStore(config.RUN_HISTORY_DIR)
+    history_run_id = store.append(comparison_df, config_hash(config), fingerprint_data(df), timings, sizes,
+                                  status='degraded' if failed_plots else 'ok')
+
+    if config.USE_S3:
+        try:
+            from src.s3_uploader import upload_file_to_s3
+
+            # Only this run's files, whose names are unique, so runs never overwrite each other's
+            for path in store.run_files(history_run_id):
+                s3_key = f"run_history/{path.relative_to(config.RUN_HISTORY_DIR).as_posix()}"
+                upload_file_to_s3(path, config.S3_BUCKET, s3_key)
+        except Exception as e:
+            logger.error(f"Failed to upload run history to S3: {e}", exc_info=True)
+
+    return {'history_run_id': history_run_id}
+
+
+def build_training_pipeline(args):
+    """
+    Stages of the training pipeline
+
+    The checkpoint keys cover the config, the data file and the CLI options
+    that change results, so a resumed run never reuses stale state.
+    """
+    from src.data_loader import s3_data_location, s3_object_version
+    from src.manifest import fingerprint
+    from src.pipeline import Stage, StagePipeline
+    from src.run_history import config_hash
+
+    data_path = Path(args.data_path)
+    s3_location = s3_data_location()
+    if s3_location is not None:
+        # The local copy is only downloaded by the load stage, so identify the S3 object itself
+        data_version = ('s3', *s3_location, s3_object_version(*s3_location))
+    elif data_path.exists():
+        data_version = (data_path.stat().st_size, data_path.stat().st_mtime_ns)
+    else:
+        data_version = None
+    settings_hash = fingerprint(
+        config_hash(config), str(data_path), data_version, args.load_models, args.save_models
+    )
+
+    stages = [
+        Stage('load', stage_load, ['args'], ['df'], rows=lambda state: len(state['df'])),
+        Stage('features', stage_features, ['df'], ['df_features', 'feature_cols', 'X', 'y'],
+              rows=lambda state: len(state['X'])),
+        Stage('split', stage_split, ['X', 'y'], ['X_train', 'X_test', 'y_train', 'y_test'],
+              rows=lambda state: len(state['X'])),
+        Stage('train', stage_train, ['args', 'feature_cols', 'X_train', 'X_test', 'y_train'],
+              ['trainer', 'ensemble', 'reference_sketch'], rows=lambda state: len(state['X_train'])),
+        Stage('evaluate', stage_evaluate,
+              ['trainer', 'ensemble', 'reference_sketch', 'df_features', 'feature_cols', 'X_test', 'y_test'],
+              ['comparison_df', 'y_test_primary', 'predictions_primary', 'segment_df', 'equity_df',
+               'importance_df'], rows=lambda state: len(state['X_test'])),
+        # Cheap to rerun (unchanged plots and uploads are skipped) and not picklable
+        Stage('plots', stage_plots,
+              ['args', 'comparison_df', 'y_test_primary', 'predictions_primary', 'trainer', 'feature_cols',
+               'segment_df', 'equity_df', 'importance_df'],
+              ['plot_jobs'], checkpoint=False),
+        Stage('upload', stage_upload, ['plot_jobs'], ['failed_plots'], checkpoint=False),
+        Stage('history', stage_history, ['df', 'trainer', 'ensemble', 'comparison_df', 'timings', 'failed_plots'],
+              ['history_run_id'], checkpoint=False)
+    ]
+    on_checkpoint = sync_checkpoint_to_s3 if config.USE_S3 else None
+    return StagePipeline(stages, config.CHECKPOINT_DIR, settings_hash, on_checkpoint=on_checkpoint)
+
+
+def sync_checkpoint_to_s3(path, removed):
+    """
+    Mirror a new checkpoint (and the deletion of stale ones) to S3
+
+    ECS tasks start with an empty disk, so a resumed run can only find
+    checkpoints in S3. A failed upload is logged, not raised: the run itself
+    is fine, only a later resume would have to recompute the stage.
+    """
+    from src.s3_uploader import delete_from_s3, upload_file_to_s3
+
+    try:
+        upload_file_to_s3(path, config.S3_BUCKET, f"checkpoints/{path.name}")
+        if removed:
+            delete_from_s3(config.S3_BUCKET, [f"checkpoints/{stale.name}" for stale in removed])
+    except Exception as e:
+        logger.error(f"Failed to sync checkpoint {path.name} to S3: {e}", exc_info=True)
+
+
+def run_training(args):
+    """Full pipeline: load, engineer features, train, evaluate, plot and upload"""
+    if config.USE_S3 and (args.resume or args.from_stage):
+        from src.s3_uploader import download_directory_from_s3
+
+        downloaded = download_directory_from_s3(config.S3_BUCKET, "checkpoints", config.CHECKPOINT_DIR)
+        logger.info(f"Downloaded {downloaded} checkpoint(s) from s3://{config.S3_BUCKET}/checkpoints")
+
+    pipeline = build_training_pipeline(args)
+    state = pipeline.run({'args': args}, resume=args.resume, from_stage=args.from_stage)
+
+    # Recorded as degraded in the history above; the run still fails so a missing plot is noticed
+    if state['failed_plots']:
+        raise RuntimeError(f"Run {state['history_run_id']} is degraded, "
+                           f"plots failed to render: {', '.join(state['failed_plots'])}")
+
+    logger.info("\n" + "="*70)
+    logger.info("PIPELINE COMPLETED SUCCESSFULLY")
+    logger.info("="*70)
+    logger.info(f"Results saved to: {config.RESULTS_DIR}")
+    logger.info(f"Models saved to: {config.MODELS_DIR}")
+    logger.info(f"Plots saved to: {config.PLOTS_DIR}")
+    logger.info(f"Run history: {config.RUN_HISTORY_DIR} (run {state['history_run_id']})")
+    logger.info(f"Checkpoints: {config.CHECKPOINT_DIR}")
+    logger.info("="*70)
+
+
+def main():
+    """Main pipeline execution"""
+    args = parse_arguments()
+
+    profiler = None
+    if args.profile_startup:
+        from src.import_profiler import ImportProfiler
+        profiler = ImportProfiler().install()
+
+    logger.info("="*70)
+    logger.info("BITCOIN PRICE PREDICTION PIPELINE")
+    logger.info("="*70)
+    logger.info(f"Mode: {args.mode}")
+    logger.info(f"Data path: {args.data_path}")
+
+    config.ensure_directories()
+
+    modes = {
+        'train': run_training,
+        'inference': run_inference,
+        'serve': run_serve,
+        'tune': run_tuning
+    }
+    run_profiler = None
+    if args.profile is not None:
+        from src.profiler import RunProfiler
+        run_profiler = RunProfiler(
+            trace_allocations='tracemalloc' in args.profile, cprofile='cprofile' in args.profile
+        ).activate()
+
+    from src.metrics import METRICS, start_metrics_server
+    metrics_server = None
+    if args.metrics_port is not None:
+        metrics_server, _ = start_metrics_server('127.0.0.1', args.metrics_port)
+
+    started, succeeded = time.perf_counter(), False
+    try:
+        modes[args.mode](args)
+        succeeded = True
+    finally:
+        METRICS.set('run_duration_seconds', time.perf_counter() - started, help_text="Wall time of the run",
+                    mode=args.mode)
+        METRICS.set('run_success', int(succeeded), help_text="1 if the run finished without an error",
+                    mode=args.mode)
+        METRICS.set('run_end_timestamp_seconds', time.time(), help_text="Unix time the run ended",
+                    mode=args.mode)
+        METRICS.write_textfile(Path(args.metrics_file))
+        if metrics_server is not None:
+            metrics_server.shutdown()
+        if run_profiler is not None:
+            run_profiler.finish(config.RESULTS_DIR / "profile.json")
+        if profiler is not None:
+            profiler.uninstall()
+            profiler.log_report()
+
 
 if __name__ == "__main__":
     try:
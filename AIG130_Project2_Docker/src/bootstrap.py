@@ -0,0 +1,157 @@
+"""
+Moving-block bootstrap confidence intervals for model metrics
+
+Resampling whole blocks of consecutive hours keeps the autocorrelation of
+the errors, so the intervals are not overconfident the way an i.i.d.
+bootstrap would be on a time series.
+"""
+import numpy as np
+import pandas as pd
+import itertools
+import logging
+import math
+from joblib import Parallel, delayed
+from typing import Dict, Tuple
+
+from src.evaluate import calculate_metrics
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+METRIC_NAMES = ['RMSE', 'MAE', 'R²', 'MAPE']
+
+
+def moving_block_sums(values: np.ndarray, block_length: int) -> np.ndarray:
+    """
+    Sum of every window of `block_length` consecutive values, via prefix sums
+
+    Args:
+        values: Array of shape (n_series, n_rows)
+        block_length: Block length
+
+    Returns:
+        Array of shape (n_series, n_rows - block_length + 1)
+    """
+    prefix = np.zeros((values.shape[0], values.shape[1] + 1))
+    np.cumsum(values, axis=1, out=prefix[:, 1:])
+    return prefix[:, block_length:] - prefix[:, :-block_length]
+
+
+def bootstrap_replicates(block_sums: np.ndarray, n_models: int, n_blocks: int,
+                         block_length: int, n_replicates: int, seed) -> np.ndarray:
+    """
+    Metrics of a chunk of bootstrap replicates
+
+    Each replicate is a row of a (n_replicates x n_blocks) matrix of random
+    block starts; its error sums are the sums of the precomputed block sums.
+
+    Args:
+        block_sums: Moving block sums of squared, absolute and absolute
+            percentage errors per model, then centered y and y²
+        n_models: Number of models
+        n_blocks: Number of blocks per replicate
+        block_length: Block length
+        n_replicates: Number of replicates in this chunk
+        seed: Seed (or SeedSequence) for the block starts
+
+    Returns:
+        Array of shape (n_metrics, n_models, n_replicates)
+    """
+    rng = np.random.default_rng(seed)
+    starts = rng.integers(0, block_sums.shape[1], size=(n_replicates, n_blocks))
+    totals = block_sums[:, starts].sum(axis=2)
+
+    n = n_blocks * block_length
+    sse = totals[:n_models]
+    sae = totals[n_models:2 * n_models]
+    sape = totals[2 * n_models:3 * n_models]
+    sum_y, sum_y_sq = totals[3 * n_models], totals[3 * n_models + 1]
+    sst = sum_y_sq - sum_y ** 2 / n
+
+    return np.stack([np.sqrt(sse / n), sae / n, 1 - sse / sst, sape / n * 100])
+
+
+def block_bootstrap_metrics(models_predictions: Dict, y_true, n_replicates: int = 2000,
+                            block_length: int = None, confidence: float = 0.95,
+                            chunk_bytes: int = 64 * 2 ** 20, n_jobs: int = -1,
+                            seed: int = 42) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Moving-block bootstrap confidence intervals for every metric and model pair
+
+    Args:
+        models_predictions: Dictionary of {model_name: predictions}
+        y_true: True values
+        n_replicates: Number of bootstrap replicates
+        block_length: Block length in rows (default: n ** (1/3))
+        confidence: Confidence level of the intervals
+        chunk_bytes: Memory budget of one vectorized chunk; the gathered
+            block sums take (series x blocks) float64 per replicate, so the
+            replicates per chunk shrink as the test set grows
+        n_jobs: Number of parallel workers for the chunks
+        seed: Random seed
+
+    Returns:
+        Tuple of (ci_df, pairwise_df): ci_df has '<metric> CI Low/High'
+        columns and 'P(Best RMSE)' per model, ready to join onto
+        comparison_df; pairwise_df has the difference of every metric for
+        every model pair with its interval
+    """
+    model_names = list(models_predictions)
+    y = np.asarray(y_true, dtype=float)
+    predictions = np.stack([np.asarray(models_predictions[name], dtype=float) for name in model_names])
+
+    n_rows, n_models = len(y), len(model_names)
+    block_length = block_length or max(1, int(round(n_rows ** (1 / 3))))
+    n_blocks = math.ceil(n_rows / block_length)
+
+    errors = predictions - y
+    y_centered = y - y.mean()
+    block_sums = moving_block_sums(
+        np.vstack([errors ** 2, np.abs(errors), np.abs(errors / y), y_centered, y_centered ** 2]),
+        block_length
+    )
+
+    # Gathered block sums plus the int64 block starts of one replicate
+    bytes_per_replicate = (block_sums.shape[0] + 1) * n_blocks * 8
+    chunk_size = max(1, min(n_replicates, chunk_bytes // bytes_per_replicate))
+    logger.info(f"Block bootstrap: {n_replicates} replicates of {n_blocks} blocks x {block_length} rows, "
+                f"{chunk_size} replicates per chunk")
+    chunk_sizes = [min(chunk_size, n_replicates - start) for start in range(0, n_replicates, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(chunk_sizes))
+    chunks = Parallel(n_jobs=n_jobs)(
+        delayed(bootstrap_replicates)(block_sums, n_models, n_blocks, block_length, size, chunk_seed)
+        for size, chunk_seed in zip(chunk_sizes, seeds)
+    )
+    replicates = np.concatenate(chunks, axis=2)
+
+    alpha = (1 - confidence) / 2
+    low, high = np.quantile(replicates, [alpha, 1 - alpha], axis=2)
+
+    ci_df = pd.DataFrame(index=model_names)
+    for i, metric in enumerate(METRIC_NAMES):
+        ci_df[f'{metric} CI Low'] = low[i]
+        ci_df[f'{metric} CI High'] = high[i]
+    best_rmse = np.argmin(replicates[0], axis=0)
+    ci_df['P(Best RMSE)'] = [np.mean(best_rmse == i) for i in range(n_models)]
+
+    point = {name: calculate_metrics(y, predictions[i]) for i, name in enumerate(model_names)}
+    rows = []
+    for a, b in itertools.combinations(range(n_models), 2):
+        diff_low, diff_high = np.quantile(replicates[:, a] - replicates[:, b], [alpha, 1 - alpha], axis=1)
+        for i, metric in enumerate(METRIC_NAMES):
+            rows.append({
+                'Model A': model_names[a],
+                'Model B': model_names[b],
+                'Metric': metric,
+                'Difference': point[model_names[a]][metric] - point[model_names[b]][metric],
+                'CI Low': diff_low[i],
+                'CI High': diff_high[i],
+                'Significant': bool(diff_low[i] > 0 or diff_high[i] < 0)
+            })
+    pairwise_df = pd.DataFrame(rows)
+
+    significant = pairwise_df[(pairwise_df['Metric'] == 'RMSE') & pairwise_df['Significant']]
+    logger.info(f"{len(significant)} of {n_models * (n_models - 1) // 2} model pairs differ "
+                f"significantly in RMSE at {confidence:.0%} confidence")
+
+    return ci_df, pairwise_df
@@ -7,11 +7,67 @@ from pathlib import Path
 import logging
 import os
 import sys
+import time
+from typing import Iterator, Optional, Tuple
+
+from src.metrics import METRICS
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+def s3_data_location() -> Optional[Tuple[str, str]]:
+    """
+    S3 bucket and key of the data file when USE_S3=true
+
+    Returns:
+        Tuple of (bucket, key), or None when data is read from the local file
+    """
+    if os.environ.get("USE_S3", "false").lower() != "true":
+        return None
+    return (os.environ.get("S3_BUCKET", "aig130-p2-ml-data-bucket"),
+            os.environ.get("S3_KEY", "data/btc_1h_data_2018_to_2025.csv"))
+
+
+def s3_object_version(bucket: str, key: str) -> str:
+    """
+    Identify the current content of an S3 object without downloading it
+
+    Args:
+        bucket: S3 bucket name
+        key: S3 object key
+
+    Returns:
+        Version ID (on versioned buckets) or ETag, plus the size
+    """
+    import boto3
+
+    head = boto3.client('s3').head_object(Bucket=bucket, Key=key)
+    return f"{head.get('VersionId') or head['ETag']}:{head['ContentLength']}"
+
+
+def download_from_s3(bucket: str, key: str, local_path: Path):
+    """
+    Download an S3 object to a local file, raising on any failure
+
+    Args:
+        bucket: S3 bucket name
+        key: S3 object key
+        local_path: Local path to save the downloaded file
+    """
+    import boto3
+
+    logger.info(f"Loading data from S3: s3://{bucket}/{key}")
+    s3_client = boto3.client('s3')
+    local_path.parent.mkdir(parents=True, exist_ok=True)
+    started = time.perf_counter()
+    s3_client.download_file(bucket, key, str(local_path))
+    METRICS.inc('s3_download_seconds_total', time.perf_counter() - started,
+                help_text="Time spent downloading from S3")
+    METRICS.inc('s3_download_bytes_total', local_path.stat().st_size, help_text="Bytes downloaded from S3")
+    logger.info(f"Downloaded data from S3 to {local_path}")
+
+
 def load_from_s3(bucket: str, key: str, local_path: Path) -> pd.DataFrame:
     """
     Load data from AWS S3 bucket
@@ -25,19 +81,9 @@ def load_from_s3(bucket: str, key: str, local_path: Path) -> pd.DataFrame:
         DataFrame with Bitcoin OHLCV data
     """
     try:
-        import boto3
         from botocore.exceptions import ClientError
 
-        logger.info(f"Loading data from S3: s3://{bucket}/{key}")
-
-        # Create S3 client
-        s3_client = boto3.client('s3')
-
-        # Download file from S3
-        local_path.parent.mkdir(parents=True, exist_ok=True)
-        s3_client.download_file(bucket, key, str(local_path))
-
-        logger.info(f"Downloaded data from S3 to {local_path}")
+        download_from_s3(bucket, key, local_path)
 
         # Load and return the dataframe
         df = pd.read_csv(local_path, index_col=0, parse_dates=True)
@@ -73,15 +119,10 @@ def load_bitcoin_data(data_path: Path) -> pd.DataFrame:
         DataFrame with Bitcoin OHLCV data
     """
     # Check if we should load from S3
-    use_s3 = os.environ.get("USE_S3", "false").lower() == "true"
-
-    if use_s3:
-        # Load from S3
-        s3_bucket = os.environ.get("S3_BUCKET", "aig130-p2-ml-data-bucket")
-        s3_key = os.environ.get("S3_KEY", "data/btc_1h_data_2018_to_2025.csv")
-
+    s3_location = s3_data_location()
+    if s3_location is not None:
         logger.info("USE_S3 environment variable detected - loading from S3")
-        return load_from_s3(s3_bucket, s3_key, data_path)
+        return load_from_s3(*s3_location, data_path)
 
     # Load from local file
     try:
@@ -94,13 +135,78 @@ def load_bitcoin_data(data_path: Path) -> pd.DataFrame:
         return generate_synthetic_bitcoin_data()
 
 
-def generate_synthetic_bitcoin_data(n_samples: int = 25120, seed: int = 42) -> pd.DataFrame:
+def iter_bitcoin_data_chunks(
+    data_path: Path,
+    chunk_size: int,
+    start: Optional[pd.Timestamp] = None,
+    end: Optional[pd.Timestamp] = None,
+    warmup_rows: int = 0
+) -> Iterator[Tuple[pd.DataFrame, int]]:
+    """
+    Stream Bitcoin data in fixed-size chunks, restricted to a date range
+
+    Only rows inside [start, end] are yielded for scoring, but each chunk is
+    prefixed with up to `warmup_rows` earlier rows so that rolling and lag
+    features can be computed. At most one chunk plus the warm-up history is
+    held in memory at a time.
+
+    With USE_S3=true the file is downloaded from S3 first. Unlike
+    load_bitcoin_data there is no synthetic fallback: scoring made-up rows
+    would silently publish meaningless predictions.
+
+    Args:
+        data_path: Path to the CSV file
+        chunk_size: Number of rows to read per chunk
+        start: First timestamp to score (inclusive), None for no lower bound
+        end: Last timestamp to score (inclusive), None for no upper bound
+        warmup_rows: Number of history rows to prepend to each chunk
+
+    Yields:
+        Tuples of (frame, n_score) where frame holds OHLCV data (warm-up rows
+        followed by rows to score) and n_score is the number of trailing rows
+        to score
+    """
+    s3_location = s3_data_location()
+    if s3_location is not None:
+        download_from_s3(*s3_location, Path(data_path))
+    if not Path(data_path).exists():
+        raise FileNotFoundError(f"Data file not found at {data_path}")
+
+    reader = pd.read_csv(data_path, index_col=0, parse_dates=True, chunksize=chunk_size)
+    logger.info(f"Streaming Bitcoin data from {data_path} in chunks of {chunk_size} rows")
+
+    history = None
+    for chunk in reader:
+        reached_end = end is not None and len(chunk) > 0 and chunk.index[-1] > end
+        if end is not None:
+            chunk = chunk[chunk.index <= end]
+
+        # History rows were already handled by the previous chunk
+        n_history = 0 if history is None else len(history)
+        frame = chunk if history is None else pd.concat([history, chunk])
+
+        first_pos = n_history
+        if start is not None:
+            first_pos = max(first_pos, int(frame.index.searchsorted(start)))
+
+        if first_pos < len(frame):
+            yield frame.iloc[max(0, first_pos - warmup_rows):], len(frame) - first_pos
+
+        history = frame.iloc[len(frame) - min(warmup_rows, len(frame)):]
+
+        if reached_end:
+            break
+
+
+def generate_synthetic_bitcoin_data(n_samples: int = 25120, seed: int = 42, freq: str = 'H') -> pd.DataFrame:
     """
     Generate realistic synthetic Bitcoin price data for demonstration
 
     Args:
-        n_samples: Number of hourly samples to generate
+        n_samples: Number of samples to generate
         seed: Random seed for reproducibility
+        freq: Pandas frequency of the samples (hourly bars only fit about
+            2 million samples into the Timestamp range; use e.g. 'min' for more)
 
     Returns:
         DataFrame with synthetic Bitcoin OHLCV data
@@ -121,7 +227,7 @@ def generate_synthetic_bitcoin_data(n_samples: int = 25120, seed: int = 42) -> p
     volume = np.random.uniform(1000000, 5000000, n_samples) * volatility
 
     # Create DataFrame with datetime index
-    dates = pd.date_range(start='2023-01-01', periods=n_samples, freq='H')
+    dates = pd.date_range(start='2023-01-01', periods=n_samples, freq=freq)
     df = pd.DataFrame({
         'Open': open_prices,
         'High': high_prices,
@@ -0,0 +1,170 @@
+"""
+Binned residual and actual-vs-predicted diagnostics for Bitcoin price prediction
+
+Residuals and (actual, predicted) pairs of every model are counted into
+fixed uniform bins chunk by chunk, so the diagnostics plots are drawn from
+aggregates whose size depends on the bin count, not the number of rows.
+Aggregates with the same edges merge by adding counts.
+"""
+import numpy as np
+import logging
+from typing import Dict, List
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def uniform_codes(values: np.ndarray, low, high, n_bins: int) -> np.ndarray:
+    """
+    Bin index of every value in uniform bins over [low, high]
+
+    Values outside the range land in the outer bins; non-finite values get
+    bin 0 and must be masked out by the caller.
+
+    Args:
+        values: Values to bin
+        low: Lower edge (broadcast against values)
+        high: Upper edge (broadcast against values)
+        n_bins: Number of bins
+
+    Returns:
+        Integer bin codes with the shape of values
+    """
+    scaled = np.floor((values - low) / (high - low) * n_bins)
+    scaled = np.nan_to_num(scaled, nan=0.0, posinf=n_bins - 1, neginf=0.0)
+    return np.clip(scaled, 0, n_bins - 1).astype(np.int64)
+
+
+class DiagnosticsAggregate:
+    """Residual histograms and actual-vs-predicted 2-D histograms of several models"""
+
+    def __init__(self, model_names: List[str], residual_edges: np.ndarray, price_edges: np.ndarray):
+        """
+        Initialize an empty aggregate
+
+        Args:
+            model_names: Names of the models, in the order predictions are stacked
+            residual_edges: Residual bin edges per model, shape (n_models, n_residual_bins + 1)
+            price_edges: Price bin edges shared by actual and predicted values
+        """
+        self.model_names = list(model_names)
+        self.residual_edges = np.asarray(residual_edges, dtype=float)
+        self.price_edges = np.asarray(price_edges, dtype=float)
+
+        n_models = len(self.model_names)
+        n_price_bins = len(self.price_edges) - 1
+        self.residual_counts = np.zeros((n_models, self.residual_edges.shape[1] - 1))
+        self.joint_counts = np.zeros((n_models, n_price_bins, n_price_bins))
+        self.residual_sums = np.zeros(n_models)
+
+    @classmethod
+    def from_predictions(cls, y_true, predictions_dict: Dict, residual_bins: int = 50,
+                         price_bins: int = 100, chunk_size: int = 1_000_000) -> 'DiagnosticsAggregate':
+        """
+        Aggregate the predictions of every model
+
+        Bin ranges come from one vectorized min/max pass; rows are then
+        counted in chunks of chunk_size.
+
+        Args:
+            y_true: True values
+            predictions_dict: Dictionary of {model_name: predictions}
+            residual_bins: Number of residual bins per model
+            price_bins: Number of price bins per axis
+            chunk_size: Rows counted per chunk
+
+        Returns:
+            Filled aggregate
+        """
+        model_names = list(predictions_dict)
+        y = np.asarray(y_true, dtype=float)
+        predictions = np.stack([np.asarray(predictions_dict[name], dtype=float) for name in model_names])
+
+        residual_low = np.full(len(model_names), np.inf)
+        residual_high = np.full(len(model_names), -np.inf)
+        for start in range(0, len(y), chunk_size):
+            residuals = y[start:start + chunk_size] - predictions[:, start:start + chunk_size]
+            residual_low = np.fmin(residual_low, np.nanmin(residuals, axis=1))
+            residual_high = np.fmax(residual_high, np.nanmax(residuals, axis=1))
+        residual_edges = np.stack([
+            np.linspace(low, high if high > low else low + 1, residual_bins + 1)
+            for low, high in zip(residual_low, residual_high)
+        ])
+
+        price_low = min(np.nanmin(y), np.nanmin(predictions))
+        price_high = max(np.nanmax(y), np.nanmax(predictions))
+        price_edges = np.linspace(price_low, price_high if price_high > price_low else price_low + 1, price_bins + 1)
+
+        aggregate = cls(model_names, residual_edges, price_edges)
+        for start in range(0, len(y), chunk_size):
+            aggregate.update(y[start:start + chunk_size], predictions[:, start:start + chunk_size])
+        return aggregate
+
+    @property
+    def n_rows(self) -> int:
+        """Number of rows counted for the first model"""
+        return int(self.residual_counts[0].sum()) if len(self.model_names) else 0
+
+    @property
+    def mean_residuals(self) -> np.ndarray:
+        """Mean residual (actual - predicted) per model"""
+        return self.residual_sums / np.maximum(self.residual_counts.sum(axis=1), 1)
+
+    def update(self, y_true, y_pred_stack) -> 'DiagnosticsAggregate':
+        """
+        Count one chunk of targets and predictions
+
+        Bin codes of all models are offset into one array and counted with a
+        single np.bincount per histogram. Non-finite values are ignored.
+
+        Args:
+            y_true: True values of shape (n_rows,)
+            y_pred_stack: Predictions of every model, shape (n_models, n_rows)
+
+        Returns:
+            The aggregate itself, for chaining
+        """
+        y = np.asarray(y_true, dtype=float)
+        predictions = np.asarray(y_pred_stack, dtype=float)
+        n_models = len(self.model_names)
+        n_residual_bins = self.residual_counts.shape[1]
+        n_price_bins = self.joint_counts.shape[1]
+        model_index = np.arange(n_models)[:, None]
+
+        residuals = y - predictions
+        finite = np.isfinite(residuals)
+        residual_codes = uniform_codes(
+            residuals, self.residual_edges[:, :1], self.residual_edges[:, -1:], n_residual_bins
+        ) + model_index * n_residual_bins
+        self.residual_counts += np.bincount(
+            residual_codes[finite], minlength=self.residual_counts.size
+        ).reshape(self.residual_counts.shape)
+        self.residual_sums += np.where(finite, residuals, 0.0).sum(axis=1)
+
+        low, high = self.price_edges[0], self.price_edges[-1]
+        actual_codes = uniform_codes(y, low, high, n_price_bins)
+        predicted_codes = uniform_codes(predictions, low, high, n_price_bins)
+        joint_codes = (model_index * n_price_bins + actual_codes) * n_price_bins + predicted_codes
+        self.joint_counts += np.bincount(
+            joint_codes[finite], minlength=self.joint_counts.size
+        ).reshape(self.joint_counts.shape)
+        return self
+
+    def merge(self, other: 'DiagnosticsAggregate') -> 'DiagnosticsAggregate':
+        """
+        Fold in an aggregate of other rows with the same models and edges
+
+        Args:
+            other: Aggregate to merge with
+
+        Returns:
+            The aggregate itself, for chaining
+        """
+        if (self.model_names != other.model_names
+                or not np.array_equal(self.residual_edges, other.residual_edges)
+                or not np.array_equal(self.price_edges, other.price_edges)):
+            raise ValueError("Aggregates with different models or bin edges cannot be merged")
+        self.residual_counts += other.residual_counts
+        self.joint_counts += other.joint_counts
+        self.residual_sums += other.residual_sums
+        return self
@@ -0,0 +1,165 @@
+"""
+Feature and prediction drift monitoring for Bitcoin price prediction
+
+At training time every feature and every model's predictions are summarized
+in a compact fixed-bin histogram sketch, stored next to scaler.pkl. New
+batches are binned into the same edges and compared with PSI and a binned
+Kolmogorov-Smirnov statistic. Sketches with the same edges merge by adding
+counts, so streaming batches can be accumulated without keeping raw rows.
+"""
+import numpy as np
+import pandas as pd
+import logging
+from pathlib import Path
+from typing import List
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DRIFT_SKETCH_FILE = "drift_sketch.npz"
+PSI_EPSILON = 1e-4  # Floor for empty bins, keeps the log ratio finite
+
+
+class HistogramSketch:
+    """Fixed-bin histograms of a set of columns, mergeable by adding counts"""
+
+    def __init__(self, columns: List[str], edges: np.ndarray, counts: np.ndarray = None):
+        """
+        Initialize an empty (or pre-filled) sketch
+
+        Args:
+            columns: Column names, in sketch order
+            edges: Inner bin edges of shape (n_columns, n_bins - 1); the outer
+                bins are open-ended so new values always land in a bin
+            counts: Optional counts of shape (n_columns, n_bins)
+        """
+        self.columns = list(columns)
+        self.edges = np.asarray(edges, dtype=float)
+        n_bins = self.edges.shape[1] + 1
+        self.counts = np.zeros((len(self.columns), n_bins)) if counts is None else np.asarray(counts, dtype=float)
+
+    @classmethod
+    def from_reference(cls, frame: pd.DataFrame, n_bins: int = 20) -> 'HistogramSketch':
+        """
+        Build a sketch with equal-frequency bins on reference data
+
+        Args:
+            frame: Reference data, one column per sketched column
+            n_bins: Number of bins per column
+
+        Returns:
+            Sketch of the reference data
+        """
+        values = frame.to_numpy(dtype=float)
+        edges = np.nanquantile(values, np.linspace(0, 1, n_bins + 1)[1:-1], axis=0).T
+        return cls(frame.columns, edges).update(frame)
+
+    def empty_copy(self) -> 'HistogramSketch':
+        """Sketch with the same columns and edges and no counts"""
+        return HistogramSketch(self.columns, self.edges)
+
+    def select(self, columns: List[str]) -> 'HistogramSketch':
+        """Sketch of a subset of the columns, with their edges and counts"""
+        positions = [self.columns.index(column) for column in columns]
+        return HistogramSketch(columns, self.edges[positions], self.counts[positions])
+
+    @property
+    def n_rows(self) -> int:
+        """Number of rows added to the sketch"""
+        return int(self.counts[0].sum()) if len(self.columns) else 0
+
+    def update(self, frame: pd.DataFrame) -> 'HistogramSketch':
+        """
+        Add a batch of rows to the sketch
+
+        Bin codes of all columns are combined into one array and counted with
+        a single np.bincount. Non-finite values are ignored.
+
+        Args:
+            frame: Batch containing at least the sketched columns
+
+        Returns:
+            The sketch itself, for chaining
+        """
+        values = frame[self.columns].to_numpy(dtype=float)
+        n_bins = self.counts.shape[1]
+
+        codes = np.column_stack([
+            np.searchsorted(self.edges[j], values[:, j], side='right') + j * n_bins
+            for j in range(len(self.columns))
+        ])
+        codes = codes[np.isfinite(values)]
+        self.counts += np.bincount(codes, minlength=self.counts.size).reshape(self.counts.shape)
+        return self
+
+    def merge(self, other: 'HistogramSketch') -> 'HistogramSketch':
+        """
+        Combine two sketches of the same columns and edges
+
+        Args:
+            other: Sketch to merge with
+
+        Returns:
+            New sketch with the summed counts
+        """
+        if self.columns != other.columns or not np.array_equal(self.edges, other.edges):
+            raise ValueError("Sketches with different columns or bin edges cannot be merged")
+        return HistogramSketch(self.columns, self.edges, self.counts + other.counts)
+
+    def save(self, path: Path):
+        """Save the sketch as a compressed .npz file"""
+        np.savez_compressed(path, columns=np.array(self.columns), edges=self.edges, counts=self.counts)
+        logger.info(f"Saved drift sketch of {len(self.columns)} columns to {path}")
+
+    @staticmethod
+    def load(path: Path) -> 'HistogramSketch':
+        """Load a sketch saved with save()"""
+        stored = np.load(path)
+        return HistogramSketch(list(stored['columns']), stored['edges'], stored['counts'])
+
+
+def drift_scores(reference: HistogramSketch, current: HistogramSketch,
+                 psi_threshold: float = 0.2) -> pd.DataFrame:
+    """
+    PSI and binned KS statistic of every column, in one vectorized pass
+
+    PSI below 0.1 is usually read as stable, 0.1-0.2 as a moderate shift and
+    above 0.2 as significant drift.
+
+    Args:
+        reference: Sketch of the training data
+        current: Sketch of new data with the same edges
+        psi_threshold: PSI above which a column is flagged
+
+    Returns:
+        DataFrame indexed by column with 'PSI', 'KS' and 'Drift'
+    """
+    if reference.columns != current.columns or not np.array_equal(reference.edges, current.edges):
+        raise ValueError("Sketches with different columns or bin edges cannot be compared")
+
+    expected = reference.counts / np.maximum(reference.counts.sum(axis=1, keepdims=True), 1)
+    actual = current.counts / np.maximum(current.counts.sum(axis=1, keepdims=True), 1)
+
+    ks = np.abs(np.cumsum(actual, axis=1) - np.cumsum(expected, axis=1)).max(axis=1)
+    expected = np.maximum(expected, PSI_EPSILON)
+    actual = np.maximum(actual, PSI_EPSILON)
+    psi = np.sum((actual - expected) * np.log(actual / expected), axis=1)
+
+    return pd.DataFrame({'PSI': psi, 'KS': ks, 'Drift': psi > psi_threshold}, index=reference.columns)
+
+
+def log_drift(scores: pd.DataFrame, context: str):
+    """
+    Log the drifted columns of a drift_scores result
+
+    Args:
+        scores: Output of drift_scores
+        context: Description of the scored data, e.g. 'test split'
+    """
+    drifted = scores[scores['Drift']].sort_values('PSI', ascending=False)
+    if drifted.empty:
+        logger.info(f"No drift in {context} (max PSI {scores['PSI'].max():.3f})")
+    else:
+        top = ", ".join(f"{name} ({psi:.2f})" for name, psi in drifted['PSI'].head(5).items())
+        logger.warning(f"Drift in {len(drifted)} of {len(scores)} columns of {context}: {top} "
+                       f"- consider retraining")
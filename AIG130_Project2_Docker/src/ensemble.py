@@ -0,0 +1,254 @@
+"""
+Stacked ensemble for Bitcoin price prediction
+
+Fits a meta-model on chronological out-of-fold predictions of the base
+models. The out-of-fold predictions are cached on disk, so the meta-model
+can be re-blended or retuned without refitting the base models.
+"""
+import numpy as np
+import pandas as pd
+import hashlib
+import json
+import joblib
+import logging
+import pickle
+from pathlib import Path
+from typing import Optional
+from sklearn.base import clone
+from sklearn.linear_model import LinearRegression
+from sklearn.model_selection import TimeSeriesSplit
+
+from src.models import MODEL_REGISTRY
+from src.profiler import profiled
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ENSEMBLE_FILE = "stacked_ensemble.pkl"  # Saved next to the base models
+ENSEMBLE_MODEL_NAME = 'Stacked Ensemble'
+
+
+def fingerprint_training_data(X, y, model_params: dict, n_splits: int) -> str:
+    """
+    Hash the training data and settings that determine the out-of-fold predictions
+
+    Args:
+        X: Training features
+        y: Training target
+        model_params: Base model parameters
+        n_splits: Number of chronological folds
+
+    Returns:
+        Short hex digest
+    """
+    digest = hashlib.sha256()
+    digest.update(pd.util.hash_pandas_object(X, index=True).values.tobytes())
+    digest.update(pd.util.hash_pandas_object(y, index=False).values.tobytes())
+    digest.update(json.dumps(model_params, sort_keys=True, default=str).encode())
+    digest.update(str(n_splits).encode())
+    return digest.hexdigest()[:16]
+
+
+def generate_oof_predictions(trainer, X_train, y_train, n_splits: int, cache_dir: Path) -> dict:
+    """
+    Out-of-fold predictions of every base model on chronological folds
+
+    Each fold trains a fresh copy of every base model on the past and predicts
+    the following block. Rows of the first training block have no out-of-fold
+    prediction and are left out. Results are cached by a fingerprint of the
+    data and model parameters.
+
+    Args:
+        trainer: ModelTrainer with initialized models and a fitted scaler
+        X_train: Training features
+        y_train: Training target (Series, or DataFrame with one column per horizon)
+        n_splits: Number of chronological folds
+        cache_dir: Directory for cached predictions
+
+    Returns:
+        Dictionary with 'model_names', 'predictions' of shape
+        (n_rows, n_models[, n_horizons]) and the matching target 'y'
+    """
+    key = fingerprint_training_data(X_train, y_train, trainer.model_params, n_splits)
+    cache_path = cache_dir / f"oof_{key}.npz"
+
+    if cache_path.exists():
+        cached = np.load(cache_path)
+        logger.info(f"Loaded cached out-of-fold predictions from {cache_path}")
+        return {
+            'model_names': list(cached['model_names']),
+            'predictions': cached['predictions'],
+            'y': cached['y']
+        }
+
+    # The scaler is fitted on the whole training set; this does not leak into
+    # the folds because trees ignore feature scale and OLS predictions are
+    # invariant to affine rescaling of the features.
+    X_scaled = trainer.transform_features(X_train)
+    y = np.asarray(y_train)
+    # Only the base models; derived models (e.g. distilled students) are not stacked
+    model_names = [name for name, _ in MODEL_REGISTRY.values() if name in trainer.models]
+
+    splits = list(TimeSeriesSplit(n_splits=n_splits).split(X_scaled))
+    first_val = splits[0][1][0]
+    predictions = np.empty((len(y) - first_val, len(model_names)) + y.shape[1:])
+
+    for fold, (train_idx, val_idx) in enumerate(splits, start=1):
+        logger.info(f"Out-of-fold predictions: fold {fold}/{n_splits} "
+                    f"({len(train_idx)} train, {len(val_idx)} validation rows)")
+        for j, name in enumerate(model_names):
+            fold_model = clone(trainer.models[name])
+            with profiled(f"oof fit {name}", 'fit'):
+                fold_model.fit(X_scaled[train_idx], y[train_idx])
+            with profiled(f"oof predict {name}", 'predict'):
+                predictions[val_idx - first_val, j] = fold_model.predict(X_scaled[val_idx])
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    np.savez(cache_path, model_names=np.array(model_names), predictions=predictions, y=y[first_val:])
+    logger.info(f"Cached out-of-fold predictions to {cache_path}")
+
+    return {'model_names': model_names, 'predictions': predictions, 'y': y[first_val:]}
+
+
+class StackedEnsemble:
+    """Meta-model blending the predictions of the base models"""
+
+    def __init__(self, model_names: list, meta_model=None):
+        """
+        Initialize the ensemble
+
+        Args:
+            model_names: Names of the base models, in stacking order
+            meta_model: Regressor fitted on the base predictions
+                (default: LinearRegression with non-negative weights)
+        """
+        self.model_names = list(model_names)
+        self.meta_model = meta_model if meta_model is not None else LinearRegression(positive=True)
+
+    @staticmethod
+    def _stack(predictions: np.ndarray) -> np.ndarray:
+        """Flatten (n_rows, n_models[, n_horizons]) predictions into meta features"""
+        return predictions.reshape(len(predictions), -1)
+
+    def fit(self, oof: dict):
+        """
+        Fit the meta-model on out-of-fold predictions
+
+        Args:
+            oof: Output of generate_oof_predictions
+        """
+        if list(oof['model_names']) != self.model_names:
+            raise ValueError(f"Out-of-fold predictions are for {oof['model_names']}, "
+                             f"expected {self.model_names}")
+
+        with profiled("fit stacking meta-model", 'fit'):
+            self.meta_model.fit(self._stack(oof['predictions']), oof['y'])
+
+        if hasattr(self.meta_model, 'coef_'):
+            # Weight of each base model on the primary horizon
+            coef = np.atleast_2d(self.meta_model.coef_)[0].reshape(len(self.model_names), -1).sum(axis=1)
+            weights = ", ".join(f"{name}: {w:.3f}" for name, w in zip(self.model_names, coef))
+            logger.info(f"Stacked ensemble weights: {weights}")
+        return self
+
+    def predict_from_base(self, predictions_dict: dict) -> np.ndarray:
+        """
+        Blend already computed base model predictions
+
+        Args:
+            predictions_dict: Dictionary of {model_name: predictions}
+
+        Returns:
+            Ensemble predictions
+        """
+        stacked = np.stack([predictions_dict[name] for name in self.model_names], axis=1)
+        return self.meta_model.predict(self._stack(stacked))
+
+    def predict(self, trainer, X) -> np.ndarray:
+        """
+        Predict with one forward pass over the base models
+
+        Args:
+            trainer: Fitted ModelTrainer holding the base models
+            X: Features to predict on
+
+        Returns:
+            Ensemble predictions
+        """
+        return self.predict_from_base(trainer.predict_all(X))
+
+    def costs(self, base_costs: pd.DataFrame) -> pd.Series:
+        """
+        Cost columns of the ensemble, derived from those of its base models
+
+        Every prediction runs all base models, so times, sizes and memory add
+        up and the throughputs combine harmonically. The blend itself and the
+        cached out-of-fold refits are not counted.
+
+        Args:
+            base_costs: Output of ModelTrainer.benchmark_models
+
+        Returns:
+            Series with the same columns as base_costs
+        """
+        base = base_costs.loc[self.model_names]
+        costs = base.sum(min_count=len(base))
+        costs['Throughput (rows/s)'] = 1 / (1 / base['Throughput (rows/s)']).sum()
+        costs['Size (KB)'] += len(pickle.dumps(self.meta_model)) / 1024
+        return costs
+
+    def save(self, path: Path):
+        """Save the ensemble to disk"""
+        joblib.dump(self, path)
+        logger.info(f"Saved stacked ensemble to {path}")
+
+    @staticmethod
+    def load(path: Path) -> 'StackedEnsemble':
+        """Load an ensemble saved with save()"""
+        ensemble = joblib.load(path)
+        logger.info(f"Loaded stacked ensemble from {path}")
+        return ensemble
+
+
+def load_stacked_ensemble(models_dir: Path, trainer) -> Optional[StackedEnsemble]:
+    """
+    Load the ensemble saved next to the base models, if there is one
+
+    Args:
+        models_dir: Directory with saved models
+        trainer: ModelTrainer holding the loaded base models
+
+    Returns:
+        The ensemble, or None if none was saved or a base model is missing
+    """
+    path = Path(models_dir) / ENSEMBLE_FILE
+    if not path.exists():
+        return None
+    ensemble = StackedEnsemble.load(path)
+    missing = [name for name in ensemble.model_names if name not in trainer.models]
+    if missing:
+        logger.warning(f"Skipping the stacked ensemble, base models not loaded: {', '.join(missing)}")
+        return None
+    return ensemble
+
+
+def fit_stacked_ensemble(trainer, X_train, y_train, n_splits: int, cache_dir: Path,
+                         meta_model=None) -> StackedEnsemble:
+    """
+    Fit a stacked ensemble, reusing cached out-of-fold predictions when possible
+
+    Calling this again with a different meta_model only refits the meta-model.
+
+    Args:
+        trainer: ModelTrainer with initialized models and a fitted scaler
+        X_train: Training features
+        y_train: Training target
+        n_splits: Number of chronological folds
+        cache_dir: Directory for cached out-of-fold predictions
+        meta_model: Optional meta regressor (default: non-negative LinearRegression)
+
+    Returns:
+        Fitted StackedEnsemble
+    """
+    oof = generate_oof_predictions(trainer, X_train, y_train, n_splits, cache_dir)
+    return StackedEnsemble(oof['model_names'], meta_model).fit(oof)
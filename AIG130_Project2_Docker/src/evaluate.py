@@ -3,14 +3,122 @@ Model evaluation and metrics calculation
 """
 import numpy as np
 import pandas as pd
-from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
 import logging
-from typing import Dict
+from typing import Dict, List
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+class MetricAccumulator:
+    """
+    Streaming, mergeable accumulator of regression metrics for several models
+
+    Keeps O(1) state per model (and horizon): sums of squared, absolute and
+    absolute percentage errors, plus the running mean and sum of squared
+    deviations of the target for R². Chunks are folded in with update() in a
+    single pass over the stacked predictions of all models, and accumulators
+    built on different chunks, folds or processes combine with merge().
+    """
+
+    def __init__(self, model_names: List[str]):
+        """
+        Initialize an empty accumulator
+
+        Args:
+            model_names: Names of the models, in the order predictions are stacked
+        """
+        self.model_names = list(model_names)
+        self.n = 0
+        self.y_mean = 0.0
+        self.y_m2 = 0.0
+        self.sse = 0.0
+        self.sae = 0.0
+        self.sape = 0.0
+
+    def update(self, y_true, y_pred_stack):
+        """
+        Fold in one chunk of targets and predictions
+
+        Args:
+            y_true: True values of shape (n_rows,) or (n_rows, n_horizons)
+            y_pred_stack: Predictions of every model, shape (n_models, *y_true.shape)
+
+        Returns:
+            self
+        """
+        y_true = np.asarray(y_true, dtype=float)
+        y_pred_stack = np.asarray(y_pred_stack, dtype=float)
+        n_chunk = len(y_true)
+        if n_chunk == 0:
+            return self
+
+        errors = y_pred_stack - y_true
+        self.sse = self.sse + np.einsum('ij...,ij...->i...', errors, errors)
+        abs_errors = np.abs(errors, out=errors)
+        self.sae = self.sae + abs_errors.sum(axis=1)
+        self.sape = self.sape + (abs_errors / np.abs(y_true)).sum(axis=1)
+
+        chunk_mean = y_true.mean(axis=0)
+        chunk_m2 = ((y_true - chunk_mean) ** 2).sum(axis=0)
+        self._merge_target_stats(n_chunk, chunk_mean, chunk_m2)
+        return self
+
+    def _merge_target_stats(self, n_other: int, mean_other, m2_other):
+        """Combine target mean and M2 (Chan et al. parallel variance)"""
+        n_total = self.n + n_other
+        delta = mean_other - self.y_mean
+        self.y_m2 = self.y_m2 + m2_other + delta ** 2 * self.n * n_other / n_total
+        self.y_mean = self.y_mean + delta * n_other / n_total
+        self.n = n_total
+
+    def merge(self, other: 'MetricAccumulator'):
+        """
+        Combine with an accumulator built on other rows of the same models
+
+        Args:
+            other: Accumulator to fold into this one
+
+        Returns:
+            self
+        """
+        if other.model_names != self.model_names:
+            raise ValueError(f"Cannot merge metrics for {other.model_names} into {self.model_names}")
+        if other.n == 0:
+            return self
+
+        self.sse = self.sse + other.sse
+        self.sae = self.sae + other.sae
+        self.sape = self.sape + other.sape
+        self._merge_target_stats(other.n, other.y_mean, other.y_m2)
+        return self
+
+    def result(self, output: int = None) -> Dict[str, Dict[str, float]]:
+        """
+        Compute the metrics accumulated so far
+
+        Args:
+            output: Horizon column to report when targets are 2-D; None
+                averages the metrics uniformly over horizons
+
+        Returns:
+            Dictionary of {model_name: {metric: value}}
+        """
+        sse, sae, sape, y_m2 = self.sse, self.sae, self.sape, self.y_m2
+        if output is not None:
+            sse, sae, sape, y_m2 = sse[:, output], sae[:, output], sape[:, output], y_m2[output]
+
+        results = {}
+        for i, name in enumerate(self.model_names):
+            results[name] = {
+                'RMSE': float(np.mean(np.sqrt(sse[i] / self.n))),
+                'MAE': float(np.mean(sae[i] / self.n)),
+                'R²': float(np.mean(1 - sse[i] / y_m2)),
+                'MAPE': float(np.mean(sape[i] / self.n * 100))
+            }
+        return results
+
+
 def calculate_metrics(y_true, y_pred) -> Dict[str, float]:
     """
     Calculate regression metrics
@@ -22,36 +130,85 @@ def calculate_metrics(y_true, y_pred) -> Dict[str, float]:
     Returns:
         Dictionary of metrics
     """
-    rmse = np.sqrt(mean_squared_error(y_true, y_pred))
-    mae = mean_absolute_error(y_true, y_pred)
-    r2 = r2_score(y_true, y_pred)
-    mape = np.mean(np.abs((y_true - y_pred) / y_true)) * 100
+    accumulator = MetricAccumulator(['model'])
+    accumulator.update(y_true, np.asarray(y_pred)[None])
+
+    return accumulator.result()['model']
 
-    metrics = {
-        'RMSE': rmse,
-        'MAE': mae,
-        'R²': r2,
-        'MAPE': mape
+
+def calculate_interval_metrics(y_true, lower, upper) -> Dict[str, float]:
+    """
+    Calculate prediction interval metrics
+
+    Args:
+        y_true: True values
+        lower: Lower bound of the interval
+        upper: Upper bound of the interval
+
+    Returns:
+        Dictionary with empirical coverage (%) and mean interval width
+    """
+    y_true = np.asarray(y_true)
+    covered = (y_true >= lower) & (y_true <= upper)
+
+    return {
+        'Coverage': covered.mean() * 100,
+        'Interval Width': np.mean(upper - lower)
     }
 
-    return metrics
+
+# Cost columns of ModelTrainer.benchmark_models, next to the accuracy metrics
+COST_COLUMNS = [
+    'Train Time (s)', 'Throughput (rows/s)', 'p50 Latency (ms)', 'p99 Latency (ms)', 'Size (KB)', 'Memory (MB)'
+]
+
+# Comparison columns where a higher value is better; lower is better for the rest
+HIGHER_IS_BETTER = {'R²', 'Throughput (rows/s)'}
 
 
-def evaluate_models(models_predictions: Dict, y_true) -> pd.DataFrame:
+def evaluate_models(models_predictions: Dict, y_true, intervals: Dict = None,
+                    horizons: List[int] = None, chunk_size: int = 100000,
+                    costs: pd.DataFrame = None) -> pd.DataFrame:
     """
     Evaluate all models and return comparison DataFrame
 
     Args:
         models_predictions: Dictionary of {model_name: predictions}
-        y_true: True values
+        y_true: True values (Series, or DataFrame with one column per horizon)
+        intervals: Optional {model_name: (lower, upper)} prediction intervals
+            for the first horizon; adds Coverage and Interval Width columns
+        horizons: Forecast horizons (in hours) matching the columns of a
+            multi-horizon y_true
+        chunk_size: Rows per accumulator update (bounds temporary memory)
+        costs: Optional cost columns per model from ModelTrainer.benchmark_models
+            (training time, throughput, latency, size, memory), appended after the metrics
 
     Returns:
-        DataFrame with metrics for each model
+        DataFrame with metrics for each model. With several horizons the
+        first horizon keeps the plain metric columns and every other horizon
+        adds columns such as 'RMSE (24h)'.
     """
     results = {}
+    intervals = intervals or {}
+    model_names = list(models_predictions)
+    y_values = np.asarray(y_true, dtype=float)
+    predictions = [np.asarray(models_predictions[name], dtype=float) for name in model_names]
+
+    # One pass over the stacked predictions of all models (and horizons)
+    accumulator = MetricAccumulator(model_names)
+    for start in range(0, len(y_values), chunk_size):
+        end = start + chunk_size
+        accumulator.update(y_values[start:end], np.stack([pred[start:end] for pred in predictions]))
+
+    # Multi-horizon targets: the first column is the primary horizon
+    multi_horizon = y_values.ndim == 2
+    if multi_horizon:
+        horizons = horizons or list(range(1, y_values.shape[1] + 1))
+        y_true = y_values[:, 0]
+    primary_metrics = accumulator.result(output=0 if multi_horizon else None)
 
-    for model_name, y_pred in models_predictions.items():
-        metrics = calculate_metrics(y_true, y_pred)
+    for model_name in model_names:
+        metrics = primary_metrics[model_name]
         results[model_name] = metrics
 
         logger.info(f"\n{model_name} Performance:")
@@ -60,18 +217,196 @@ def evaluate_models(models_predictions: Dict, y_true) -> pd.DataFrame:
         logger.info(f"  R²: {metrics['R²']:.4f}")
         logger.info(f"  MAPE: {metrics['MAPE']:.3f}%")
 
+        if model_name in intervals:
+            lower, upper = intervals[model_name]
+            metrics.update(calculate_interval_metrics(y_true, lower, upper))
+            logger.info(f"  Interval Coverage: {metrics['Coverage']:.1f}%")
+            logger.info(f"  Interval Width: ${metrics['Interval Width']:,.2f}")
+
+        if multi_horizon:
+            for i, horizon in enumerate(horizons[1:], start=1):
+                horizon_metrics = accumulator.result(output=i)[model_name]
+                logger.info(f"  [{horizon}h] RMSE: ${horizon_metrics['RMSE']:,.2f}, "
+                            f"MAE: ${horizon_metrics['MAE']:,.2f}, R²: {horizon_metrics['R²']:.4f}, "
+                            f"MAPE: {horizon_metrics['MAPE']:.3f}%")
+                metrics.update({f"{name} ({horizon}h)": value for name, value in horizon_metrics.items()})
+
     # Create comparison DataFrame
     comparison_df = pd.DataFrame(results).T
+    if costs is not None:
+        comparison_df = comparison_df.join(costs)
 
     return comparison_df
 
 
-def find_best_models(comparison_df: pd.DataFrame) -> Dict[str, str]:
+def _segment_metrics(codes: np.ndarray, labels, y: np.ndarray, predictions: np.ndarray,
+                     model_names: List[str]) -> pd.DataFrame:
+    """
+    Metrics for every (segment, model) pair from integer segment codes
+
+    All groups are reduced at once with np.bincount over a combined
+    (model, segment) code, so the cost is a few linear passes no matter how
+    many segments there are.
+    """
+    n_groups, n_models = len(labels), len(model_names)
+    combined = (np.arange(n_models)[:, None] * n_groups + codes).ravel()
+    n_cells = n_models * n_groups
+
+    errors = predictions - y
+    sse = np.bincount(combined, weights=(errors ** 2).ravel(), minlength=n_cells)
+    sae = np.bincount(combined, weights=np.abs(errors).ravel(), minlength=n_cells)
+    sape = np.bincount(combined, weights=np.abs(errors / y).ravel(), minlength=n_cells)
+
+    # Target statistics per segment, centered to avoid cancellation in R²
+    y_centered = y - y.mean()
+    count = np.bincount(codes, minlength=n_groups)
+    sum_y = np.bincount(codes, weights=y_centered, minlength=n_groups)
+    sum_y_sq = np.bincount(codes, weights=y_centered ** 2, minlength=n_groups)
+    sst = np.tile(sum_y_sq - sum_y ** 2 / np.maximum(count, 1), n_models)
+    rows = np.tile(count, n_models)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return pd.DataFrame({
+            'Segment': np.tile(np.asarray(labels, dtype=object), n_models),
+            'Model': np.repeat(model_names, n_groups),
+            'Rows': rows,
+            'RMSE': np.sqrt(sse / rows),
+            'MAE': sae / rows,
+            'R²': 1 - sse / sst,
+            'MAPE': sape / rows * 100
+        })
+
+
+def evaluate_segments(models_predictions: Dict, y_true, volatility=None,
+                      period_freq: str = 'M', n_volatility_buckets: int = 5) -> pd.DataFrame:
+    """
+    Evaluate all models per calendar period and per volatility regime
+
+    Args:
+        models_predictions: Dictionary of {model_name: predictions}
+        y_true: True values as a Series with a DatetimeIndex
+        volatility: Optional volatility feature aligned with y_true; rows are
+            bucketed into quantiles of it
+        period_freq: Pandas period frequency of the calendar segments
+        n_volatility_buckets: Number of volatility quantile buckets
+
+    Returns:
+        Tidy DataFrame with one row per (segment type, segment, model)
+    """
+    model_names = list(models_predictions)
+    y = np.asarray(y_true, dtype=float)
+    predictions = np.stack([np.asarray(models_predictions[name], dtype=float) for name in model_names])
+
+    period_codes, periods = pd.factorize(y_true.index.to_period(period_freq), sort=True)
+    segments = [_segment_metrics(period_codes, periods.astype(str), y, predictions, model_names)
+                .assign(**{'Segment Type': 'Period'})]
+
+    if volatility is not None:
+        volatility = np.asarray(volatility, dtype=float)
+        edges = np.quantile(volatility, np.linspace(0, 1, n_volatility_buckets + 1)[1:-1])
+        bucket_codes = np.searchsorted(edges, volatility, side='right')
+        bounds = np.concatenate([[volatility.min()], edges, [volatility.max()]])
+        labels = [f"Q{i + 1} ({bounds[i]:.2f}-{bounds[i + 1]:.2f}%)" for i in range(n_volatility_buckets)]
+        segments.append(_segment_metrics(bucket_codes, labels, y, predictions, model_names)
+                        .assign(**{'Segment Type': 'Volatility'}))
+
+    segment_df = pd.concat(segments, ignore_index=True)
+    segment_df = segment_df[segment_df['Rows'] > 0]
+    segment_df = segment_df[['Segment Type', 'Segment', 'Model', 'Rows', 'RMSE', 'MAE', 'R²', 'MAPE']]
+
+    for segment_type, group in segment_df.groupby('Segment Type'):
+        worst = group.loc[group['RMSE'].idxmax()]
+        logger.info(f"Worst {segment_type.lower()} segment: {worst['Segment']} "
+                    f"({worst['Model']}, RMSE ${worst['RMSE']:,.2f})")
+
+    return segment_df.reset_index(drop=True)
+
+
+def evaluate_early_exit(y_true, full_pred, early_exit_pred, n_trees, total_trees: int,
+                        full_seconds: float = None, early_exit_seconds: float = None) -> Dict[str, float]:
     """
-    Identify best model for each metric
+    Compare early-exit predictions of a tree ensemble with full evaluation
+
+    Args:
+        y_true: True values
+        full_pred: Predictions using every tree
+        early_exit_pred: Predictions from progressive early-exit inference
+        n_trees: Number of trees evaluated per row
+        total_trees: Number of trees in the ensemble
+        full_seconds: Optional wall time of the full prediction
+        early_exit_seconds: Optional wall time of the early-exit prediction
+
+    Returns:
+        Dictionary with trees evaluated, deviation from full evaluation, RMSE
+        change and, if timed, both wall times and the speedup
+    """
+    full_pred = np.asarray(full_pred)
+    early_exit_pred = np.asarray(early_exit_pred)
+    deviation = np.abs(early_exit_pred - full_pred)
+
+    report = {
+        'Avg Trees': float(np.mean(n_trees)),
+        'Trees Saved %': (1 - np.mean(n_trees) / total_trees) * 100,
+        'Rows Exited Early %': float(np.mean(np.asarray(n_trees) < total_trees)) * 100,
+        'Mean Abs Deviation': float(deviation.mean()),
+        'Max Abs Deviation': float(deviation.max()),
+        'RMSE Change': (calculate_metrics(y_true, early_exit_pred)['RMSE']
+                        - calculate_metrics(y_true, full_pred)['RMSE'])
+    }
+
+    logger.info("\nEarly-exit inference:")
+    logger.info(f"  Trees evaluated: {report['Avg Trees']:.1f} of {total_trees} on average "
+                f"({report['Rows Exited Early %']:.1f}% of rows exited early)")
+    logger.info(f"  Deviation from full forest: mean ${report['Mean Abs Deviation']:,.2f}, "
+                f"max ${report['Max Abs Deviation']:,.2f}")
+    logger.info(f"  RMSE change: ${report['RMSE Change']:+,.2f}")
+    if full_seconds is not None and early_exit_seconds is not None:
+        report['Full Predict (s)'] = full_seconds
+        report['Early Exit Predict (s)'] = early_exit_seconds
+        report['Speedup'] = full_seconds / early_exit_seconds
+        logger.info(f"  Wall time: {early_exit_seconds:.2f}s vs {full_seconds:.2f}s for the full forest "
+                    f"({report['Speedup']:.2f}x)")
+
+    return report
+
+
+def objective_scores(comparison_df: pd.DataFrame, objective: Dict[str, float]) -> pd.Series:
+    """
+    Combined cost/accuracy score of every model (lower is better)
+
+    Each column in the objective is min-max scaled across the models so
+    that the best model scores 0 and the worst 1, then weighted and summed.
+    Models missing any weighted column are left out.
+
+    Args:
+        comparison_df: DataFrame with model metrics and cost columns
+        objective: Dictionary of {column: weight}, e.g. {'RMSE': 1.0, 'p99 Latency (ms)': 0.25}
+
+    Returns:
+        Scores indexed by model name, best first
+    """
+    columns = [column for column in objective if column in comparison_df.columns]
+    if not columns:
+        return pd.Series(dtype=float)
+    values = comparison_df[columns].astype(float).dropna()
+    spread = (values.max() - values.min()).replace(0, 1)
+    regret = (values - values.min()) / spread
+    for column in columns:
+        if column in HIGHER_IS_BETTER:
+            regret[column] = 1 - regret[column]
+    scores = sum(objective[column] * regret[column] for column in columns)
+    return scores.sort_values()
+
+
+def find_best_models(comparison_df: pd.DataFrame, objective: Dict[str, float] = None) -> Dict[str, str]:
+    """
+    Identify best model for each metric, and optionally for a combined objective
 
     Args:
         comparison_df: DataFrame with model metrics
+        objective: Optional {column: weight} ranking the models on a weighted
+            mix of accuracy and cost columns (see objective_scores); the
+            winner is returned under 'Objective'
 
     Returns:
         Dictionary of {metric: best_model_name}
@@ -79,11 +414,16 @@ def find_best_models(comparison_df: pd.DataFrame) -> Dict[str, str]:
     best_models = {}
 
     for metric in comparison_df.columns:
-        if metric == 'R²':
-            # Higher is better for R²
+        if metric not in ['RMSE', 'MAE', 'R²', 'MAPE'] + COST_COLUMNS:
+            # Interval and other diagnostic columns have no single "best" direction
+            continue
+        if comparison_df[metric].isna().all():
+            continue
+        if metric in HIGHER_IS_BETTER:
+            # Higher is better for R² and throughput
             best_models[metric] = comparison_df[metric].idxmax()
         else:
-            # Lower is better for RMSE, MAE, MAPE
+            # Lower is better for errors and costs
             best_models[metric] = comparison_df[metric].idxmin()
 
     logger.info("\nBest Models by Metric:")
@@ -93,8 +433,19 @@ def find_best_models(comparison_df: pd.DataFrame) -> Dict[str, str]:
             logger.info(f"  {metric}: {model} ({value:.4f})")
         elif metric in ['RMSE', 'MAE']:
             logger.info(f"  {metric}: {model} (${value:,.2f})")
-        else:
+        elif metric == 'MAPE':
             logger.info(f"  {metric}: {model} ({value:.3f}%)")
+        else:
+            logger.info(f"  {metric}: {model} ({value:,.3f})")
+
+    if objective:
+        scores = objective_scores(comparison_df, objective)
+        if len(scores):
+            best_models['Objective'] = scores.index[0]
+            terms = ", ".join(f"{weight:g} x {column}" for column, weight in objective.items())
+            logger.info(f"\nRanking by objective ({terms}; 0 = best on every term):")
+            for model, score in scores.items():
+                logger.info(f"  {model}: {score:.3f}")
 
     return best_models
 
@@ -3,17 +3,24 @@ Feature engineering for Bitcoin price prediction
 """
 import pandas as pd
 import numpy as np
+import json
 import logging
+from pathlib import Path
 from typing import List
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Raw columns every row needs, whatever else the data file carries
+OHLCV_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
 
 def create_features(
     df: pd.DataFrame,
     ma_windows: List[int] = [5, 10],
-    lag_periods: List[int] = [1, 2]
+    lag_periods: List[int] = [1, 2],
+    include_target: bool = True,
+    horizons: List[int] = [1]
 ) -> pd.DataFrame:
     """
     Create technical indicators and lag features for Bitcoin price prediction
@@ -22,6 +29,9 @@ def create_features(
         df: Input DataFrame with OHLCV data
         ma_windows: List of moving average window sizes
         lag_periods: List of lag periods for creating lag features
+        include_target: Whether to create the target columns. Disable for
+            inference, where the most recent rows have no future close yet.
+        horizons: Forecast horizons in hours, one target column per horizon
 
     Returns:
         DataFrame with engineered features
@@ -51,8 +61,10 @@ def create_features(
         df_features[f'close_lag_{lag}'] = df_features['Close'].shift(lag)
         logger.info(f"Created lag feature: lag_{lag}")
 
-    # Target variable: Next hour's close price
-    df_features['target_close'] = df_features['Close'].shift(-1)
+    # Target variables: Close price `horizon` hours ahead
+    if include_target:
+        for horizon in horizons:
+            df_features[get_target_column(horizon)] = df_features['Close'].shift(-horizon)
 
     # Remove rows with NaN values (due to rolling windows and shifts)
     initial_rows = len(df_features)
@@ -65,6 +77,19 @@ def create_features(
     return df_features
 
 
+def get_target_column(horizon: int) -> str:
+    """
+    Name of the target column for a forecast horizon
+
+    Args:
+        horizon: Forecast horizon in hours
+
+    Returns:
+        'target_close' for the next hour, 'target_close_<h>h' otherwise
+    """
+    return 'target_close' if horizon == 1 else f'target_close_{horizon}h'
+
+
 def get_feature_columns(df: pd.DataFrame) -> List[str]:
     """
     Get list of feature columns (exclude target and original close)
@@ -80,25 +105,30 @@ def get_feature_columns(df: pd.DataFrame) -> List[str]:
 
     # Select only numeric columns
     feature_cols = [col for col in df.columns
-                   if col not in exclude_cols and df[col].dtype in ['int64', 'float64']]
+                   if col not in exclude_cols and not col.startswith('target_close')
+                   and df[col].dtype in ['int64', 'float64']]
 
     logger.info(f"Selected {len(feature_cols)} features: {feature_cols}")
     return feature_cols
 
 
-def split_features_target(df: pd.DataFrame, feature_cols: List[str]):
+def split_features_target(df: pd.DataFrame, feature_cols: List[str], horizons: List[int] = [1]):
     """
     Split DataFrame into features and target
 
     Args:
         df: DataFrame with features and target
         feature_cols: List of feature column names
+        horizons: Forecast horizons in hours
 
     Returns:
-        Tuple of (X, y) where X is features and y is target
+        Tuple of (X, y) where X is features and y is the target Series, or a
+        DataFrame with one column per horizon when several horizons are given
     """
+    target_cols = [get_target_column(horizon) for horizon in horizons]
+
     X = df[feature_cols]
-    y = df['target_close']
+    y = df[target_cols[0]] if len(target_cols) == 1 else df[target_cols]
 
     logger.info(f"Features shape: {X.shape}")
     logger.info(f"Target shape: {y.shape}")
@@ -112,7 +142,7 @@ def chronological_train_test_split(X: pd.DataFrame, y: pd.Series, split_ratio: f
 
     Args:
         X: Feature DataFrame
-        y: Target Series
+        y: Target Series (or DataFrame for multiple horizons)
         split_ratio: Ratio of training data (0-1)
 
     Returns:
@@ -129,3 +159,90 @@ def chronological_train_test_split(X: pd.DataFrame, y: pd.Series, split_ratio: f
     logger.info(f"Test set: {len(X_test)} samples ({X_test.index[0]} to {X_test.index[-1]})")
 
     return X_train, X_test, y_train, y_test
+
+
+def get_input_columns(feature_cols: List[str], ma_windows: List[int], lag_periods: List[int]) -> List[str]:
+    """
+    Raw data columns the features are computed from
+
+    OHLCV plus every feature that create_features passes through unchanged
+    (e.g. Number of trades in the Binance export), so callers that supply
+    rows themselves know which fields they must provide.
+
+    Args:
+        feature_cols: List of feature column names
+        ma_windows: List of moving average window sizes
+        lag_periods: List of lag periods
+
+    Returns:
+        List of raw column names
+    """
+    engineered = {'price_change', 'price_change_pct', 'volatility'}
+    engineered |= {f'ma_{window}' for window in ma_windows}
+    engineered |= {f'close_lag_{lag}' for lag in lag_periods}
+    return OHLCV_COLUMNS + [col for col in feature_cols if col not in engineered and col not in OHLCV_COLUMNS]
+
+
+def get_warmup_rows(ma_windows: List[int], lag_periods: List[int]) -> int:
+    """
+    Number of history rows needed before the first row that gets full features
+
+    Args:
+        ma_windows: List of moving average window sizes
+        lag_periods: List of lag periods
+
+    Returns:
+        Number of warm-up rows
+    """
+    return max(max(ma_windows, default=0), max(lag_periods, default=0))
+
+
+def save_feature_state(save_dir: Path, feature_cols: List[str],
+                       ma_windows: List[int], lag_periods: List[int],
+                       horizons: List[int] = [1]):
+    """
+    Save the feature configuration used at training time next to the models
+
+    Args:
+        save_dir: Directory to save the feature state
+        feature_cols: List of feature column names (in model input order)
+        ma_windows: List of moving average window sizes
+        lag_periods: List of lag periods
+        horizons: Forecast horizons (in hours) the models were trained on
+    """
+    save_dir.mkdir(parents=True, exist_ok=True)
+    state = {
+        'feature_cols': list(feature_cols),
+        'input_cols': get_input_columns(feature_cols, ma_windows, lag_periods),
+        'ma_windows': list(ma_windows),
+        'lag_periods': list(lag_periods),
+        'warmup_rows': get_warmup_rows(ma_windows, lag_periods),
+        'horizons': list(horizons)
+    }
+
+    state_path = save_dir / "feature_state.json"
+    with open(state_path, 'w') as f:
+        json.dump(state, f, indent=2)
+    logger.info(f"Saved feature state to {state_path}")
+
+
+def load_feature_state(load_dir: Path) -> dict:
+    """
+    Load the feature configuration saved by save_feature_state
+
+    Args:
+        load_dir: Directory containing feature_state.json
+
+    Returns:
+        Dictionary with feature_cols, input_cols, ma_windows, lag_periods,
+        warmup_rows and horizons
+    """
+    state_path = load_dir / "feature_state.json"
+    with open(state_path) as f:
+        state = json.load(f)
+    state.setdefault('horizons', [1])
+    if 'input_cols' not in state:
+        # Saved before input_cols was recorded
+        state['input_cols'] = get_input_columns(state['feature_cols'], state['ma_windows'], state['lag_periods'])
+    logger.info(f"Loaded feature state from {state_path}")
+    return state
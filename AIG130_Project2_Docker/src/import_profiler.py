@@ -0,0 +1,79 @@
+"""
+Import-time profiler for the pipeline CLI
+
+Records how long every newly loaded module takes to import, split into
+self and cumulative time like `python -X importtime`, so `--profile-startup`
+shows which subsystem makes a given mode slow to start.
+"""
+import builtins
+import logging
+import sys
+import threading
+import time
+from typing import List, Tuple
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class ImportProfiler:
+    """Times imports made by the main thread while installed"""
+
+    def __init__(self):
+        self.records: List[Tuple[str, float, float, int]] = []  # (module, self s, cumulative s, depth)
+        self._stack: List[float] = []
+        self._original_import = None
+        self._thread_id = threading.get_ident()
+        self.started = None
+
+    def install(self) -> 'ImportProfiler':
+        """Start timing imports"""
+        self._original_import = builtins.__import__
+        builtins.__import__ = self._timed_import
+        self.started = time.perf_counter()
+        return self
+
+    def uninstall(self):
+        """Stop timing imports"""
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        # Already loaded modules (and other threads) take the untimed path
+        if (level != 0 or name in sys.modules or threading.get_ident() != self._thread_id):
+            return self._original_import(name, globals, locals, fromlist, level)
+
+        self._stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            return self._original_import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - start
+            children = self._stack.pop()
+            if self._stack:
+                self._stack[-1] += elapsed
+            self.records.append((name, elapsed - children, elapsed, len(self._stack)))
+
+    def log_report(self, top_n: int = 15):
+        """
+        Log total import time, the top-level imports and the slowest modules
+
+        Args:
+            top_n: Number of modules listed by self time
+        """
+        top_level = [record for record in self.records if record[3] == 0]
+        total = sum(cumulative for _, _, cumulative, _ in top_level)
+        wall = time.perf_counter() - self.started
+
+        logger.info("=" * 70)
+        logger.info(f"STARTUP PROFILE: {total:.3f}s importing {len(self.records)} modules "
+                    f"({wall:.3f}s since --profile-startup)")
+        logger.info("=" * 70)
+        logger.info("Top-level imports (cumulative):")
+        for name, _, cumulative, _ in sorted(top_level, key=lambda record: -record[2]):
+            logger.info(f"  {cumulative * 1000:9.1f} ms  {name}")
+        logger.info(f"Slowest modules (self time, top {top_n}):")
+        for name, self_time, _, depth in sorted(self.records, key=lambda record: -record[1])[:top_n]:
+            logger.info(f"  {self_time * 1000:9.1f} ms  {'  ' * depth}{name}")
+        logger.info("=" * 70)
@@ -0,0 +1,131 @@
+"""
+Permutation feature importance for Bitcoin price prediction
+
+Importance is the increase in test RMSE when one feature column is shuffled,
+which is comparable across models, unlike linear coefficients (scale
+dependent) or impurity importances (biased towards high-cardinality splits).
+Baseline predictions are computed once per model; linear models are then
+updated from them directly instead of re-predicting the whole test set.
+"""
+import numpy as np
+import pandas as pd
+import logging
+from joblib import Parallel, delayed, effective_n_jobs
+from typing import Dict, List
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _primary(predictions: np.ndarray) -> np.ndarray:
+    """First forecast horizon of single- or multi-horizon predictions"""
+    return predictions if predictions.ndim == 1 else predictions[:, 0]
+
+
+def _rmse(y: np.ndarray, predictions: np.ndarray) -> float:
+    """Root mean squared error"""
+    return float(np.sqrt(np.mean((y - predictions) ** 2)))
+
+
+def permute_features(models: Dict, X_scaled: np.ndarray, y: np.ndarray, baselines: Dict[str, np.ndarray],
+                     feature_indices: List[int], n_repeats: int, seeds) -> Dict[str, np.ndarray]:
+    """
+    RMSE increase of every model for a group of features
+
+    Runs inside a worker. The worker copies the scaled matrix once, shuffles
+    one column of the copy in place per repeat and restores it afterwards.
+
+    Args:
+        models: Dictionary of {model_name: model}
+        X_scaled: Scaled features
+        y: True values of the primary horizon
+        baselines: Cached unpermuted predictions (primary horizon) per model
+        feature_indices: Columns handled by this worker
+        n_repeats: Shuffles per feature
+        seeds: One seed (or SeedSequence) per feature
+
+    Returns:
+        Dictionary of {model_name: array of shape (n_features_in_group, n_repeats)}
+    """
+    X_work = X_scaled.copy()
+    baseline_rmse = {name: _rmse(y, baselines[name]) for name in models}
+    scores = {name: np.empty((len(feature_indices), n_repeats)) for name in models}
+
+    for row, (j, seed) in enumerate(zip(feature_indices, seeds)):
+        rng = np.random.default_rng(seed)
+        original = X_scaled[:, j]
+        for repeat in range(n_repeats):
+            X_work[:, j] = original[rng.permutation(len(original))]
+            shift = X_work[:, j] - original
+            for name, model in models.items():
+                if hasattr(model, 'coef_'):
+                    # Linear: only column j's term changes
+                    coef = np.atleast_2d(model.coef_)[0, j]
+                    permuted = baselines[name] + coef * shift
+                else:
+                    permuted = _primary(model.predict(X_work))
+                scores[name][row, repeat] = _rmse(y, permuted) - baseline_rmse[name]
+        X_work[:, j] = original
+
+    return scores
+
+
+def permutation_importance(models: Dict, X_scaled: np.ndarray, y_true, feature_cols: List[str],
+                           n_repeats: int = 10, confidence: float = 0.95, n_jobs: int = -1,
+                           seed: int = 42) -> pd.DataFrame:
+    """
+    Permutation importance of every feature for every model
+
+    Args:
+        models: Dictionary of {model_name: model}
+        X_scaled: Scaled features (e.g. ModelTrainer.transform_features(X_test))
+        y_true: True values (Series, or DataFrame with the primary horizon first)
+        feature_cols: Names of the columns of X_scaled
+        n_repeats: Shuffles per feature
+        confidence: Confidence level of the intervals across repeats
+        n_jobs: Number of parallel workers (features are split between them)
+        seed: Random seed
+
+    Returns:
+        DataFrame with Model, Feature, Importance (mean RMSE increase), Std,
+        CI Low and CI High, sorted by model and descending importance
+    """
+    X_scaled = np.asarray(X_scaled, dtype=float)
+    y = np.asarray(y_true, dtype=float)
+    y = y if y.ndim == 1 else y[:, 0]
+
+    baselines = {name: _primary(np.asarray(model.predict(X_scaled))) for name, model in models.items()}
+
+    n_features = len(feature_cols)
+    n_workers = min(n_features, effective_n_jobs(n_jobs))
+    groups = [list(group) for group in np.array_split(np.arange(n_features), n_workers) if len(group)]
+    seeds = np.random.SeedSequence(seed).spawn(n_features)
+
+    logger.info(f"Permutation importance: {n_features} features x {n_repeats} repeats x "
+                f"{len(models)} models on {len(groups)} workers")
+    results = Parallel(n_jobs=len(groups))(
+        delayed(permute_features)(models, X_scaled, y, baselines, group, n_repeats, [seeds[j] for j in group])
+        for group in groups
+    )
+
+    alpha = (1 - confidence) / 2
+    rows = []
+    for group, scores in zip(groups, results):
+        for name in models:
+            low, high = np.quantile(scores[name], [alpha, 1 - alpha], axis=1)
+            for row, j in enumerate(group):
+                rows.append({
+                    'Model': name,
+                    'Feature': feature_cols[j],
+                    'Importance': scores[name][row].mean(),
+                    'Std': scores[name][row].std(),
+                    'CI Low': low[row],
+                    'CI High': high[row]
+                })
+
+    importance_df = pd.DataFrame(rows)
+    importance_df['Model'] = pd.Categorical(importance_df['Model'], categories=list(models))
+    importance_df = importance_df.sort_values(['Model', 'Importance'], ascending=[True, False])
+    importance_df['Model'] = importance_df['Model'].astype(str)
+    return importance_df.reset_index(drop=True)
+
@@ -0,0 +1,314 @@
+"""
+Batch inference for Bitcoin price prediction
+
+Scores new rows with previously trained models, without retraining,
+evaluation or plotting.
+"""
+import pandas as pd
+import json
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from src.data_loader import iter_bitcoin_data_chunks
+from src.drift import DRIFT_SKETCH_FILE, HistogramSketch, drift_scores, log_drift
+from src.ensemble import ENSEMBLE_MODEL_NAME, StackedEnsemble, load_stacked_ensemble
+from src.feature_engineering import create_features, load_feature_state
+from src.models import ModelTrainer
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+WATERMARK_FILE = "_watermark.json"
+PARTITION_FILE = "data.parquet"  # One file per year/month partition
+DRIFT_DIR = "_drift"  # Leading underscore keeps it out of Parquet dataset discovery
+
+
+def read_watermark(output_dir: Path) -> Optional[pd.Timestamp]:
+    """
+    Read the timestamp of the last scored row
+
+    Args:
+        output_dir: Predictions output directory
+
+    Returns:
+        Last scored timestamp, or None if nothing has been scored yet
+    """
+    watermark_path = output_dir / WATERMARK_FILE
+    if not watermark_path.exists():
+        return None
+
+    with open(watermark_path) as f:
+        return pd.Timestamp(json.load(f)['last_scored'])
+
+
+def write_watermark(output_dir: Path, last_scored: pd.Timestamp):
+    """
+    Record the timestamp of the last scored row
+
+    Args:
+        output_dir: Predictions output directory
+        last_scored: Timestamp of the last scored row
+    """
+    watermark_path = output_dir / WATERMARK_FILE
+    with open(watermark_path, 'w') as f:
+        json.dump({'last_scored': last_scored.isoformat()}, f, indent=2)
+
+
+def load_scoring_models(models_dir: Path, model_names: Optional[List[str]] = None
+                        ) -> Tuple[ModelTrainer, Optional[StackedEnsemble]]:
+    """
+    Load the models to score with, e.g. only the distilled tree for low latency
+
+    Args:
+        models_dir: Directory with saved models and scaler
+        model_names: Models to score (default: every saved model and the
+            stacked ensemble); the ensemble needs its base models listed too
+
+    Returns:
+        Tuple of (trainer holding the selected models, ensemble or None)
+    """
+    trainer = ModelTrainer({})
+    base_names = None if model_names is None else [name for name in model_names if name != ENSEMBLE_MODEL_NAME]
+    trainer.load_models(models_dir, base_names)
+    ensemble = None
+    if model_names is None or ENSEMBLE_MODEL_NAME in model_names:
+        ensemble = load_stacked_ensemble(models_dir, trainer)
+    return trainer, ensemble
+
+
+def prediction_column(model_name: str) -> str:
+    """Prediction column of a model (horizons add an '_<h>h' suffix)"""
+    return f"pred_{model_name.lower().replace(' ', '_')}"
+
+
+def select_sketch_models(sketch: HistogramSketch, model_names: List[str]) -> HistogramSketch:
+    """
+    Drop the prediction columns of models that are not scored from a drift sketch
+
+    Args:
+        sketch: Sketch of the features and every model's predictions
+        model_names: Models being scored
+
+    Returns:
+        Sketch of the features and the predictions of model_names
+    """
+    prefixes = [prediction_column(name) for name in model_names]
+    return sketch.select([
+        column for column in sketch.columns
+        if not column.startswith('pred_') or any(column == p or column.startswith(p + '_') for p in prefixes)
+    ])
+
+
+def predictions_to_frame(predictions_dict: dict, horizons: list, index: pd.Index) -> pd.DataFrame:
+    """
+    Flatten per-model predictions into one column per model (and horizon)
+
+    Args:
+        predictions_dict: Dictionary of {model_name: predictions}
+        horizons: Forecast horizons (in hours) of multi-output predictions
+        index: Index of the scored rows
+
+    Returns:
+        DataFrame with columns like 'pred_random_forest' or 'pred_random_forest_24h'
+    """
+    columns = {}
+    for name, pred in predictions_dict.items():
+        slug = prediction_column(name)
+        if pred.ndim == 1:
+            columns[slug] = pred
+        else:
+            for i, horizon in enumerate(horizons):
+                columns[f"{slug}_{horizon}h"] = pred[:, i]
+
+    return pd.DataFrame(columns, index=index)
+
+
+def partition_overlaps(relative_path: str, start: Optional[pd.Timestamp], end: Optional[pd.Timestamp]) -> bool:
+    """
+    Whether a file of a year=/month= partition can hold rows in [start, end]
+
+    Args:
+        relative_path: Path relative to the dataset root, e.g. 'year=2025/month=03/data.parquet'
+        start: First timestamp of the range (None = open)
+        end: Last timestamp of the range (None = open)
+
+    Returns:
+        True if the partition overlaps the range; False for files outside partitions
+    """
+    parts = dict(part.split('=', 1) for part in relative_path.split('/')[:-1] if '=' in part)
+    if 'year' not in parts or 'month' not in parts:
+        return False
+    month_start = pd.Timestamp(year=int(parts['year']), month=int(parts['month']), day=1)
+    month_end = month_start + pd.offsets.MonthBegin(1)
+    return (start is None or month_end > start) and (end is None or month_start <= end)
+
+
+def write_prediction_partitions(predictions_df: pd.DataFrame, output_dir: Path) -> List[Path]:
+    """
+    Merge predictions into a Parquet dataset partitioned by year and month
+
+    Each partition holds a single file. New rows are merged with the rows
+    already in the partition (including files left by older layouts), and
+    rows with the same timestamp keep the newest prediction, so re-scoring
+    a date range replaces rows instead of duplicating them.
+
+    Args:
+        predictions_df: DataFrame of predictions indexed by timestamp
+        output_dir: Root directory of the partitioned dataset
+
+    Returns:
+        Directories of the partitions written
+    """
+    index = predictions_df.index
+    written = []
+
+    for (year, month), part in predictions_df.groupby([index.year, index.month]):
+        part_dir = output_dir / f"year={year}" / f"month={month:02d}"
+        part_dir.mkdir(parents=True, exist_ok=True)
+        existing_files = sorted(part_dir.glob("*.parquet"))
+        if existing_files:
+            part = pd.concat([pd.read_parquet(path) for path in existing_files] + [part])
+            part = part[~part.index.duplicated(keep='last')].sort_index()
+
+        part_path = part_dir / PARTITION_FILE
+        tmp_path = part_dir / f".{PARTITION_FILE}.tmp"
+        part.to_parquet(tmp_path, index=True)
+        tmp_path.replace(part_path)
+        for path in existing_files:
+            if path != part_path:
+                path.unlink()
+        written.append(part_dir)
+
+    return written
+
+
+def run_batch_inference(
+    data_path: Path,
+    models_dir: Path,
+    output_dir: Path,
+    chunk_size: int,
+    start: Optional[pd.Timestamp] = None,
+    end: Optional[pd.Timestamp] = None,
+    early_exit: Optional[dict] = None,
+    psi_threshold: float = 0.2,
+    model_names: Optional[List[str]] = None
+) -> dict:
+    """
+    Score new rows with stored models in fixed-size chunks
+
+    When no start date is given, only rows after the last scored timestamp
+    (the watermark) are read, so repeated runs only score new data. Rows
+    scored again (e.g. an explicit backfill) replace the stored ones.
+    output_dir must hold the watermark and every partition overlapping the
+    scored range; with S3 the caller restores just those from the
+    predictions prefix first and uploads stats['partitions'] afterwards.
+
+    A stacked ensemble saved next to the models is scored too, blended from
+    the base predictions of the same pass.
+
+    If the models directory holds a drift sketch, every chunk's features and
+    predictions are compared with it, and the per-chunk and per-run drift
+    scores are written to the _drift directory next to the predictions.
+
+    Args:
+        data_path: Path to the CSV file with OHLCV data
+        models_dir: Directory with saved models, scaler and feature state
+        output_dir: Root directory of the partitioned predictions dataset
+        chunk_size: Number of rows to score per chunk
+        start: First timestamp to score (inclusive)
+        end: Last timestamp to score (inclusive)
+        early_exit: Optional early-exit settings for tree ensembles
+        psi_threshold: PSI above which a column is flagged as drifted
+        model_names: Models to score (default: all; see load_scoring_models)
+
+    Returns:
+        Dictionary with inference statistics
+    """
+    trainer, ensemble = load_scoring_models(models_dir, model_names)
+    trainer.early_exit = early_exit
+    feature_state = load_feature_state(models_dir)
+    feature_cols = feature_state['feature_cols']
+    warmup_rows = feature_state['warmup_rows']
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    watermark = read_watermark(output_dir)
+    if start is None and watermark is not None:
+        start = watermark + pd.Timedelta(1, unit='ns')
+        logger.info(f"Scoring rows after watermark {watermark}")
+
+    reference = None
+    if (models_dir / DRIFT_SKETCH_FILE).exists():
+        reference = select_sketch_models(HistogramSketch.load(models_dir / DRIFT_SKETCH_FILE), list(trainer.models))
+        run_sketch = reference.empty_copy()
+        chunk_drift = []
+
+    run_tag = datetime.now().strftime("%Y%m%d_%H%M%S")
+    stats = {'rows': 0, 'chunks': 0, 'files': 0, 'partitions': set(), 'first': None, 'last': None}
+
+    chunks = iter_bitcoin_data_chunks(
+        data_path, chunk_size, start=start, end=end, warmup_rows=warmup_rows
+    )
+    for chunk, n_score in chunks:
+        df_features = create_features(
+            chunk,
+            ma_windows=feature_state['ma_windows'],
+            lag_periods=feature_state['lag_periods'],
+            include_target=False
+        )
+        # Drop the warm-up rows, they were scored earlier or are out of range
+        df_features = df_features[df_features.index >= chunk.index[-n_score]]
+        if df_features.empty:
+            continue
+
+        predictions_dict = trainer.predict_all(df_features[feature_cols])
+        if ensemble is not None:
+            predictions_dict[ENSEMBLE_MODEL_NAME] = ensemble.predict_from_base(predictions_dict)
+        predictions_df = predictions_to_frame(predictions_dict, feature_state['horizons'],
+                                              df_features.index)
+        predictions_df.insert(0, 'close', df_features['Close'])
+        predictions_df.index.name = 'timestamp'
+
+        written = write_prediction_partitions(predictions_df, output_dir)
+        stats['files'] += len(written)
+        stats['partitions'].update(written)
+
+        if reference is not None:
+            chunk_sketch = reference.empty_copy().update(
+                pd.concat([df_features[feature_cols], predictions_df], axis=1)
+            )
+            run_sketch = run_sketch.merge(chunk_sketch)
+            scores = drift_scores(reference, chunk_sketch, psi_threshold)
+            chunk_drift.append(scores.assign(chunk=stats['chunks'], first=predictions_df.index[0],
+                                             last=predictions_df.index[-1], rows=len(predictions_df)))
+        stats['rows'] += len(predictions_df)
+        stats['chunks'] += 1
+        stats['first'] = stats['first'] or predictions_df.index[0]
+        stats['last'] = predictions_df.index[-1]
+        logger.info(f"Scored chunk {stats['chunks']}: {len(predictions_df)} rows "
+                    f"(up to {stats['last']})")
+
+    if reference is not None and stats['rows']:
+        drift_dir = output_dir / DRIFT_DIR
+        drift_dir.mkdir(exist_ok=True)
+        run_scores = drift_scores(reference, run_sketch, psi_threshold)
+        log_drift(run_scores, f"run {run_tag}")
+        chunk_df = pd.concat(chunk_drift).rename_axis('column').reset_index()
+        chunk_df.to_csv(drift_dir / f"drift-{run_tag}-chunks.csv", index=False)
+        run_scores.rename_axis('column').to_csv(drift_dir / f"drift-{run_tag}.csv")
+        # Kept so runs can be merged into daily or weekly drift views later
+        run_sketch.save(drift_dir / f"sketch-{run_tag}.npz")
+        stats['max_psi'] = float(run_scores['PSI'].max())
+        stats['drifted_columns'] = list(run_scores.index[run_scores['Drift']])
+
+    if stats['last'] is not None:
+        # Only move the watermark forward, backfills must not rewind it
+        if watermark is None or stats['last'] > watermark:
+            write_watermark(output_dir, stats['last'])
+        logger.info(f"Scored {stats['rows']} rows from {stats['first']} to {stats['last']}")
+    else:
+        logger.info("No new rows to score")
+
+    logger.info(f"Predictions written to {output_dir}")
+    return stats
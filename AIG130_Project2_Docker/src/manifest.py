@@ -0,0 +1,82 @@
+"""
+Content fingerprints of generated files
+
+A small JSON manifest next to generated files (e.g. results/plots) maps
+each file name to the fingerprint of the inputs it was rendered from and
+to the fingerprint last uploaded to each S3 location. Rendering and
+uploading both skip files whose fingerprint has not changed.
+"""
+import numpy as np
+import pandas as pd
+import hashlib
+import json
+import logging
+from pathlib import Path
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "_manifest.json"
+
+
+def _update_digest(digest, obj):
+    """Feed an object into a hash, recursing into containers and plain objects"""
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        digest.update(repr(list(obj.columns) if isinstance(obj, pd.DataFrame) else obj.name).encode())
+        digest.update(pd.util.hash_pandas_object(obj, index=True).values.tobytes())
+    elif isinstance(obj, np.ndarray):
+        digest.update(f"{obj.dtype}{obj.shape}".encode())
+        digest.update(np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, dict):
+        for key in sorted(obj, key=str):
+            _update_digest(digest, key)
+            _update_digest(digest, obj[key])
+    elif isinstance(obj, (list, tuple)):
+        digest.update(f"{type(obj).__name__}{len(obj)}".encode())
+        for item in obj:
+            _update_digest(digest, item)
+    elif hasattr(obj, '__dict__') and not callable(obj):
+        digest.update(type(obj).__name__.encode())
+        _update_digest(digest, vars(obj))
+    else:
+        digest.update(repr(obj).encode())
+
+
+def fingerprint(*objects) -> str:
+    """
+    Hash the contents of DataFrames, arrays, containers and plain objects
+
+    Args:
+        objects: Inputs to fingerprint
+
+    Returns:
+        Short hex digest
+    """
+    digest = hashlib.sha256()
+    for obj in objects:
+        _update_digest(digest, obj)
+    return digest.hexdigest()[:16]
+
+
+def load_manifest(directory: Path) -> dict:
+    """
+    Read the manifest of a directory
+
+    Args:
+        directory: Directory holding the generated files
+
+    Returns:
+        Dictionary of {file_name: {'fingerprint', 'uploaded': {s3_uri: fingerprint}}}
+        (empty if there is no manifest)
+    """
+    path = Path(directory) / MANIFEST_FILE
+    if not path.exists():
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_manifest(directory: Path, manifest: dict):
+    """Write the manifest of a directory"""
+    with open(Path(directory) / MANIFEST_FILE, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
@@ -0,0 +1,202 @@
+"""
+Run metrics in the Prometheus text exposition format
+
+Stages, S3 transfers and the serving loop record counters and gauges in
+the process-wide METRICS registry. Batch modes write it to a file for
+node_exporter's textfile collector at the end of the run; long-running
+modes can also serve it on a local /metrics endpoint. Metrics are recorded
+once per stage, file or scrape, never per row, so the cost is a dictionary
+update under a lock.
+"""
+import logging
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Tuple
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+METRIC_PREFIX = "btc_pipeline_"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    """Escape a label value for the text format"""
+    return value.replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _key(labels: dict) -> tuple:
+    """Hashable, sorted form of a sample's labels"""
+    return tuple(sorted((label, str(value)) for label, value in labels.items()))
+
+
+def _format_value(value: float) -> str:
+    """Format a sample value (Prometheus spells infinities and NaN its own way)"""
+    if value != value:
+        return "NaN"
+    if value in (float('inf'), float('-inf')):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class MetricsRegistry:
+    """Thread-safe set of counter and gauge families"""
+
+    def __init__(self, prefix: str = METRIC_PREFIX):
+        """
+        Initialize an empty registry
+
+        Args:
+            prefix: Prepended to every metric name
+        """
+        self.prefix = prefix
+        self._families: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def _family(self, name: str, kind: str, help_text: str) -> dict:
+        """Get or create a metric family; the caller holds the lock"""
+        if not re.fullmatch(r"[a-zA-Z_:][a-zA-Z0-9_:]*", name):
+            raise ValueError(f"Invalid metric name '{name}'")
+        family = self._families.setdefault(name, {'kind': kind, 'help': help_text, 'samples': {}})
+        if family['kind'] != kind:
+            raise ValueError(f"Metric '{name}' is a {family['kind']}, not a {kind}")
+        return family
+
+    def inc(self, name: str, value: float = 1.0, help_text: str = "", **labels):
+        """
+        Add to a counter (names should end in _total)
+
+        Args:
+            name: Metric name without the prefix
+            value: Non-negative increment
+            help_text: Description shown in the HELP line
+            labels: Label names and values of the sample
+        """
+        if value < 0:
+            raise ValueError("Counters can only increase")
+        key = _key(labels)
+        with self._lock:
+            samples = self._family(name, 'counter', help_text)['samples']
+            samples[key] = samples.get(key, 0.0) + value
+
+    def set_total(self, name: str, value: float, help_text: str = "", **labels):
+        """
+        Set a counter to a running total kept elsewhere (e.g. by LatencyTracker)
+
+        Args:
+            name: Metric name without the prefix
+            value: Cumulative total
+            help_text: Description shown in the HELP line
+            labels: Label names and values of the sample
+        """
+        with self._lock:
+            self._family(name, 'counter', help_text)['samples'][_key(labels)] = float(value)
+
+    def set(self, name: str, value: float, help_text: str = "", **labels):
+        """
+        Set a gauge
+
+        Args:
+            name: Metric name without the prefix
+            value: Current value
+            help_text: Description shown in the HELP line
+            labels: Label names and values of the sample
+        """
+        with self._lock:
+            self._family(name, 'gauge', help_text)['samples'][_key(labels)] = float(value)
+
+    def render(self) -> str:
+        """
+        Format every family in the Prometheus text exposition format
+
+        Returns:
+            Exposition text, families sorted by name
+        """
+        lines = []
+        with self._lock:
+            for name in sorted(self._families):
+                family = self._families[name]
+                full_name = self.prefix + name
+                if family['help']:
+                    lines.append(f"# HELP {full_name} {family['help']}")
+                lines.append(f"# TYPE {full_name} {family['kind']}")
+                for key, value in sorted(family['samples'].items()):
+                    labels = ",".join(f'{label}="{_escape(label_value)}"' for label, label_value in key)
+                    lines.append(f"{full_name}{{{labels}}} {_format_value(value)}" if labels
+                                 else f"{full_name} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: Path):
+        """
+        Write the metrics for node_exporter's textfile collector
+
+        The file is written next to its destination and renamed into place,
+        so the collector never reads a half-written file.
+
+        Args:
+            path: Destination .prom file
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(self.render())
+        os.replace(tmp_path, path)
+        logger.info(f"Metrics written to {path}")
+
+
+# Registry of the current process
+METRICS = MetricsRegistry()
+
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    """HTTP handler serving GET /metrics"""
+
+    registry: MetricsRegistry = METRICS
+
+    def do_GET(self):
+        if self.path != '/metrics':
+            self.send_error(404)
+            return
+        send_metrics(self, self.registry)
+
+    def log_message(self, format, *args):
+        # Scrapes every few seconds would flood the logs
+        pass
+
+
+def send_metrics(handler: BaseHTTPRequestHandler, registry: MetricsRegistry = METRICS):
+    """
+    Answer an HTTP request with the exposition text of a registry
+
+    Args:
+        handler: Request handler to respond with
+        registry: Registry to render
+    """
+    body = registry.render().encode()
+    handler.send_response(200)
+    handler.send_header('Content-Type', CONTENT_TYPE)
+    handler.send_header('Content-Length', str(len(body)))
+    handler.end_headers()
+    handler.wfile.write(body)
+
+
+def start_metrics_server(host: str, port: int) -> Tuple[ThreadingHTTPServer, threading.Thread]:
+    """
+    Serve METRICS on http://host:port/metrics from a background thread
+
+    Args:
+        host: Interface to bind (keep 127.0.0.1 for local-only access)
+        port: TCP port to listen on
+
+    Returns:
+        The server and its thread; call server.shutdown() to stop it
+    """
+    server = ThreadingHTTPServer((host, port), MetricsRequestHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True)
+    thread.start()
+    logger.info(f"Serving metrics on http://{host}:{port}/metrics")
+    return server, thread
@@ -5,14 +5,32 @@ from sklearn.linear_model import LinearRegression
 from sklearn.tree import DecisionTreeRegressor
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.preprocessing import StandardScaler
+import numpy as np
+import pandas as pd
 import joblib
 import logging
+import pickle
+import threading
+import time
+import tracemalloc
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Sequence
+
+from src.evaluate import COST_COLUMNS
+from src.profiler import profiled
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Config key (in MODEL_PARAMS) -> (display name, estimator class)
+MODEL_REGISTRY = {
+    'linear_regression': ('Linear Regression', LinearRegression),
+    'decision_tree': ('Decision Tree', DecisionTreeRegressor),
+    'random_forest': ('Random Forest', RandomForestRegressor)
+}
+
+# Compact student model produced by ModelTrainer.distill
+DISTILLED_MODEL_NAME = 'Distilled Tree'
 
 class ModelTrainer:
     """Handles model training and prediction"""
@@ -28,13 +46,15 @@ class ModelTrainer:
         self.models = {}
         self.scaler = StandardScaler()
         self.fitted = False
+        self.fit_times = {}  # Wall time in seconds of every model's fit
+        # Early-exit settings for tree ensembles (None = always evaluate all trees)
+        self.early_exit = None
 
     def initialize_models(self):
         """Initialize all regression models"""
         self.models = {
-            'Linear Regression': LinearRegression(**self.model_params.get('linear_regression', {})),
-            'Decision Tree': DecisionTreeRegressor(**self.model_params.get('decision_tree', {})),
-            'Random Forest': RandomForestRegressor(**self.model_params.get('random_forest', {}))
+            name: model_class(**self.model_params.get(key, {}))
+            for key, (name, model_class) in MODEL_REGISTRY.items()
         }
         logger.info(f"Initialized {len(self.models)} models")
 
@@ -51,9 +71,14 @@ class ModelTrainer:
         """
         Train all models on the training data
 
+        A target DataFrame with one column per forecast horizon trains every
+        model once for all horizons: the trees and forest fit multi-output
+        natively and Linear Regression solves all targets in one least-squares
+        problem.
+
         Args:
             X_train: Training features
-            y_train: Training target
+            y_train: Training target (Series, or DataFrame with one column per horizon)
 
         Returns:
             Dictionary of trained models
@@ -64,10 +89,15 @@ class ModelTrainer:
         # Scale features
         X_train_scaled = self.transform_features(X_train)
 
+        n_outputs = 1 if y_train.ndim == 1 else y_train.shape[1]
+
         # Train each model
         for name, model in self.models.items():
-            logger.info(f"Training {name}...")
-            model.fit(X_train_scaled, y_train)
+            logger.info(f"Training {name}" + (f" ({n_outputs} horizons)..." if n_outputs > 1 else "..."))
+            started = time.perf_counter()
+            with profiled(f"fit {name}", 'fit'):
+                model.fit(X_train_scaled, y_train)
+            self.fit_times[name] = time.perf_counter() - started
             logger.info(f"{name} training completed")
 
         self.fitted = True
@@ -91,10 +121,28 @@ class ModelTrainer:
             raise ValueError(f"Model {model_name} not found")
 
         X_scaled = self.transform_features(X)
-        predictions = self.models[model_name].predict(X_scaled)
+        predictions = self.predict_scaled(model_name, X_scaled)
 
         return predictions
 
+    def predict_scaled(self, model_name: str, X_scaled):
+        """
+        Predict on already scaled features, honoring the early-exit setting
+
+        Args:
+            model_name: Name of the model to use
+            X_scaled: Scaled features
+
+        Returns:
+            Predictions array
+        """
+        model = self.models[model_name]
+        with profiled(f"predict {model_name}", 'predict'):
+            if self.early_exit is not None and hasattr(model, 'estimators_'):
+                predictions, _ = self._predict_progressive_scaled(model, X_scaled, **self.early_exit)
+                return predictions
+            return model.predict(X_scaled)
+
     def predict_all(self, X):
         """
         Make predictions using all models
@@ -108,12 +156,315 @@ class ModelTrainer:
         predictions = {}
         X_scaled = self.transform_features(X)
 
-        for name, model in self.models.items():
-            predictions[name] = model.predict(X_scaled)
+        for name in self.models:
+            predictions[name] = self.predict_scaled(name, X_scaled)
             logger.info(f"Generated predictions for {name}")
 
         return predictions
 
+    def predict_progressive(self, X, model_name: str = 'Random Forest', block_size: int = 10,
+                            min_trees: int = 20, tolerance_pct: float = 0.5, z: float = 1.96):
+        """
+        Early-exit tree ensemble prediction
+
+        Trees are evaluated in blocks while a running mean and variance are
+        kept per row. Once at least `min_trees` trees have been evaluated, a
+        row stops when the half-width of the confidence interval of its mean
+        (z * std / sqrt(n_trees)) falls below `tolerance_pct` percent of the
+        mean; later blocks only
+        run on the rows that are still uncertain.
+
+        The trees of a block run in parallel threads (n_jobs of the model), so
+        at most block_size trees run at once, against all trees for a plain
+        predict(). It wins when most rows exit after min_trees; with few early
+        exits or many cores the plain predict can be faster. The
+        'Full Predict (s)' and 'Early Exit Predict (s)' columns of
+        results/early_exit_report.csv measure it on the test split.
+
+        Args:
+            X: Features to predict on
+            model_name: Name of a fitted tree ensemble
+            block_size: Number of trees evaluated per block
+            min_trees: Minimum number of trees before a row may stop
+            tolerance_pct: Confidence interval half-width, as a percentage of the
+                predicted price, at which a row stops
+            z: Normal quantile of the confidence interval (1.96 = 95%)
+
+        Returns:
+            Tuple of (predictions, number of trees evaluated per row)
+        """
+        if not self.fitted:
+            raise ValueError("Models must be trained before prediction")
+
+        model = self.models.get(model_name)
+        if model is None or not hasattr(model, 'estimators_'):
+            raise ValueError(f"Model {model_name} is not a fitted tree ensemble")
+
+        return self._predict_progressive_scaled(model, self.transform_features(X), block_size,
+                                                min_trees, tolerance_pct, z)
+
+    @staticmethod
+    def _predict_progressive_scaled(model, X_scaled, block_size: int = 10, min_trees: int = 20,
+                                    tolerance_pct: float = 0.5, z: float = 1.96):
+        """Early-exit prediction on scaled features (see predict_progressive)"""
+        X_scaled = np.ascontiguousarray(X_scaled, dtype=np.float32)
+        estimators = model.estimators_
+        n_rows, n_outputs = len(X_scaled), model.n_outputs_
+
+        total = np.zeros((n_rows, n_outputs))
+        total_sq = np.zeros((n_rows, n_outputs))
+        n_trees = np.zeros(n_rows, dtype=int)
+        active = np.arange(n_rows)
+        lock = threading.Lock()
+
+        def accumulate(tree, X_active, block_sum, block_sq):
+            # Summed under a lock as sklearn's forests do, instead of keeping every tree's output
+            tree_pred = tree.predict(X_active, check_input=False).reshape(len(X_active), n_outputs)
+            with lock:
+                block_sum += tree_pred
+                block_sq += tree_pred ** 2
+
+        with joblib.Parallel(n_jobs=getattr(model, 'n_jobs', None), prefer='threads') as parallel:
+            for start in range(0, len(estimators), block_size):
+                block = estimators[start:start + block_size]
+                X_active = X_scaled[active]
+                block_sum = np.zeros((len(active), n_outputs))
+                block_sq = np.zeros((len(active), n_outputs))
+                parallel(joblib.delayed(accumulate)(tree, X_active, block_sum, block_sq) for tree in block)
+
+                total[active] += block_sum
+                total_sq[active] += block_sq
+                n_trees[active] += len(block)
+
+                # All active rows have seen the same number of trees
+                n = start + len(block)
+                if n < min_trees or n == len(estimators):
+                    continue
+
+                mean = total[active] / n
+                variance = np.maximum(total_sq[active] / n - mean ** 2, 0)
+                half_width = z * np.sqrt(variance / n)
+                uncertain = half_width > np.abs(mean) * tolerance_pct / 100
+                active = active[uncertain.any(axis=1)]
+                if len(active) == 0:
+                    break
+
+        predictions = total / n_trees[:, None]
+        if n_outputs == 1:
+            predictions = predictions[:, 0]
+        return predictions, n_trees
+
+    def predict_intervals(self, X, model_name: str = 'Random Forest',
+                          quantiles: Sequence[float] = (0.05, 0.95), chunk_size: int = 10000,
+                          output: int = 0):
+        """
+        Prediction intervals from the spread of per-tree predictions
+
+        Rows are processed in chunks, so only a (n_trees x chunk_size) buffer
+        is held at a time. Trees fill the buffer in parallel threads and the
+        statistics are computed across trees in one vectorized call per chunk.
+
+        Args:
+            X: Features to predict on
+            model_name: Name of a fitted tree ensemble (e.g. Random Forest)
+            quantiles: Quantiles to compute across trees
+            chunk_size: Number of rows processed per chunk
+            output: Target column to use when the model is multi-output
+
+        Returns:
+            Dictionary with 'mean', 'std' and one array per quantile keyed
+            'q<quantile>' (e.g. 'q0.05')
+        """
+        if not self.fitted:
+            raise ValueError("Models must be trained before prediction")
+
+        model = self.models.get(model_name)
+        if model is None or not hasattr(model, 'estimators_'):
+            raise ValueError(f"Model {model_name} is not a fitted tree ensemble")
+
+        # Trees expect float32 input; converting once skips per-tree validation
+        X_scaled = np.ascontiguousarray(self.transform_features(X), dtype=np.float32)
+        n_rows = len(X_scaled)
+        estimators = model.estimators_
+
+        mean = np.empty(n_rows)
+        std = np.empty(n_rows)
+        bands = np.empty((len(quantiles), n_rows))
+        buffer = np.empty((len(estimators), min(chunk_size, n_rows)))
+
+        def fill_row(i, tree, X_chunk):
+            tree_pred = tree.predict(X_chunk, check_input=False)
+            buffer[i, :len(X_chunk)] = tree_pred if tree_pred.ndim == 1 else tree_pred[:, output]
+
+        with joblib.Parallel(n_jobs=getattr(model, 'n_jobs', None), prefer='threads') as parallel:
+            for start in range(0, n_rows, chunk_size):
+                end = min(start + chunk_size, n_rows)
+                X_chunk = X_scaled[start:end]
+                parallel(joblib.delayed(fill_row)(i, tree, X_chunk) for i, tree in enumerate(estimators))
+
+                block = buffer[:, :end - start]
+                mean[start:end] = block.mean(axis=0)
+                std[start:end] = block.std(axis=0)
+                bands[:, start:end] = np.quantile(block, quantiles, axis=0)
+
+        intervals = {'mean': mean, 'std': std}
+        for q, band in zip(quantiles, bands):
+            intervals[f'q{q:g}'] = band
+
+        logger.info(f"Generated {len(quantiles)} quantile bands for {model_name} "
+                    f"across {len(estimators)} trees")
+        return intervals
+
+    def distill(self, X_train, X_eval, teacher: str = 'Random Forest', max_depth: int = 8,
+                synthetic_ratio: float = 1.0, jitter: float = 0.1, seed: int = 42) -> pd.DataFrame:
+        """
+        Distill a teacher model into a shallow decision tree for fast inference
+
+        The student is trained on the teacher's predictions over the training
+        rows plus jittered copies of them (Gaussian noise in scaled feature
+        space), so it learns the teacher's function around the data instead
+        of the noisy targets. The student is registered as DISTILLED_MODEL_NAME.
+
+        Args:
+            X_train: Training features
+            X_eval: Held-out features for measuring fidelity and latency
+            teacher: Name of the model to distill
+            max_depth: Maximum depth of the student tree
+            synthetic_ratio: Number of jittered rows per training row
+            jitter: Standard deviation of the noise, in units of feature std
+            seed: Random seed
+
+        Returns:
+            DataFrame comparing teacher and student fidelity, latency and size
+        """
+        if not self.fitted:
+            raise ValueError("Models must be trained before distillation")
+        if teacher not in self.models:
+            raise ValueError(f"Model {teacher} not found")
+
+        teacher_model = self.models[teacher]
+        rng = np.random.default_rng(seed)
+
+        X_scaled = self.transform_features(X_train)
+        n_synthetic = int(len(X_scaled) * synthetic_ratio)
+        X_synthetic = X_scaled[rng.integers(0, len(X_scaled), n_synthetic)]
+        X_synthetic = X_synthetic + rng.normal(0, jitter, X_synthetic.shape)
+        X_student = np.vstack([X_scaled, X_synthetic])
+
+        logger.info(f"Distilling {teacher} into a depth-{max_depth} tree "
+                    f"on {len(X_scaled)} real + {n_synthetic} jittered rows...")
+        student = DecisionTreeRegressor(max_depth=max_depth, random_state=seed)
+        with profiled(f"distill targets {teacher}", 'predict'):
+            y_student = teacher_model.predict(X_student)
+        started = time.perf_counter()
+        with profiled(f"fit {DISTILLED_MODEL_NAME}", 'fit'):
+            student.fit(X_student, y_student)
+        self.fit_times[DISTILLED_MODEL_NAME] = time.perf_counter() - started
+        self.models[DISTILLED_MODEL_NAME] = student
+
+        # Fidelity, latency and size on held-out data
+        X_eval_scaled = self.transform_features(X_eval)
+        with profiled(f"distill targets {teacher}", 'predict'):
+            teacher_pred = teacher_model.predict(X_eval_scaled)
+        report = {}
+        # One section around the timing loop, so profiling does not skew the single-row latencies
+        with profiled("distill fidelity report", 'predict'):
+            for name, model in [(teacher, teacher_model), (DISTILLED_MODEL_NAME, student)]:
+                started = time.perf_counter()
+                pred = model.predict(X_eval_scaled)
+                batch_time = time.perf_counter() - started
+
+                single_row = []
+                for i in range(min(50, len(X_eval_scaled))):
+                    started = time.perf_counter()
+                    model.predict(X_eval_scaled[i:i + 1])
+                    single_row.append(time.perf_counter() - started)
+
+                residual = np.asarray(teacher_pred - pred)
+                report[name] = {
+                    'Fidelity RMSE': np.sqrt(np.mean(residual ** 2)),
+                    'Fidelity MAPE': np.mean(np.abs(residual / teacher_pred)) * 100,
+                    'Batch µs/row': batch_time / len(X_eval_scaled) * 1e6,
+                    'Single-row ms': np.median(single_row) * 1000,
+                    'Size (KB)': len(pickle.dumps(model)) / 1024
+                }
+
+        report_df = pd.DataFrame(report).T
+        student_report = report_df.loc[DISTILLED_MODEL_NAME]
+        logger.info(f"{DISTILLED_MODEL_NAME}: {student_report['Fidelity MAPE']:.3f}% from {teacher}, "
+                    f"{report_df.loc[teacher, 'Batch µs/row'] / student_report['Batch µs/row']:.1f}x faster, "
+                    f"{report_df.loc[teacher, 'Size (KB)'] / student_report['Size (KB)']:.1f}x smaller than {teacher}")
+        return report_df
+
+    def benchmark_models(self, X, n_single_rows: int = 200, batch_repeats: int = 3) -> pd.DataFrame:
+        """
+        Measure what every model costs to train, store and run
+
+        All models are timed by the same harness on the same scaled rows:
+        one warm-up call, batch throughput as the best of batch_repeats
+        predictions over all rows, and single-row latency over the first
+        n_single_rows rows one at a time. Scaling is excluded, since it
+        costs the same for every model. Memory is what the model occupies
+        once unpickled, traced with tracemalloc.
+
+        Args:
+            X: Features to predict on (e.g. the test split)
+            n_single_rows: Rows timed one at a time for the latency percentiles
+            batch_repeats: Timed predictions over all rows
+
+        Returns:
+            DataFrame indexed by model name with the COST_COLUMNS
+        """
+        if not self.fitted:
+            raise ValueError("Models must be trained before benchmarking")
+
+        X_scaled = self.transform_features(X)
+        single_rows = [X_scaled[i:i + 1] for i in range(min(n_single_rows, len(X_scaled)))]
+        costs = {}
+        for name, model in self.models.items():
+            model.predict(single_rows[0])  # Warm-up
+
+            batch_times = []
+            for _ in range(batch_repeats):
+                started = time.perf_counter()
+                model.predict(X_scaled)
+                batch_times.append(time.perf_counter() - started)
+
+            latencies = []
+            for row in single_rows:
+                started = time.perf_counter()
+                model.predict(row)
+                latencies.append(time.perf_counter() - started)
+
+            serialized = pickle.dumps(model)
+            costs[name] = {
+                'Train Time (s)': self.fit_times.get(name, np.nan),
+                'Throughput (rows/s)': len(X_scaled) / min(batch_times),
+                'p50 Latency (ms)': np.percentile(latencies, 50) * 1000,
+                'p99 Latency (ms)': np.percentile(latencies, 99) * 1000,
+                'Size (KB)': len(serialized) / 1024,
+                'Memory (MB)': self._resident_mb(serialized)
+            }
+            logger.info(f"{name}: {costs[name]['Throughput (rows/s)']:,.0f} rows/s, "
+                        f"p99 {costs[name]['p99 Latency (ms)']:.3f} ms, {costs[name]['Memory (MB)']:.2f} MB")
+
+        return pd.DataFrame(costs).T[COST_COLUMNS]
+
+    @staticmethod
+    def _resident_mb(serialized: bytes) -> float:
+        """Memory allocated by unpickling a model (NumPy arrays included), in MB"""
+        # Reuse a running trace (e.g. --profile tracemalloc) instead of stopping it
+        tracing = tracemalloc.is_tracing()
+        if not tracing:
+            tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        model = pickle.loads(serialized)
+        resident = tracemalloc.get_traced_memory()[0] - before
+        del model
+        if not tracing:
+            tracemalloc.stop()
+        return resident / 1024 ** 2
+
     def save_models(self, save_dir: Path):
         """
         Save trained models and scaler to disk
@@ -129,17 +480,29 @@ class ModelTrainer:
         logger.info(f"Saved scaler to {scaler_path}")
 
         # Save each model
-        for name, model in self.models.items():
-            model_path = save_dir / f"{name.lower().replace(' ', '_')}.pkl"
-            joblib.dump(model, model_path)
-            logger.info(f"Saved {name} to {model_path}")
+        for name in self.models:
+            self.save_model(name, save_dir)
+
+    def save_model(self, model_name: str, save_dir: Path):
+        """
+        Save a single trained model to disk
+
+        Args:
+            model_name: Name of the model to save
+            save_dir: Directory to save the model
+        """
+        save_dir.mkdir(parents=True, exist_ok=True)
+        model_path = save_dir / f"{model_name.lower().replace(' ', '_')}.pkl"
+        joblib.dump(self.models[model_name], model_path)
+        logger.info(f"Saved {model_name} to {model_path}")
 
-    def load_models(self, load_dir: Path):
+    def load_models(self, load_dir: Path, model_names: Optional[Sequence[str]] = None):
         """
         Load trained models and scaler from disk
 
         Args:
             load_dir: Directory to load models from
+            model_names: Only load these models (default: every saved model)
         """
         # Load scaler
         scaler_path = load_dir / "scaler.pkl"
@@ -147,11 +510,16 @@ class ModelTrainer:
         logger.info(f"Loaded scaler from {scaler_path}")
 
         # Load models
-        model_files = {
-            'Linear Regression': 'linear_regression.pkl',
-            'Decision Tree': 'decision_tree.pkl',
-            'Random Forest': 'random_forest.pkl'
-        }
+        model_files = {name: f"{key}.pkl" for key, (name, _) in MODEL_REGISTRY.items()}
+        model_files[DISTILLED_MODEL_NAME] = f"{DISTILLED_MODEL_NAME.lower().replace(' ', '_')}.pkl"
+        if model_names is not None:
+            unknown = [name for name in model_names if name not in model_files]
+            if unknown:
+                raise ValueError(f"Unknown models: {', '.join(unknown)} (models: {', '.join(model_files)})")
+            missing = [name for name in model_names if not (load_dir / model_files[name]).exists()]
+            if missing:
+                raise FileNotFoundError(f"No saved model in {load_dir} for: {', '.join(missing)}")
+            model_files = {name: model_files[name] for name in model_names}
 
         for name, filename in model_files.items():
             model_path = load_dir / filename
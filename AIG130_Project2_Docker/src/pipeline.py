@@ -0,0 +1,198 @@
+"""
+Stage executor with checkpoints for the training pipeline
+
+Each stage declares the state keys it reads and writes. After a stage runs,
+its outputs are saved to a checkpoint keyed by a hash of the run settings
+and the keys of the upstream checkpoints it depends on, so a changed
+setting or upstream stage invalidates everything downstream. A later run
+can resume from the last valid checkpoint instead of starting over.
+"""
+import joblib
+import logging
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from src.manifest import fingerprint
+from src.metrics import METRICS
+from src.profiler import profiled
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def record_stage_metrics(stage: str, seconds: float, rows: Optional[int] = None):
+    """
+    Record the duration and, if known, the rows of one stage run in METRICS
+
+    Args:
+        stage: Stage name (label value)
+        seconds: Wall time of the run
+        rows: Rows the stage processed
+    """
+    METRICS.set('stage_duration_seconds', seconds, help_text="Wall time of the last run of each stage",
+                stage=stage)
+    if rows is not None:
+        METRICS.inc('rows_processed_total', rows, help_text="Rows processed per stage", stage=stage)
+        METRICS.set('rows_per_second', rows / seconds if seconds > 0 else 0.0,
+                    help_text="Rows per second of the last run of each stage", stage=stage)
+
+
+class Stage:
+    """One pipeline step: a function from input state keys to output state keys"""
+
+    def __init__(self, name: str, func: Callable, inputs: List[str], outputs: List[str],
+                 checkpoint: bool = True, rows: Optional[Callable[[Dict], int]] = None):
+        """
+        Initialize a stage
+
+        Args:
+            name: Stage name (used for --from-stage and checkpoint files)
+            func: Called with the input values as keyword arguments; returns a
+                dictionary with every output key
+            inputs: State keys the stage reads
+            outputs: State keys the stage writes
+            checkpoint: Save the outputs after the stage runs. Disable for
+                stages that are cheap to rerun or whose outputs cannot be
+                pickled; their outputs may only feed later stages without checkpoints
+            rows: Optional function of the state after the stage returning the
+                number of rows it processed, for the rows metrics
+        """
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.checkpoint = checkpoint
+        self.rows = rows
+
+
+class StagePipeline:
+    """Runs stages in order, checkpointing their outputs"""
+
+    def __init__(self, stages: List[Stage], checkpoint_dir: Path, settings_hash: str,
+                 on_checkpoint: Optional[Callable[[Path, List[Path]], None]] = None):
+        """
+        Initialize the pipeline
+
+        Args:
+            stages: Stages in execution order; every input must be an output
+                of an earlier stage or an initial state key
+            checkpoint_dir: Directory of the checkpoint files
+            settings_hash: Hash of everything outside the state that affects
+                the results (config, data file, CLI options)
+            on_checkpoint: Optional callback after a checkpoint is written, with
+                its path and the stale checkpoints just deleted (e.g. to
+                mirror the directory to S3 so the next container can resume)
+        """
+        self.stages = stages
+        self.checkpoint_dir = Path(checkpoint_dir)
+        self.settings_hash = settings_hash
+        self.on_checkpoint = on_checkpoint
+        self.keys = self._stage_keys()
+
+    def _stage_keys(self) -> Dict[str, str]:
+        """Checkpoint key of every stage, chained through the stages that produce its inputs"""
+        producers, keys = {}, {}
+        for stage in self.stages:
+            upstream = sorted({producers[key] for key in stage.inputs if key in producers})
+            keys[stage.name] = fingerprint(stage.name, self.settings_hash, [keys[name] for name in upstream])
+            for key in stage.outputs:
+                producers[key] = stage.name
+        return keys
+
+    def checkpoint_path(self, stage: Stage) -> Path:
+        """Checkpoint file of a stage for the current settings"""
+        return self.checkpoint_dir / f"{stage.name}-{self.keys[stage.name]}.pkl"
+
+    def stage_names(self) -> List[str]:
+        """Names of all stages, in order"""
+        return [stage.name for stage in self.stages]
+
+    def run(self, state: Dict, resume: bool = False, from_stage: Optional[str] = None) -> Dict:
+        """
+        Run the stages
+
+        Args:
+            state: Initial state
+            resume: Skip the leading stages that have a valid checkpoint
+            from_stage: Load checkpoints of every stage before this one (they
+                must exist) and run from it
+
+        Earlier stages without a checkpoint are rerun when a stage that runs
+        needs their outputs (e.g. --from-stage upload reruns plots).
+
+        Returns:
+            Final state, with 'timings' holding the wall time of every stage run
+        """
+        names = self.stage_names()
+        if from_stage is not None and from_stage not in names:
+            raise ValueError(f"Unknown stage '{from_stage}' (stages: {', '.join(names)})")
+
+        start_index = names.index(from_stage) if from_stage is not None else 0
+        if resume and from_stage is None:
+            # Continue after the last stage whose checkpoint (and all before it) is valid
+            for i, stage in enumerate(self.stages):
+                if not stage.checkpoint:
+                    continue
+                if not self.checkpoint_path(stage).exists():
+                    break
+                start_index = i + 1
+
+        state = dict(state)
+        state.setdefault('timings', {})
+        for stage in self.stages[:start_index]:
+            if not stage.checkpoint:
+                continue
+            path = self.checkpoint_path(stage)
+            if not path.exists():
+                raise FileNotFoundError(f"No checkpoint of stage '{stage.name}' for the current settings ({path})")
+            state.update(joblib.load(path))
+            METRICS.inc('stage_checkpoint_loads_total', help_text="Stages restored from a checkpoint instead of run",
+                        stage=stage.name)
+            logger.info(f"Loaded checkpoint of stage '{stage.name}'")
+
+        if start_index:
+            logger.info(f"Resuming at stage '{names[start_index]}'" if start_index < len(names)
+                        else "Every stage has a valid checkpoint; nothing to run")
+
+        # Skipped stages without a checkpoint whose outputs are still needed, found backwards
+        needed = {key for stage in self.stages[start_index:] for key in stage.inputs}
+        rerun = []
+        for stage in reversed(self.stages[:start_index]):
+            if not stage.checkpoint and needed & set(stage.outputs):
+                rerun.insert(0, stage)
+                needed |= set(stage.inputs)
+        for stage in rerun:
+            logger.info(f"Rerunning stage '{stage.name}', which has no checkpoint, for the stages after it")
+
+        for stage in rerun + self.stages[start_index:]:
+            missing = [key for key in stage.inputs if key not in state]
+            if missing:
+                raise KeyError(f"Stage '{stage.name}' is missing inputs: {', '.join(missing)}")
+
+            started = time.perf_counter()
+            with profiled(stage.name, 'stage'):
+                outputs = stage.func(**{key: state[key] for key in stage.inputs})
+            elapsed = time.perf_counter() - started
+            state['timings'][stage.name] = elapsed
+            state.update(outputs)
+            record_stage_metrics(stage.name, elapsed, stage.rows(state) if stage.rows is not None else None)
+
+            if stage.checkpoint:
+                self.checkpoint_dir.mkdir(parents=True, exist_ok=True)
+                joblib.dump({key: outputs[key] for key in stage.outputs}, self.checkpoint_path(stage))
+                removed = self._remove_stale(stage)
+                if self.on_checkpoint is not None:
+                    self.on_checkpoint(self.checkpoint_path(stage), removed)
+
+        return state
+
+    def _remove_stale(self, stage: Stage) -> List[Path]:
+        """Delete checkpoints of a stage left by other settings; returns their paths"""
+        current = self.checkpoint_path(stage)
+        removed = []
+        for path in self.checkpoint_dir.glob(f"{stage.name}-*.pkl"):
+            if path != current:
+                path.unlink()
+                removed.append(path)
+        return removed
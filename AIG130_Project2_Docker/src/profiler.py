@@ -0,0 +1,271 @@
+"""
+Run profiler for the pipeline: wall time, CPU time, peak RSS and allocations
+
+`main.py --profile` activates one RunProfiler for the run. Pipeline stages
+and ModelTrainer fit/predict calls are wrapped in profiled() sections, which
+cost nothing while no profiler is active. Sections with the same name are
+aggregated, written to results/profile.json and logged as a table.
+"""
+import cProfile
+import io
+import json
+import logging
+import pstats
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_ACTIVE = None  # Profiler of the current run, set by RunProfiler.activate()
+
+PROC_STATUS = Path("/proc/self/status")
+PROC_CLEAR_REFS = Path("/proc/self/clear_refs")
+
+
+def _rss_mb(field: str) -> Optional[float]:
+    """Read VmRSS (current) or VmHWM (peak) of this process from /proc, in MB"""
+    try:
+        for line in PROC_STATUS.read_text().splitlines():
+            if line.startswith(field + ':'):
+                return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def current_rss_mb() -> Optional[float]:
+    """Resident set size of this process in MB (None where /proc is unavailable)"""
+    return _rss_mb('VmRSS')
+
+
+def _maxrss_mb(who: int) -> float:
+    """ru_maxrss of getrusage in MB; it is in KB on Linux and bytes on macOS"""
+    return resource.getrusage(who).ru_maxrss / (1024 ** 2 if sys.platform == 'darwin' else 1024)
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size since the last reset_peak_rss(), in MB"""
+    peak = _rss_mb('VmHWM')
+    if peak is None:
+        peak = _maxrss_mb(resource.RUSAGE_SELF)  # Lifetime peak
+    return peak
+
+
+def child_peak_rss_mb() -> float:
+    """
+    Largest peak RSS of any finished child process (e.g. plot workers), in MB
+
+    Children only count once they have exited and been waited for, and the
+    value never resets, so it is reported separately from this process's peak.
+    """
+    return _maxrss_mb(resource.RUSAGE_CHILDREN)
+
+
+def reset_peak_rss() -> bool:
+    """Reset the kernel's peak RSS counter (Linux only); returns whether it was reset"""
+    try:
+        PROC_CLEAR_REFS.write_text("5")
+        return True
+    except OSError:
+        return False
+
+
+def cpu_seconds() -> float:
+    """CPU time of this process plus its finished child processes"""
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return time.process_time() + children.ru_utime + children.ru_stime
+
+
+class RunProfiler:
+    """Collects per-section wall time, CPU time, peak RSS and optional allocations"""
+
+    def __init__(self, trace_allocations: bool = False, cprofile: bool = False, top_n: int = 10):
+        """
+        Initialize the profiler
+
+        Args:
+            trace_allocations: Record the top allocation sites of every stage with tracemalloc
+            cprofile: Run cProfile over the whole run
+            top_n: Allocation sites per stage and cProfile functions to keep
+        """
+        self.trace_allocations = trace_allocations
+        self.top_n = top_n
+        self.cprofile = cProfile.Profile() if cprofile else None
+        self.sections: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._main_thread = threading.get_ident()
+        self._run_peak = 0.0  # Peak RSS seen before any counter reset
+        self.started = None
+
+    def activate(self) -> 'RunProfiler':
+        """Make this the profiler that profiled() sections report to"""
+        global _ACTIVE
+        _ACTIVE = self
+        if self.trace_allocations:
+            tracemalloc.start()
+        if self.cprofile is not None:
+            self.cprofile.enable()
+        self.started = (time.perf_counter(), cpu_seconds())
+        return self
+
+    @contextmanager
+    def section(self, name: str, kind: str):
+        """
+        Measure one section; nested sections count towards their parents too
+
+        The peak RSS counter is reset per section on the main thread only,
+        since resetting it from worker threads would hide the main thread's peaks.
+
+        Args:
+            name: Section name, aggregated across calls
+            kind: Section kind ('stage', 'fit', 'predict', ...)
+        """
+        stack = self._local.__dict__.setdefault('stack', [])
+        track_peak = threading.get_ident() == self._main_thread
+        if track_peak:
+            peak = peak_rss_mb()
+            self._run_peak = max(self._run_peak, peak)
+            if stack:
+                stack[-1]['peak'] = max(stack[-1]['peak'], peak)
+            reset_peak_rss()
+
+        with self._lock:
+            # Registered on entry so the report lists parents before their children
+            self.sections.setdefault(name, {
+                'name': name, 'kind': kind, 'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0,
+                'peak_rss_mb': None, 'child_peak_rss_mb': None, 'rss_delta_mb': 0.0
+            })
+
+        frame = {'peak': 0.0}
+        stack.append(frame)
+        snapshot = tracemalloc.take_snapshot() if self.trace_allocations and kind == 'stage' else None
+        rss_start = current_rss_mb()
+        child_peak_start = child_peak_rss_mb()
+        wall_start, cpu_start = time.perf_counter(), cpu_seconds()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall_start, cpu_seconds() - cpu_start
+            frame['peak'] = max(frame['peak'], peak_rss_mb())
+            stack.pop()
+            if stack:
+                stack[-1]['peak'] = max(stack[-1]['peak'], frame['peak'])
+            rss_end = current_rss_mb()
+            # Only attributed to the section if a child that exited during it set a new peak
+            child_peak = child_peak_rss_mb()
+            child_peak = child_peak if child_peak > child_peak_start else None
+
+            allocations = None
+            if snapshot is not None:
+                allocations = [
+                    {'site': str(stat.traceback[0]), 'size_diff_mb': stat.size_diff / 1024 ** 2,
+                     'count_diff': stat.count_diff}
+                    for stat in tracemalloc.take_snapshot().compare_to(snapshot, 'lineno')[:self.top_n]
+                ]
+
+            self._record(name, wall, cpu, frame['peak'] if track_peak else None, child_peak,
+                         None if rss_start is None or rss_end is None else rss_end - rss_start, allocations)
+
+    def _record(self, name: str, wall: float, cpu: float, peak: Optional[float], child_peak: Optional[float],
+                rss_delta: Optional[float], allocations: Optional[List[dict]]):
+        """Fold one call into the per-name aggregate"""
+        with self._lock:
+            entry = self.sections[name]
+            entry['calls'] += 1
+            entry['wall_s'] += wall
+            entry['cpu_s'] += cpu
+            if peak is not None:
+                entry['peak_rss_mb'] = max(entry['peak_rss_mb'] or 0.0, peak)
+            if child_peak is not None:
+                entry['child_peak_rss_mb'] = max(entry['child_peak_rss_mb'] or 0.0, child_peak)
+            if rss_delta is not None:
+                entry['rss_delta_mb'] += rss_delta
+            if allocations is not None:
+                entry['top_allocations'] = allocations
+
+    def finish(self, output_path: Path) -> dict:
+        """
+        Stop profiling, write the JSON report and log the summary table
+
+        Args:
+            output_path: Path of the JSON report (e.g. results/profile.json)
+
+        Returns:
+            The report
+        """
+        global _ACTIVE
+        _ACTIVE = None
+        wall = time.perf_counter() - self.started[0]
+        cpu = cpu_seconds() - self.started[1]
+
+        report = {
+            'total': {'wall_s': wall, 'cpu_s': cpu, 'peak_rss_mb': max(
+                [self._run_peak, peak_rss_mb()] + [entry['peak_rss_mb'] or 0.0 for entry in self.sections.values()]
+            ), 'child_peak_rss_mb': child_peak_rss_mb()},
+            'sections': list(self.sections.values())
+        }
+
+        Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+        if self.trace_allocations:
+            tracemalloc.stop()
+        if self.cprofile is not None:
+            self.cprofile.disable()
+            self.cprofile.dump_stats(str(Path(output_path).with_suffix('.prof')))
+            stats = pstats.Stats(self.cprofile, stream=io.StringIO()).sort_stats('cumulative')
+            report['cprofile_top'] = [
+                {'function': f"{path}:{line}({func})", 'calls': n_calls, 'tottime_s': tottime, 'cumtime_s': cumtime}
+                for (path, line, func), (_, n_calls, tottime, cumtime, _) in
+                sorted(stats.stats.items(), key=lambda item: -item[1][3])[:self.top_n]
+            ]
+
+        with open(output_path, 'w') as f:
+            json.dump(report, f, indent=2)
+
+        self.log_summary(report)
+        logger.info(f"Profile saved to {output_path}")
+        return report
+
+    @staticmethod
+    def log_summary(report: dict):
+        """Log the sections as a table"""
+        header = (f"{'Section':<34} {'Kind':<8} {'Calls':>6} {'Wall (s)':>10} {'CPU (s)':>10} {'Peak RSS (MB)':>14} "
+                  f"{'Child Peak (MB)':>16}")
+        logger.info("=" * len(header))
+        logger.info("RUN PROFILE")
+        logger.info("=" * len(header))
+        logger.info(header)
+        logger.info("-" * len(header))
+        for entry in report['sections']:
+            peak = f"{entry['peak_rss_mb']:,.0f}" if entry['peak_rss_mb'] is not None else "-"
+            child_peak = f"{entry['child_peak_rss_mb']:,.0f}" if entry['child_peak_rss_mb'] is not None else "-"
+            logger.info(f"{entry['name'][:34]:<34} {entry['kind']:<8} {entry['calls']:>6} "
+                        f"{entry['wall_s']:>10.2f} {entry['cpu_s']:>10.2f} {peak:>14} {child_peak:>16}")
+        total = report['total']
+        logger.info("-" * len(header))
+        logger.info(f"{'Total':<34} {'':<8} {'':>6} {total['wall_s']:>10.2f} {total['cpu_s']:>10.2f} "
+                    f"{total['peak_rss_mb']:>14,.0f} {total['child_peak_rss_mb']:>16,.0f}")
+        logger.info("=" * len(header))
+
+
+@contextmanager
+def profiled(name: str, kind: str = 'section'):
+    """
+    Profile a block if a RunProfiler is active; otherwise do nothing
+
+    Args:
+        name: Section name
+        kind: Section kind
+    """
+    if _ACTIVE is None:
+        yield
+        return
+    with _ACTIVE.section(name, kind):
+        yield
@@ -0,0 +1,266 @@
+"""
+Append-only run history for Bitcoin price prediction
+
+Every pipeline run appends one immutable Parquet file (one row per model)
+with the run's config hash, data fingerprint, metrics, stage timings and
+model sizes. Files are partitioned by year and month, and a per-run JSON
+index shard maps the run ID and timestamp to its file, so a query only
+opens the files of the runs it asks for and only reads the columns it
+needs. Every file a run writes has a unique name, so stores of several
+machines (e.g. ECS tasks sharing one S3 prefix) merge by copying files.
+"""
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+import hashlib
+import json
+import logging
+import os
+import pickle
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+INDEX_DIR = "_index"
+
+# Index entries already read, per store root: {root: {run_id: entry}}, shared by every store of the process
+_INDEX_CACHE: Dict[Path, Dict[str, dict]] = {}
+
+
+def config_hash(config_module) -> str:
+    """
+    Hash the settings of a config module
+
+    Only upper-case, JSON-serializable settings are hashed; paths are left
+    out so the same settings hash identically on every machine.
+
+    Args:
+        config_module: Imported config module
+
+    Returns:
+        Short hex digest
+    """
+    settings = {}
+    for name in dir(config_module):
+        value = getattr(config_module, name)
+        if not name.isupper() or isinstance(value, Path):
+            continue
+        try:
+            settings[name] = json.loads(json.dumps(value))
+        except TypeError:
+            continue
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def fingerprint_data(df: pd.DataFrame) -> str:
+    """
+    Hash the contents and index of a DataFrame
+
+    Args:
+        df: Raw input data
+
+    Returns:
+        Short hex digest
+    """
+    return hashlib.sha256(pd.util.hash_pandas_object(df, index=True).values.tobytes()).hexdigest()[:16]
+
+
+def model_sizes_kb(models: Dict) -> Dict[str, float]:
+    """
+    Serialized size of every model
+
+    Args:
+        models: Dictionary of {model_name: model}
+
+    Returns:
+        Dictionary of {model_name: size in KB}
+    """
+    return {name: len(pickle.dumps(model)) / 1024 for name, model in models.items()}
+
+
+class RunHistoryStore:
+    """Append-only, columnar store of per-run model metrics"""
+
+    def __init__(self, root: Path):
+        """
+        Initialize the store
+
+        Args:
+            root: Root directory of the store
+        """
+        self.root = Path(root)
+        self.index_dir = self.root / INDEX_DIR
+
+    def append(self, comparison_df: pd.DataFrame, config_hash: str, data_fingerprint: str,
+               timings: Dict[str, float], model_sizes: Dict[str, float],
+               run_id: Optional[str] = None, timestamp: Optional[datetime] = None, status: str = 'ok') -> str:
+        """
+        Record one run
+
+        Args:
+            comparison_df: Metrics indexed by model name
+            config_hash: Hash of the run's settings
+            data_fingerprint: Hash of the input data
+            timings: Wall time in seconds per pipeline stage
+            model_sizes: Serialized size in KB per model
+            run_id: Optional run ID (default: timestamp plus a random suffix)
+            timestamp: Optional run time (default: now)
+            status: 'ok', or 'degraded' if the run finished with missing outputs (e.g. failed plots)
+
+        Returns:
+            The run ID
+        """
+        timestamp = timestamp or datetime.now()
+        run_id = run_id or f"{timestamp:%Y%m%d_%H%M%S}_{uuid.uuid4().hex[:6]}"
+
+        runs_df = comparison_df.rename_axis('model').reset_index()
+        runs_df.insert(0, 'run_id', run_id)
+        runs_df.insert(1, 'timestamp', pd.Timestamp(timestamp))
+        runs_df.insert(2, 'config_hash', config_hash)
+        runs_df.insert(3, 'data_fingerprint', data_fingerprint)
+        runs_df.insert(4, 'status', status)
+        runs_df['size_kb'] = runs_df['model'].map(model_sizes)
+        for stage, seconds in timings.items():
+            runs_df[f'time_{stage}_s'] = seconds
+
+        relative_path = Path(f"year={timestamp:%Y}") / f"month={timestamp:%m}" / f"run-{run_id}.parquet"
+        (self.root / relative_path).parent.mkdir(parents=True, exist_ok=True)
+        runs_df.to_parquet(self.root / relative_path, index=False)
+
+        self._append_index([{
+            'run_id': run_id,
+            'timestamp': pd.Timestamp(timestamp).isoformat(),
+            'path': relative_path.as_posix(),
+            'config_hash': config_hash,
+            'data_fingerprint': data_fingerprint,
+            'status': status
+        }])
+
+        logger.info(f"Recorded run {run_id} in {self.root}")
+        return run_id
+
+    def _append_index(self, entries: List[dict]):
+        """Write one index shard per run; existing shards are never rewritten"""
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        for entry in entries:
+            with open(self.index_shard_path(entry['run_id']), 'w') as f:
+                json.dump(entry, f)
+
+    def index_shard_path(self, run_id: str) -> Path:
+        """Path of a run's index shard"""
+        return self.index_dir / f"{run_id}.json"
+
+    def run_files(self, run_id: str) -> List[Path]:
+        """
+        Files written for a run
+
+        Args:
+            run_id: Run ID
+
+        Returns:
+            Paths of the run's Parquet file and index shard
+        """
+        shard_path = self.index_shard_path(run_id)
+        with open(shard_path) as f:
+            entry = json.load(f)
+        return [self.root / entry['path'], shard_path]
+
+    def _index_missing_runs(self, indexed_paths: set) -> List[dict]:
+        """
+        Index run files that have no index shard
+
+        Happens when run files from several machines are synced into one
+        store (e.g. from S3). Only the key columns of the new files are read.
+        """
+        entries = []
+        for path in sorted(self.root.glob("year=*/month=*/run-*.parquet")):
+            relative_path = path.relative_to(self.root).as_posix()
+            if relative_path in indexed_paths:
+                continue
+            keys = pq.read_table(path, columns=['run_id', 'timestamp', 'config_hash', 'data_fingerprint'])
+            first = keys.slice(0, 1).to_pylist()[0]
+            entries.append({**first, 'timestamp': pd.Timestamp(first['timestamp']).isoformat(),
+                            'path': relative_path})
+
+        if entries:
+            self._append_index(entries)
+            logger.info(f"Indexed {len(entries)} run files missing from {self.index_dir}")
+        return entries
+
+    def runs(self) -> pd.DataFrame:
+        """
+        List recorded runs, oldest first
+
+        Index entries are cached per process: later calls only open the
+        shards added since, and run files without a shard are looked for
+        once, on the first call.
+
+        Returns:
+            DataFrame indexed by run ID with timestamp, path and hashes
+        """
+        cache_key = self.root.resolve()
+        first_call = cache_key not in _INDEX_CACHE
+        indexed = _INDEX_CACHE.setdefault(cache_key, {})
+
+        if self.index_dir.exists():
+            for shard_name in os.listdir(self.index_dir):
+                run_id = shard_name[:-len(".json")]
+                if shard_name.endswith(".json") and run_id not in indexed:
+                    with open(self.index_dir / shard_name) as f:
+                        indexed[run_id] = json.load(f)
+        if first_call:
+            for entry in self._index_missing_runs({entry['path'] for entry in indexed.values()}):
+                indexed[entry['run_id']] = entry
+
+        if not indexed:
+            return pd.DataFrame(columns=['timestamp', 'path', 'config_hash', 'data_fingerprint', 'status'])
+
+        runs_df = pd.DataFrame(list(indexed.values()))
+        runs_df['timestamp'] = pd.to_datetime(runs_df['timestamp'])
+        return runs_df.set_index('run_id').sort_values('timestamp')
+
+    def query(self, columns: Optional[List[str]] = None, model: Optional[str] = None,
+              last_n: Optional[int] = None, since=None, run_ids: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Read recorded metrics, touching only the matching runs and columns
+
+        Example: RMSE trend of the Random Forest over the last 90 runs::
+
+            store.query(columns=['RMSE'], model='Random Forest', last_n=90)
+
+        Args:
+            columns: Columns to read besides run_id, timestamp and model (default: all)
+            model: Only rows of this model
+            last_n: Only the most recent N runs
+            since: Only runs at or after this time
+            run_ids: Only these runs
+
+        Returns:
+            DataFrame with one row per (run, model), oldest first
+        """
+        runs_df = self.runs()
+        if run_ids is not None:
+            runs_df = runs_df[runs_df.index.isin(run_ids)]
+        if since is not None:
+            runs_df = runs_df[runs_df['timestamp'] >= pd.Timestamp(since)]
+        if last_n is not None:
+            runs_df = runs_df.tail(last_n)
+        if runs_df.empty:
+            return pd.DataFrame()
+
+        paths = [str(self.root / path) for path in runs_df['path']]
+        # Later runs may add columns; footers are enough to build the union schema
+        schema = pa.unify_schemas([pq.read_schema(path) for path in paths])
+        dataset = ds.dataset(paths, schema=schema, format='parquet')
+
+        if columns is not None:
+            keys = ['run_id', 'timestamp', 'model']
+            columns = keys + [column for column in columns if column not in keys]
+        row_filter = ds.field('model') == model if model is not None else None
+        table = dataset.to_table(columns=columns, filter=row_filter)
+        return table.to_pandas().sort_values(['timestamp', 'model']).reset_index(drop=True)
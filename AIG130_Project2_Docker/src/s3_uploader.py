@@ -4,14 +4,20 @@ Uploads results, models, and plots to S3 bucket
 """
 import os
 import logging
+import time
 from pathlib import Path
+from typing import Callable, List
 import boto3
 from botocore.exceptions import ClientError
 
+from src.manifest import load_manifest, save_manifest
+from src.metrics import METRICS
+
 logger = logging.getLogger(__name__)
 
 
-def upload_directory_to_s3(local_dir: Path, s3_bucket: str, s3_prefix: str) -> int:
+def upload_directory_to_s3(local_dir: Path, s3_bucket: str, s3_prefix: str, exclude: Path = None,
+                           delete_missing: bool = False) -> int:
     """
     Upload all files from a directory to S3
 
@@ -19,6 +25,10 @@ def upload_directory_to_s3(local_dir: Path, s3_bucket: str, s3_prefix: str) -> i
         local_dir: Local directory path
         s3_bucket: S3 bucket name
         s3_prefix: S3 key prefix (folder path in S3)
+        exclude: Optional subdirectory to leave out
+        delete_missing: Delete objects under the prefix that have no local
+            file, making the prefix a mirror of the directory. Only use on a
+            directory that was downloaded from the prefix first.
 
     Returns:
         Number of files uploaded
@@ -28,36 +38,162 @@ def upload_directory_to_s3(local_dir: Path, s3_bucket: str, s3_prefix: str) -> i
         return 0
 
     s3_client = boto3.client('s3')
+    # Run IDs are left out of the label so every run reports the same series
+    prefix_label = s3_prefix.split('/')[0]
     uploaded_count = 0
+    skipped_count = 0
+    # Manifests (e.g. of results/plots) per directory, to skip files already uploaded unchanged
+    manifests = {}
 
     # Walk through all files in directory
     for file_path in local_dir.rglob('*'):
+        if exclude is not None and exclude in file_path.parents:
+            continue
         if file_path.is_file():
             # Calculate relative path for S3 key
             relative_path = file_path.relative_to(local_dir)
             s3_key = f"{s3_prefix}/{relative_path}".replace("\\", "/")
+            s3_uri = f"s3://{s3_bucket}/{s3_key}"
+
+            if file_path.parent not in manifests:
+                manifests[file_path.parent] = load_manifest(file_path.parent)
+            entry = manifests[file_path.parent].get(file_path.name)
+            if entry and entry.get('uploaded', {}).get(s3_uri) == entry['fingerprint']:
+                skipped_count += 1
+                METRICS.inc('s3_upload_files_total', help_text="Files handled by S3 uploads",
+                            prefix=prefix_label, result='skipped')
+                continue
 
             try:
-                logger.info(f"Uploading {file_path.name} to s3://{s3_bucket}/{s3_key}")
+                logger.info(f"Uploading {file_path.name} to {s3_uri}")
+                started = time.perf_counter()
                 s3_client.upload_file(
                     str(file_path),
                     s3_bucket,
                     s3_key
                 )
+                METRICS.inc('s3_upload_seconds_total', time.perf_counter() - started,
+                            help_text="Time spent uploading to S3", prefix=prefix_label)
+                METRICS.inc('s3_upload_bytes_total', file_path.stat().st_size,
+                            help_text="Bytes uploaded to S3", prefix=prefix_label)
+                METRICS.inc('s3_upload_files_total', help_text="Files handled by S3 uploads",
+                            prefix=prefix_label, result='uploaded')
                 uploaded_count += 1
                 logger.info(f"✓ Uploaded: {file_path.name}")
+                if entry:
+                    entry.setdefault('uploaded', {})[s3_uri] = entry['fingerprint']
             except ClientError as e:
+                METRICS.inc('s3_upload_files_total', help_text="Files handled by S3 uploads",
+                            prefix=prefix_label, result='failed')
                 logger.error(f"Failed to upload {file_path.name}: {e}")
 
+    for directory, manifest in manifests.items():
+        if manifest:
+            save_manifest(directory, manifest)
+
+    if delete_missing:
+        local_keys = {
+            f"{s3_prefix}/{path.relative_to(local_dir).as_posix()}" for path in local_dir.rglob('*') if path.is_file()
+        }
+        paginator = s3_client.get_paginator('list_objects_v2')
+        stale_keys = [
+            obj['Key'] for page in paginator.paginate(Bucket=s3_bucket, Prefix=f"{s3_prefix}/")
+            for obj in page.get('Contents', []) if obj['Key'] not in local_keys
+        ]
+        delete_from_s3(s3_bucket, stale_keys)
+        if stale_keys:
+            logger.info(f"Deleted {len(stale_keys)} objects no longer present locally from s3://{s3_bucket}/{s3_prefix}")
+    if skipped_count:
+        logger.info(f"Skipped {skipped_count} unchanged files already at s3://{s3_bucket}/{s3_prefix}")
+
     return uploaded_count
 
 
+def upload_file_to_s3(file_path: Path, s3_bucket: str, s3_key: str):
+    """
+    Upload one file to S3, raising on failure
+
+    Args:
+        file_path: Local file path
+        s3_bucket: S3 bucket name
+        s3_key: Destination S3 object key
+    """
+    started = time.perf_counter()
+    boto3.client('s3').upload_file(str(file_path), s3_bucket, s3_key)
+    prefix_label = s3_key.split('/')[0]
+    METRICS.inc('s3_upload_seconds_total', time.perf_counter() - started,
+                help_text="Time spent uploading to S3", prefix=prefix_label)
+    METRICS.inc('s3_upload_bytes_total', file_path.stat().st_size,
+                help_text="Bytes uploaded to S3", prefix=prefix_label)
+    METRICS.inc('s3_upload_files_total', help_text="Files handled by S3 uploads",
+                prefix=prefix_label, result='uploaded')
+    logger.info(f"✓ Uploaded {file_path.name} to s3://{s3_bucket}/{s3_key}")
+
+
+def delete_from_s3(s3_bucket: str, s3_keys: List[str]):
+    """
+    Delete objects from S3
+
+    Args:
+        s3_bucket: S3 bucket name
+        s3_keys: Object keys to delete
+    """
+    s3_client = boto3.client('s3')
+    # delete_objects takes at most 1000 keys per call
+    for start in range(0, len(s3_keys), 1000):
+        s3_client.delete_objects(
+            Bucket=s3_bucket,
+            Delete={'Objects': [{'Key': key} for key in s3_keys[start:start + 1000]]}
+        )
+
+
+def download_directory_from_s3(s3_bucket: str, s3_prefix: str, local_dir: Path,
+                               include: Callable[[str], bool] = None) -> int:
+    """
+    Download every object under an S3 prefix into a local directory
+
+    Errors are raised, not logged: callers use this to restore state (e.g.
+    the inference watermark) that must not silently start over.
+
+    Args:
+        s3_bucket: S3 bucket name
+        s3_prefix: S3 key prefix (folder path in S3)
+        local_dir: Local directory path
+        include: Optional filter on the key relative to the prefix; only
+            matching objects are downloaded
+
+    Returns:
+        Number of files downloaded
+    """
+    s3_client = boto3.client('s3')
+    downloaded_count = 0
+
+    paginator = s3_client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=s3_bucket, Prefix=f"{s3_prefix}/"):
+        for obj in page.get('Contents', []):
+            relative_key = obj['Key'][len(s3_prefix) + 1:]
+            if include is not None and not include(relative_key):
+                continue
+            local_path = local_dir / relative_key
+            local_path.parent.mkdir(parents=True, exist_ok=True)
+            started = time.perf_counter()
+            s3_client.download_file(s3_bucket, obj['Key'], str(local_path))
+            METRICS.inc('s3_download_seconds_total', time.perf_counter() - started,
+                        help_text="Time spent downloading from S3")
+            METRICS.inc('s3_download_bytes_total', obj['Size'], help_text="Bytes downloaded from S3")
+            downloaded_count += 1
+
+    logger.info(f"Downloaded {downloaded_count} files from s3://{s3_bucket}/{s3_prefix} to {local_dir}")
+    return downloaded_count
+
+
 def upload_results_to_s3(
     results_dir: Path,
     models_dir: Path,
     plots_dir: Path,
     s3_bucket: str,
-    run_id: str = None
+    run_id: str = None,
+    wait_for_plots: Callable = None
 ) -> dict:
     """
     Upload all pipeline results to S3
@@ -68,6 +204,8 @@ def upload_results_to_s3(
         plots_dir: Plots directory path
         s3_bucket: S3 bucket name
         run_id: Optional run identifier (timestamp or commit SHA)
+        wait_for_plots: Optional callable that blocks until plots still rendering
+            are done; results and models are uploaded first in the meantime
 
     Returns:
         Dictionary with upload statistics
@@ -95,7 +233,9 @@ def upload_results_to_s3(
     stats['results'] = upload_directory_to_s3(
         results_dir,
         s3_bucket,
-        f"results/{run_id}"
+        f"results/{run_id}",
+        # Plots may still be half-written; they are uploaded below once done
+        exclude=plots_dir if wait_for_plots is not None else None
     )
 
     # Upload models
@@ -107,6 +247,8 @@ def upload_results_to_s3(
     )
 
     # Upload plots
+    if wait_for_plots is not None:
+        wait_for_plots()
     logger.info("\nUploading plots...")
     stats['plots'] = upload_directory_to_s3(
         plots_dir,
@@ -0,0 +1,464 @@
+"""
+Long-running prediction service for Bitcoin price prediction
+
+Keeps the trained models, scaler and the rolling OHLCV history needed for
+features warm in memory, and serves predictions over a local HTTP endpoint.
+Concurrent requests are coalesced into micro-batches so the models run once
+per batch instead of once per request.
+"""
+import numpy as np
+import pandas as pd
+import json
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from src.data_loader import iter_bitcoin_data_chunks
+from src.drift import DRIFT_SKETCH_FILE, HistogramSketch, drift_scores
+from src.ensemble import ENSEMBLE_MODEL_NAME
+from src.feature_engineering import create_features, load_feature_state
+from src.inference import load_scoring_models, predictions_to_frame, select_sketch_models
+from src.metrics import METRICS, send_metrics
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class LatencyTracker:
+    """Thread-safe record of recent request latencies and throughput"""
+
+    def __init__(self, window: int = 10000):
+        """
+        Initialize the tracker
+
+        Args:
+            window: Number of most recent requests kept for percentiles
+        """
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+        self.requests = 0
+        self.rows = 0
+        self.batches = 0
+        self.batched_rows = 0
+
+    def record_request(self, latency_s: float, n_rows: int):
+        """Record one completed request"""
+        with self._lock:
+            self._latencies.append(latency_s)
+            self.requests += 1
+            self.rows += n_rows
+
+    def record_batch(self, n_rows: int):
+        """Record one micro-batch sent to the models"""
+        with self._lock:
+            self.batches += 1
+            self.batched_rows += n_rows
+
+    def summary(self) -> Dict[str, float]:
+        """
+        Summarize latency and throughput since the service started
+
+        Returns:
+            Dictionary of latency percentiles (ms) and throughput figures
+        """
+        with self._lock:
+            latencies = np.array(self._latencies) * 1000
+            elapsed = time.perf_counter() - self._started
+            return {
+                'requests': self.requests,
+                'rows': self.rows,
+                'p50_ms': float(np.percentile(latencies, 50)) if len(latencies) else 0.0,
+                'p99_ms': float(np.percentile(latencies, 99)) if len(latencies) else 0.0,
+                'requests_per_s': self.requests / elapsed,
+                'rows_per_s': self.rows / elapsed,
+                'batches': self.batches,
+                'avg_batch_rows': self.batched_rows / self.batches if self.batches else 0.0,
+                'uptime_s': elapsed
+            }
+
+
+def record_serving_metrics(stats: Dict[str, float]):
+    """
+    Copy a LatencyTracker summary into METRICS (called per scrape, not per request)
+
+    Args:
+        stats: Output of LatencyTracker.summary()
+    """
+    METRICS.set_total('serving_requests_total', stats['requests'], help_text="Prediction requests served")
+    METRICS.set_total('serving_rows_total', stats['rows'], help_text="Rows predicted by the server")
+    METRICS.set_total('serving_batches_total', stats['batches'], help_text="Micro-batches sent to the models")
+    for quantile, key in [('0.5', 'p50_ms'), ('0.99', 'p99_ms')]:
+        METRICS.set('serving_latency_seconds', stats[key] / 1000,
+                    help_text="Request latency percentile over the recent window", quantile=quantile)
+    METRICS.set('serving_rows_per_second', stats['rows_per_s'], help_text="Rows predicted per second since start")
+    METRICS.set('serving_batch_rows', stats['avg_batch_rows'], help_text="Average rows per micro-batch")
+    METRICS.set('serving_uptime_seconds', stats['uptime_s'], help_text="Seconds since the server started")
+
+
+class MicroBatcher:
+    """Coalesces concurrent prediction requests into micro-batches"""
+
+    def __init__(self, predict_fn: Callable[[np.ndarray], Dict[str, np.ndarray]],
+                 max_batch_size: int, max_wait_ms: float, tracker: LatencyTracker = None):
+        """
+        Initialize the batcher and start its worker thread
+
+        Args:
+            predict_fn: Function mapping a feature matrix to {model_name: predictions}
+            max_batch_size: Maximum number of rows per batch
+            max_wait_ms: Maximum time to wait for more requests after the first one
+            tracker: Optional LatencyTracker to record batch sizes
+        """
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_s = max_wait_ms / 1000
+        self.tracker = tracker
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self._worker.start()
+
+    def submit(self, X: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Queue a feature matrix and block until its predictions are ready
+
+        Args:
+            X: Feature matrix of shape (n_rows, n_features)
+
+        Returns:
+            Dictionary of predictions for each model
+        """
+        future = Future()
+        self._queue.put((X, future))
+        return future.result()
+
+    def close(self):
+        """Stop the worker thread after the queued requests are served"""
+        self._queue.put(None)
+        self._worker.join()
+
+    def _collect(self, first) -> tuple:
+        """Collect queued requests until the batch is full or the wait expires"""
+        batch = [first]
+        n_rows = len(first[0])
+        deadline = time.perf_counter() + self.max_wait_s
+
+        while n_rows < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+            n_rows += len(item[0])
+
+        return batch, False
+
+    def _run(self):
+        """Worker loop: run the models once per micro-batch"""
+        stop = False
+        while not stop:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch, stop = self._collect(first)
+
+            X = np.vstack([X for X, _ in batch])
+            try:
+                predictions = self.predict_fn(X)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            if self.tracker is not None:
+                self.tracker.record_batch(len(X))
+
+            offset = 0
+            for X_item, future in batch:
+                end = offset + len(X_item)
+                future.set_result({name: pred[offset:end] for name, pred in predictions.items()})
+                offset = end
+
+
+class PredictionService:
+    """Warm, in-memory prediction service built on ModelTrainer"""
+
+    def __init__(self, models_dir: Path, data_path: Path, max_batch_size: int, max_wait_ms: float,
+                 early_exit: dict = None, psi_threshold: float = 0.2, model_names: List[str] = None):
+        """
+        Load models and feature state, and seed the rolling history
+
+        Args:
+            models_dir: Directory with saved models, scaler and feature state
+            data_path: CSV file used to seed the rolling OHLCV history
+            max_batch_size: Maximum number of rows per micro-batch
+            max_wait_ms: Maximum time to wait when forming a micro-batch
+            early_exit: Optional early-exit settings for tree ensembles
+            psi_threshold: PSI above which a column is flagged as drifted
+            model_names: Models to serve (default: all; e.g. only 'Distilled Tree' for low latency)
+        """
+        self.trainer, self.ensemble = load_scoring_models(models_dir, model_names)
+        self.trainer.early_exit = early_exit
+        self.feature_state = load_feature_state(models_dir)
+        self.feature_cols = self.feature_state['feature_cols']
+        self.input_cols = self.feature_state['input_cols']  # Fields every bar must carry
+        self.warmup_rows = self.feature_state['warmup_rows']
+
+        # Batches are small, so thread pools inside the forest only add overhead
+        for model in self.trainer.models.values():
+            if hasattr(model, 'n_jobs'):
+                model.n_jobs = 1
+
+        self.history = self._load_history(data_path)
+        self._history_lock = threading.Lock()
+
+        # Served features and predictions, compared with the training sketch on GET /drift
+        self.reference_sketch = None
+        self.psi_threshold = psi_threshold
+        if (models_dir / DRIFT_SKETCH_FILE).exists():
+            self.reference_sketch = select_sketch_models(
+                HistogramSketch.load(models_dir / DRIFT_SKETCH_FILE), list(self.trainer.models)
+            )
+            self.drift_sketch = self.reference_sketch.empty_copy()
+        self._drift_lock = threading.Lock()
+
+        self.tracker = LatencyTracker()
+        self.batcher = MicroBatcher(self._predict_batch, max_batch_size, max_wait_ms, self.tracker)
+
+        # Per-request logs from the feature and model modules would flood the output
+        logging.getLogger('src.feature_engineering').setLevel(logging.WARNING)
+        logging.getLogger('src.models').setLevel(logging.WARNING)
+
+        n_models = len(self.trainer.models) + (self.ensemble is not None)
+        logger.info(f"Prediction service ready: {n_models} models, "
+                    f"{len(self.history)} history rows")
+
+    def _load_history(self, data_path: Path) -> pd.DataFrame:
+        """Read the most recent warm-up rows from the data file"""
+        history = None
+        for frame, _ in iter_bitcoin_data_chunks(data_path, 50000, warmup_rows=self.warmup_rows):
+            history = frame
+        if history is None:
+            return pd.DataFrame(columns=self.input_cols)
+        missing_cols = set(self.input_cols) - set(history.columns)
+        if missing_cols:
+            raise ValueError(f"History data in {data_path} lacks the model's input columns: {sorted(missing_cols)}")
+        return history[self.input_cols].iloc[-self.warmup_rows:]
+
+    def _predict_batch(self, X: np.ndarray) -> Dict[str, np.ndarray]:
+        """Scale a stacked feature matrix and run every model once (the ensemble blends their output)"""
+        features = pd.DataFrame(X, columns=self.feature_cols)
+        X_scaled = self.trainer.transform_features(features)
+        predictions = {name: self.trainer.predict_scaled(name, X_scaled) for name in self.trainer.models}
+        if self.ensemble is not None:
+            predictions[ENSEMBLE_MODEL_NAME] = self.ensemble.predict_from_base(predictions)
+
+        if self.reference_sketch is not None:
+            predictions_df = predictions_to_frame(predictions, self.feature_state['horizons'], features.index)
+            with self._drift_lock:
+                self.drift_sketch.update(pd.concat([features, predictions_df], axis=1))
+        return predictions
+
+    def drift(self) -> dict:
+        """
+        Drift of everything served so far against the training data
+
+        Returns:
+            Dictionary with the number of rows, the max PSI and per-column scores
+        """
+        if self.reference_sketch is None:
+            return {'error': f'No {DRIFT_SKETCH_FILE} next to the models'}
+
+        with self._drift_lock:
+            current = self.reference_sketch.empty_copy().merge(self.drift_sketch)
+        if current.n_rows == 0:
+            return {'rows': 0}
+
+        scores = drift_scores(self.reference_sketch, current, self.psi_threshold)
+        return {
+            'rows': current.n_rows,
+            'max_psi': float(scores['PSI'].max()),
+            'drifted_columns': list(scores.index[scores['Drift']]),
+            'columns': {
+                name: {'psi': float(row['PSI']), 'ks': float(row['KS'])} for name, row in scores.iterrows()
+            }
+        }
+
+    def _bars_to_frame(self, bars: List[dict]) -> pd.DataFrame:
+        """
+        Convert request bars into a DataFrame of the model's input columns, indexed by timestamp
+
+        Every bar must carry a timestamp and every input column of the training
+        data (OHLCV plus e.g. Number of trades for the Binance export); extra
+        fields are ignored.
+        """
+        frame = pd.DataFrame(bars)
+        missing_cols = set(self.input_cols + ['timestamp']) - set(frame.columns)
+        if missing_cols:
+            raise ValueError(f"Bars are missing fields: {sorted(missing_cols)} "
+                             f"(required: timestamp, {', '.join(self.input_cols)})")
+        incomplete = frame[self.input_cols].isnull().any()
+        if incomplete.any():
+            raise ValueError(f"Bars have empty values in: {sorted(incomplete.index[incomplete])}")
+        frame.index = pd.to_datetime(frame.pop('timestamp'))
+        return frame[self.input_cols].astype(float)
+
+    def predict(self, bars: List[dict], observe: bool = False) -> List[dict]:
+        """
+        Predict the next close for each bar, using the rolling history as context
+
+        Args:
+            bars: List of bars with a timestamp and the input columns, oldest first
+            observe: Whether to append the bars to the rolling history afterwards
+
+        Returns:
+            List of {timestamp, model_name: prediction} dictionaries
+        """
+        started = time.perf_counter()
+        new_rows = self._bars_to_frame(bars)
+
+        with self._history_lock:
+            history = self.history
+        frame = pd.concat([history, new_rows])
+
+        df_features = create_features(
+            frame,
+            ma_windows=self.feature_state['ma_windows'],
+            lag_periods=self.feature_state['lag_periods'],
+            include_target=False
+        ).iloc[-len(new_rows):]
+        if not df_features.index.equals(new_rows.index):
+            raise ValueError(f"Not enough history: need {self.warmup_rows} rows before the first bar")
+
+        predictions = self.batcher.submit(df_features[self.feature_cols].to_numpy(dtype=float))
+
+        if observe:
+            self.observe(bars)
+
+        horizons = self.feature_state['horizons']
+        results = []
+        for i, timestamp in enumerate(df_features.index):
+            row = {'timestamp': timestamp.isoformat()}
+            for name, pred in predictions.items():
+                if pred.ndim == 1:
+                    row[name] = float(pred[i])
+                else:
+                    row[name] = {f"{horizon}h": float(value) for horizon, value in zip(horizons, pred[i])}
+            results.append(row)
+
+        self.tracker.record_request(time.perf_counter() - started, len(results))
+        return results
+
+    def observe(self, bars: List[dict]):
+        """
+        Append closed bars to the rolling history
+
+        Args:
+            bars: List of bars with a timestamp and the input columns, oldest first
+        """
+        new_rows = self._bars_to_frame(bars)
+        with self._history_lock:
+            self.history = pd.concat([self.history, new_rows]).iloc[-self.warmup_rows:]
+
+
+class PredictionRequestHandler(BaseHTTPRequestHandler):
+    """HTTP handler: POST /predict, POST /observe, GET /stats, GET /drift, GET /metrics, GET /health"""
+
+    service: PredictionService = None
+
+    def _send_json(self, status: int, payload: dict):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get('Content-Length', 0))
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send_json(200, {'status': 'ok', 'input_cols': self.service.input_cols})
+        elif self.path == '/stats':
+            self._send_json(200, self.service.tracker.summary())
+        elif self.path == '/drift':
+            self._send_json(200, self.service.drift())
+        elif self.path == '/metrics':
+            record_serving_metrics(self.service.tracker.summary())
+            send_metrics(self)
+        else:
+            self._send_json(404, {'error': f'Unknown path {self.path}'})
+
+    def do_POST(self):
+        try:
+            payload = self._read_json()
+            if self.path == '/predict':
+                predictions = self.service.predict(payload['bars'], observe=payload.get('observe', False))
+                self._send_json(200, {'predictions': predictions})
+            elif self.path == '/observe':
+                self.service.observe(payload['bars'])
+                self._send_json(200, {'history_rows': len(self.service.history)})
+            else:
+                self._send_json(404, {'error': f'Unknown path {self.path}'})
+        except (KeyError, ValueError, TypeError) as e:
+            self._send_json(400, {'error': str(e)})
+        except Exception as e:
+            logger.error(f"Prediction request failed: {e}", exc_info=True)
+            self._send_json(500, {'error': str(e)})
+
+    def log_message(self, format, *args):
+        # Access logs on every request would dominate latency
+        pass
+
+
+class PredictionHTTPServer(ThreadingHTTPServer):
+    """Threaded HTTP server with a listen backlog sized for concurrent clients"""
+
+    daemon_threads = True
+    request_queue_size = 128
+
+
+def run_server(service: PredictionService, host: str, port: int, stats_interval_s: float = 30):
+    """
+    Serve predictions over HTTP until interrupted
+
+    Args:
+        service: Loaded PredictionService
+        host: Interface to bind (keep 127.0.0.1 for local-only access)
+        port: TCP port to listen on
+        stats_interval_s: Seconds between latency/throughput log lines
+    """
+    PredictionRequestHandler.service = service
+    server = PredictionHTTPServer((host, port), PredictionRequestHandler)
+
+    def log_stats():
+        while True:
+            time.sleep(stats_interval_s)
+            stats = service.tracker.summary()
+            logger.info(f"requests={stats['requests']} p50={stats['p50_ms']:.2f}ms "
+                        f"p99={stats['p99_ms']:.2f}ms throughput={stats['rows_per_s']:.1f} rows/s "
+                        f"avg_batch={stats['avg_batch_rows']:.1f}")
+
+    threading.Thread(target=log_stats, name='stats-logger', daemon=True).start()
+
+    logger.info(f"Serving predictions on http://{host}:{port} (POST /predict, GET /stats, GET /drift, GET /metrics)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Shutting down prediction server")
+    finally:
+        server.server_close()
+        service.batcher.close()
@@ -0,0 +1,260 @@
+"""
+Hyperparameter tuning for Bitcoin price prediction
+
+Searches the MODEL_PARAMS space with successive halving / Hyperband on
+chronological folds. Low-budget trials (recent rows only, fewer trees) run
+first and only the most promising configurations get the full budget.
+Trials run in a process pool that shares one memory-mapped feature matrix.
+"""
+import numpy as np
+import itertools
+import json
+import logging
+import math
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Tuple
+from sklearn.metrics import mean_squared_error
+from sklearn.model_selection import TimeSeriesSplit
+
+from src.models import MODEL_REGISTRY
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MIN_TRIAL_ROWS = 200  # Fewest training rows a trial may use
+MIN_TRIAL_TREES = 10  # Smallest forest a trial may train
+
+
+def build_trial_model(model_key: str, params: dict, budget: float):
+    """
+    Build a model for one trial, scaling the number of trees with the budget
+
+    Args:
+        model_key: Key of the model in MODEL_REGISTRY
+        params: Full parameter set of the trial
+        budget: Fraction (0-1] of the full training budget
+
+    Returns:
+        Unfitted estimator
+    """
+    params = dict(params)
+    if 'n_estimators' in params:
+        params['n_estimators'] = max(MIN_TRIAL_TREES, int(round(params['n_estimators'] * budget)))
+    if 'n_jobs' in params:
+        # Parallelism comes from the process pool
+        params['n_jobs'] = 1
+
+    _, model_class = MODEL_REGISTRY[model_key]
+    return model_class(**params)
+
+
+def evaluate_trial(model_key: str, params: dict, budget: float, data_dir: str,
+                   folds: List[Tuple[int, int]]) -> float:
+    """
+    Mean validation RMSE of one configuration across chronological folds
+
+    Runs inside a worker process. X and y are opened as read-only memory maps,
+    so every worker shares the same pages instead of receiving a pickled copy.
+    Folds are chronological, so every slice is contiguous and stays a view of
+    the map; a budget below 1 trains on the most recent rows before the
+    validation window.
+
+    Args:
+        model_key: Key of the model in MODEL_REGISTRY
+        params: Full parameter set of the trial
+        budget: Fraction (0-1] of training rows (and trees) to use
+        data_dir: Directory holding X.npy and y.npy
+        folds: List of (train_end, val_end) row positions; each fold trains on
+            rows [0, train_end) and validates on [train_end, val_end)
+
+    Returns:
+        Mean validation RMSE
+    """
+    X = np.load(os.path.join(data_dir, "X.npy"), mmap_mode='r')
+    y = np.load(os.path.join(data_dir, "y.npy"), mmap_mode='r')
+
+    errors = []
+    for train_end, val_end in folds:
+        train_start = 0
+        if budget < 1:
+            train_start = train_end - min(train_end, max(MIN_TRIAL_ROWS, int(train_end * budget)))
+
+        model = build_trial_model(model_key, params, budget)
+        model.fit(X[train_start:train_end], y[train_start:train_end])
+        y_pred = model.predict(X[train_end:val_end])
+        errors.append(np.sqrt(mean_squared_error(y[train_end:val_end], y_pred)))
+
+    return float(np.mean(errors))
+
+
+def sample_configs(search_space: Dict[str, list], n_configs: int, rng: np.random.Generator) -> List[dict]:
+    """
+    Sample distinct configurations from a grid search space
+
+    Args:
+        search_space: Dictionary of {param_name: candidate values}
+        n_configs: Number of configurations to sample
+        rng: Random generator
+
+    Returns:
+        List of parameter dictionaries
+    """
+    names = list(search_space)
+    grid = list(itertools.product(*(search_space[name] for name in names)))
+    picks = rng.choice(len(grid), size=min(n_configs, len(grid)), replace=False)
+    return [dict(zip(names, grid[i])) for i in picks]
+
+
+def successive_halving(pool: ProcessPoolExecutor, model_key: str, base_params: dict,
+                       configs: List[dict], min_budget: float, eta: int, data_dir: str,
+                       folds: List[Tuple[int, int]]) -> List[dict]:
+    """
+    Run successive halving: evaluate all configs cheaply, keep the best 1/eta,
+    multiply the budget by eta, and repeat until the full budget
+
+    Args:
+        pool: Process pool running the trials
+        model_key: Key of the model in MODEL_REGISTRY
+        base_params: Parameters from MODEL_PARAMS the configs are applied on top of
+        configs: Candidate configurations
+        min_budget: Budget of the first rung
+        eta: Halving rate
+        data_dir: Directory holding the memory-mapped X.npy and y.npy
+        folds: Chronological (train_end, val_end) folds
+
+    Returns:
+        List of trial records ({'params', 'budget', 'rmse'}) for every rung
+    """
+    trials = []
+    survivors = configs
+    budget = min_budget
+
+    while True:
+        futures = [
+            pool.submit(evaluate_trial, model_key, {**base_params, **config}, budget, data_dir, folds)
+            for config in survivors
+        ]
+        scores = [future.result() for future in futures]
+        trials.extend({'params': config, 'budget': budget, 'rmse': score}
+                      for config, score in zip(survivors, scores))
+
+        ranked = [config for _, config in sorted(zip(scores, survivors), key=lambda pair: pair[0])]
+        logger.info(f"  Rung at budget {budget:.3f}: {len(survivors)} configs, best RMSE ${min(scores):,.2f}")
+
+        if budget >= 1:
+            return trials
+        survivors = ranked[:max(1, len(survivors) // eta)]
+        budget = min(1.0, budget * eta)
+
+
+def tune_model(pool: ProcessPoolExecutor, model_key: str, base_params: dict, search_space: dict,
+               data_dir: str, folds: List[Tuple[int, int]], eta: int, max_rungs: int,
+               hyperband: bool, seed: int) -> Tuple[dict, float, List[dict]]:
+    """
+    Tune one model with successive halving or Hyperband
+
+    Hyperband runs several successive-halving brackets, from many configs at a
+    tiny budget to a few configs at the full budget, which hedges against
+    low-budget scores being misleading.
+
+    Args:
+        pool: Process pool running the trials
+        model_key: Key of the model in MODEL_REGISTRY
+        base_params: Parameters from MODEL_PARAMS
+        search_space: Dictionary of {param_name: candidate values}
+        data_dir: Directory holding the memory-mapped X.npy and y.npy
+        folds: Chronological (train_end, val_end) folds
+        eta: Halving rate
+        max_rungs: Number of rungs of the most aggressive bracket
+        hyperband: Run all Hyperband brackets instead of a single halving run
+        seed: Random seed
+
+    Returns:
+        Tuple of (best params, best full-budget RMSE, all trial records)
+    """
+    rng = np.random.default_rng(seed)
+    s_max = max_rungs - 1
+    brackets = range(s_max, -1, -1) if hyperband else [s_max]
+
+    trials = []
+    for s in brackets:
+        n_configs = int(math.ceil((s_max + 1) / (s + 1) * eta ** s))
+        configs = sample_configs(search_space, n_configs, rng)
+        logger.info(f"{MODEL_REGISTRY[model_key][0]}: bracket with {len(configs)} configs, "
+                    f"starting budget {eta ** -s:.3f}")
+        trials.extend(successive_halving(pool, model_key, base_params, configs, eta ** -s, eta,
+                                         data_dir, folds))
+
+    full_budget = [trial for trial in trials if trial['budget'] >= 1]
+    best = min(full_budget, key=lambda trial: trial['rmse'])
+    return best['params'], best['rmse'], trials
+
+
+def tune_models(X_train_scaled: np.ndarray, y_train: np.ndarray, model_params: dict,
+                search_spaces: dict, n_splits: int, eta: int, max_rungs: int,
+                hyperband: bool = True, n_workers: int = None, seed: int = 42) -> dict:
+    """
+    Tune every model that has a search space
+
+    Args:
+        X_train_scaled: Scaled training features
+        y_train: Training target (1-D, or 2-D with one column per horizon)
+        model_params: Current MODEL_PARAMS
+        search_spaces: Dictionary of {model_key: {param_name: candidate values}}
+        n_splits: Number of chronological folds
+        eta: Halving rate
+        max_rungs: Number of rungs of the most aggressive bracket
+        hyperband: Run all Hyperband brackets instead of a single halving run
+        n_workers: Number of worker processes (default: CPU count)
+        seed: Random seed
+
+    Returns:
+        Dictionary of {model_key: {'params', 'rmse', 'n_trials'}}
+    """
+    folds = [(int(val_idx[0]), int(val_idx[-1]) + 1)
+             for _, val_idx in TimeSeriesSplit(n_splits=n_splits).split(X_train_scaled)]
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="tuning_") as data_dir:
+        # One copy on disk, memory-mapped by every worker
+        np.save(os.path.join(data_dir, "X.npy"), np.ascontiguousarray(X_train_scaled))
+        np.save(os.path.join(data_dir, "y.npy"), np.ascontiguousarray(y_train))
+
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            for model_key, search_space in search_spaces.items():
+                best_params, best_rmse, trials = tune_model(
+                    pool, model_key, model_params.get(model_key, {}), search_space,
+                    data_dir, folds, eta, max_rungs, hyperband, seed
+                )
+                results[model_key] = {'params': best_params, 'rmse': best_rmse, 'n_trials': len(trials)}
+                logger.info(f"Best {MODEL_REGISTRY[model_key][0]} params: {best_params} "
+                            f"(RMSE ${best_rmse:,.2f}, {len(trials)} trials)")
+
+    return results
+
+
+def save_tuned_params(results: dict, overlay_path: Path):
+    """
+    Write tuned parameters as a config overlay, merged over any existing one
+
+    config.py applies the overlay on top of MODEL_PARAMS at import time.
+
+    Args:
+        results: Output of tune_models
+        overlay_path: Path of the JSON overlay file
+    """
+    overlay = {}
+    if overlay_path.exists():
+        with open(overlay_path) as f:
+            overlay = json.load(f)
+
+    for model_key, result in results.items():
+        overlay.setdefault(model_key, {}).update(result['params'])
+
+    overlay_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(overlay_path, 'w') as f:
+        json.dump(overlay, f, indent=2)
+    logger.info(f"Tuned parameters written to {overlay_path}")
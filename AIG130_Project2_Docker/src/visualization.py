@@ -7,9 +7,18 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 import pandas as pd
 import numpy as np
+import inspect
 import logging
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Dict
+from types import SimpleNamespace
+from typing import Dict, List
+
+from src.diagnostics import DiagnosticsAggregate
+from src.manifest import fingerprint, load_manifest, save_manifest
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -62,31 +71,64 @@ def plot_metrics_comparison(comparison_df: pd.DataFrame, save_path: Path):
     plt.close()
 
 
-def plot_predictions_vs_actual(y_test, predictions_dict: Dict, save_path: Path, sample_size: int = 500):
+def minmax_downsample(values, n_points: int) -> np.ndarray:
+    """
+    Positions of the min and max of every bucket, for plotting long series
+
+    The series is cut into n_points / 2 equal buckets and each keeps its
+    lowest and highest point, so spikes and crashes survive at any length.
+    One vectorized pass; the result size depends only on n_points.
+
+    Args:
+        values: 1-D series values
+        n_points: Point budget
+
+    Returns:
+        Sorted positions to plot (all positions if the series already fits)
+    """
+    values = np.asarray(values, dtype=float)
+    n_rows = len(values)
+    if n_rows <= n_points:
+        return np.arange(n_rows)
+
+    bucket_size = -(-n_rows // max(1, n_points // 2))
+    # Recounted so only the last bucket is padded, and never completely
+    n_buckets = -(-n_rows // bucket_size)
+    padded = np.full(n_buckets * bucket_size, np.nan)
+    padded[:n_rows] = values
+    buckets = padded.reshape(n_buckets, bucket_size)
+
+    offsets = np.arange(n_buckets)[:, None] * bucket_size
+    picks = np.sort(np.stack([np.nanargmin(buckets, axis=1), np.nanargmax(buckets, axis=1)], axis=1), axis=1)
+    return np.unique(picks + offsets)
+
+
+def plot_predictions_vs_actual(y_test, predictions_dict: Dict, save_path: Path, max_points: int = 2000):
     """
-    Plot actual vs predicted prices
+    Plot actual vs predicted prices over the whole test range
+
+    Every series is min/max downsampled to max_points, so render time does
+    not grow with the test set.
 
     Args:
         y_test: True test values
         predictions_dict: Dictionary of {model_name: predictions}
         save_path: Path to save the plot
-        sample_size: Number of samples to plot
+        max_points: Points drawn per series
     """
     plt.figure(figsize=(15, 8))
 
-    # Use last N samples for clarity
-    actual_sample = y_test.iloc[-sample_size:]
-
-    plt.plot(actual_sample.index, actual_sample, 'k-',
+    positions = minmax_downsample(y_test, max_points)
+    plt.plot(y_test.index[positions], np.asarray(y_test)[positions], 'k-',
              linewidth=2, label='Actual Prices', alpha=0.8)
 
     colors = ['blue', 'red', 'green']
     for i, (name, pred) in enumerate(predictions_dict.items()):
-        pred_sample = pred[-sample_size:]
-        plt.plot(actual_sample.index, pred_sample, color=colors[i % len(colors)],
+        positions = minmax_downsample(pred, max_points)
+        plt.plot(y_test.index[positions], np.asarray(pred)[positions], color=colors[i % len(colors)],
                  linewidth=1.5, label=f'{name} Predictions', alpha=0.7)
 
-    plt.title(f'Bitcoin Price Prediction - Actual vs Predicted (Last {sample_size} Hours)',
+    plt.title(f'Bitcoin Price Prediction - Actual vs Predicted ({len(y_test):,} Hours)',
               fontsize=14, fontweight='bold')
     plt.xlabel('Date')
     plt.ylabel('Bitcoin Price ($)')
@@ -99,7 +141,8 @@ def plot_predictions_vs_actual(y_test, predictions_dict: Dict, save_path: Path,
     plt.close()
 
 
-def plot_feature_importance(models: Dict, feature_cols: list, save_path: Path):
+def plot_feature_importance(models: Dict, feature_cols: list, save_path: Path,
+                            importance_df: pd.DataFrame = None):
     """
     Plot feature importance for each model
 
@@ -107,7 +150,13 @@ def plot_feature_importance(models: Dict, feature_cols: list, save_path: Path):
         models: Dictionary of trained models
         feature_cols: List of feature column names
         save_path: Path to save the plot
+        importance_df: Optional permutation importances from permutation_importance;
+            replaces the coefficients and impurity importances when given
     """
+    if importance_df is not None:
+        plot_permutation_importance(importance_df, save_path)
+        return
+
     fig, axes = plt.subplots(1, 3, figsize=(18, 5))
     fig.suptitle('Feature Importance Analysis', fontsize=16, fontweight='bold')
 
@@ -116,7 +165,8 @@ def plot_feature_importance(models: Dict, feature_cols: list, save_path: Path):
         lr_model = models['Linear Regression']
         lr_importance = pd.DataFrame({
             'Feature': feature_cols,
-            'Coefficient': lr_model.coef_
+            # Multi-horizon models have one row of coefficients per horizon
+            'Coefficient': np.atleast_2d(lr_model.coef_)[0]
         }).sort_values('Coefficient', key=abs, ascending=False)
 
         axes[0].barh(lr_importance['Feature'], lr_importance['Coefficient'])
@@ -153,27 +203,52 @@ def plot_feature_importance(models: Dict, feature_cols: list, save_path: Path):
     plt.close()
 
 
-def plot_residuals(y_test, predictions_dict: Dict, save_path: Path):
+def plot_permutation_importance(importance_df: pd.DataFrame, save_path: Path):
     """
-    Plot residual distributions
+    Plot permutation importance with confidence intervals, one panel per model
 
     Args:
-        y_test: True test values
-        predictions_dict: Dictionary of {model_name: predictions}
+        importance_df: Output of permutation_importance
+        save_path: Path to save the plot
+    """
+    model_names = list(dict.fromkeys(importance_df['Model']))
+    fig, axes = plt.subplots(1, len(model_names), figsize=(6 * len(model_names), 5), squeeze=False)
+    fig.suptitle('Permutation Feature Importance (RMSE increase)', fontsize=16, fontweight='bold')
+
+    for ax, name in zip(axes[0], model_names):
+        model_df = importance_df[importance_df['Model'] == name].sort_values('Importance')
+        errors = [model_df['Importance'] - model_df['CI Low'], model_df['CI High'] - model_df['Importance']]
+        ax.barh(model_df['Feature'], model_df['Importance'], xerr=np.clip(errors, 0, None), capsize=3)
+        ax.set_title(name)
+        ax.set_xlabel('RMSE Increase ($)')
+
+    plt.tight_layout()
+    plt.savefig(save_path, dpi=100, bbox_inches='tight')
+    logger.info(f"Feature importance plot saved to {save_path}")
+    plt.close()
+
+
+def plot_residuals(diagnostics: DiagnosticsAggregate, save_path: Path):
+    """
+    Plot residual distributions from pre-binned counts
+
+    Args:
+        diagnostics: Binned residuals from DiagnosticsAggregate
         save_path: Path to save the plot
     """
-    n_models = len(predictions_dict)
+    n_models = len(diagnostics.model_names)
     fig, axes = plt.subplots(1, n_models, figsize=(6 * n_models, 5))
     if n_models == 1:
         axes = [axes]
 
     fig.suptitle('Residual Analysis', fontsize=16, fontweight='bold')
 
-    for ax, (name, pred) in zip(axes, predictions_dict.items()):
-        residuals = y_test - pred
-        ax.hist(residuals, bins=50, alpha=0.7, color='skyblue', edgecolor='black')
+    for i, (ax, name) in enumerate(zip(axes, diagnostics.model_names)):
+        edges = diagnostics.residual_edges[i]
+        ax.bar(edges[:-1], diagnostics.residual_counts[i], width=np.diff(edges), align='edge',
+               alpha=0.7, color='skyblue', edgecolor='black')
         ax.axvline(x=0, color='red', linestyle='--', linewidth=2)
-        ax.set_title(f'{name}\nMean Residual: ${residuals.mean():,.2f}')
+        ax.set_title(f'{name}\nMean Residual: ${diagnostics.mean_residuals[i]:,.2f}')
         ax.set_xlabel('Residual ($)')
         ax.set_ylabel('Frequency')
         ax.grid(True, alpha=0.3)
@@ -184,10 +259,230 @@ def plot_residuals(y_test, predictions_dict: Dict, save_path: Path):
     plt.close()
 
 
-def generate_all_plots(comparison_df, y_test, predictions_dict, models, feature_cols, plots_dir: Path):
+def plot_actual_vs_predicted(diagnostics: DiagnosticsAggregate, save_path: Path):
+    """
+    Plot actual vs predicted density as hexbins of the pre-binned 2-D counts
+
+    Each non-empty 2-D bin is one weighted point, so the cost depends on the
+    bin count, not on the number of predictions.
+
+    Args:
+        diagnostics: Binned (actual, predicted) pairs from DiagnosticsAggregate
+        save_path: Path to save the plot
+    """
+    n_models = len(diagnostics.model_names)
+    fig, axes = plt.subplots(1, n_models, figsize=(6 * n_models, 5.5))
+    if n_models == 1:
+        axes = [axes]
+
+    fig.suptitle('Actual vs Predicted Density', fontsize=16, fontweight='bold')
+
+    edges = diagnostics.price_edges
+    centers = (edges[:-1] + edges[1:]) / 2
+    for i, (ax, name) in enumerate(zip(axes, diagnostics.model_names)):
+        actual_bins, predicted_bins = np.nonzero(diagnostics.joint_counts[i])
+        hexbins = ax.hexbin(
+            centers[actual_bins], centers[predicted_bins], C=diagnostics.joint_counts[i][actual_bins, predicted_bins],
+            reduce_C_function=np.sum, gridsize=50, bins='log', cmap='viridis',
+            extent=(edges[0], edges[-1], edges[0], edges[-1])
+        )
+        ax.plot([edges[0], edges[-1]], [edges[0], edges[-1]], 'r--', linewidth=1)
+        fig.colorbar(hexbins, ax=ax, label='Hours')
+        ax.set_title(name)
+        ax.set_xlabel('Actual Price ($)')
+        ax.set_ylabel('Predicted Price ($)')
+
+    plt.tight_layout()
+    plt.savefig(save_path, dpi=100, bbox_inches='tight')
+    logger.info(f"Actual vs predicted density plot saved to {save_path}")
+    plt.close()
+
+
+def plot_segment_heatmap(segment_df: pd.DataFrame, save_path: Path, metric: str = 'RMSE'):
+    """
+    Plot a metric per segment and model as heatmaps, one per segment type
+
+    Args:
+        segment_df: Tidy DataFrame from evaluate_segments
+        save_path: Path to save the plot
+        metric: Metric column to plot
+    """
+    segment_types = list(segment_df['Segment Type'].unique())
+    n_segments = segment_df.groupby('Segment Type')['Segment'].nunique()
+    fig, axes = plt.subplots(
+        1, len(segment_types), figsize=(7 * len(segment_types), max(4, 0.4 * n_segments.max() + 2))
+    )
+    if len(segment_types) == 1:
+        axes = [axes]
+
+    fig.suptitle(f'{metric} by Segment', fontsize=16, fontweight='bold')
+
+    for ax, segment_type in zip(axes, segment_types):
+        table = segment_df[segment_df['Segment Type'] == segment_type].pivot(
+            index='Segment', columns='Model', values=metric
+        )
+        sns.heatmap(table, ax=ax, annot=True, fmt=',.0f', cmap='YlOrRd', cbar_kws={'label': metric})
+        ax.set_title(f'By {segment_type}')
+        ax.set_xlabel('')
+        ax.set_ylabel(segment_type)
+
+    plt.tight_layout()
+    plt.savefig(save_path, dpi=100, bbox_inches='tight')
+    logger.info(f"Segment heatmap saved to {save_path}")
+    plt.close()
+
+
+def plot_equity_curves(equity_df: pd.DataFrame, save_path: Path):
+    """
+    Plot strategy equity curves and their drawdowns
+
+    Args:
+        equity_df: Equity curves from backtest_strategies, one column per strategy
+        save_path: Path to save the plot
+    """
+    fig, axes = plt.subplots(2, 1, figsize=(15, 9), sharex=True, gridspec_kw={'height_ratios': [3, 1]})
+    fig.suptitle('Backtest Equity Curves (best threshold per model)', fontsize=16, fontweight='bold')
+
+    drawdown = equity_df / equity_df.cummax().clip(lower=1.0) - 1
+    for name in equity_df.columns:
+        style = {'color': 'black', 'linestyle': '--'} if name == 'Buy & Hold' else {}
+        axes[0].plot(equity_df.index, equity_df[name], label=name, linewidth=1.5, **style)
+        axes[1].plot(drawdown.index, drawdown[name] * 100, linewidth=1, **style)
+
+    axes[0].axhline(y=1, color='gray', linewidth=1)
+    axes[0].set_ylabel('Equity (start = 1)')
+    axes[0].legend(loc='best')
+    axes[0].grid(True, alpha=0.3)
+    axes[1].set_ylabel('Drawdown (%)')
+    axes[1].set_xlabel('Time')
+    axes[1].grid(True, alpha=0.3)
+
+    plt.tight_layout()
+    plt.savefig(save_path, dpi=100, bbox_inches='tight')
+    logger.info(f"Equity curves saved to {save_path}")
+    plt.close()
+
+
+def share_frame(df: pd.DataFrame, data_dir: Path, name: str) -> dict:
+    """
+    Write a numeric DataFrame as .npy files that plot workers memory-map
+
+    Args:
+        df: DataFrame with numeric values
+        data_dir: Directory shared with the workers
+        name: File name prefix
+
+    Returns:
+        Spec for load_shared_frame (file names, columns and index name)
+    """
+    np.save(data_dir / f"{name}_values.npy", np.ascontiguousarray(df.to_numpy(dtype=float)))
+    np.save(data_dir / f"{name}_index.npy", np.asarray(df.index))
+    return {'name': name, 'columns': list(df.columns), 'index_name': df.index.name}
+
+
+def load_shared_frame(spec: dict, data_dir: Path) -> pd.DataFrame:
+    """Open a DataFrame written by share_frame as read-only memory maps"""
+    values = np.load(data_dir / f"{spec['name']}_values.npy", mmap_mode='r')
+    index = np.load(data_dir / f"{spec['name']}_index.npy", mmap_mode='r')
+    return pd.DataFrame(values, index=pd.Index(index, name=spec['index_name']), columns=spec['columns'], copy=False)
+
+
+def render_plot(plot_name: str, save_path: Path, data_dir: Path, kwargs: dict):
+    """
+    Render one plot inside a worker process
+
+    Args:
+        plot_name: Name of a plot_* function of this module
+        save_path: Path to save the plot
+        data_dir: Directory holding the shared y_test / predictions / equity arrays
+        kwargs: Remaining (small) arguments of the plot function
+    """
+    setup_plot_style()
+    kwargs = dict(kwargs)
+    if 'predictions_spec' in kwargs:
+        frame = load_shared_frame(kwargs.pop('predictions_spec'), data_dir)
+        kwargs['y_test'] = frame.iloc[:, 0]
+        kwargs['predictions_dict'] = {name: frame[name].to_numpy() for name in frame.columns[1:]}
+    if 'equity_spec' in kwargs:
+        kwargs['equity_df'] = load_shared_frame(kwargs.pop('equity_spec'), data_dir)
+    globals()[plot_name](save_path=save_path, **kwargs)
+
+
+class PlotJobs:
+    """Plots rendering in a process pool; wait() collects them and updates the manifest"""
+
+    def __init__(self, pool: ProcessPoolExecutor, futures: Dict, data_dir: Path,
+                 fingerprints: Dict[str, str] = None, skipped: List[str] = None):
+        self.pool = pool
+        self.futures = futures
+        self.data_dir = data_dir
+        self.fingerprints = fingerprints or {}
+        self.skipped = skipped or []
+        self.failed = None
+
+    def wait(self) -> List[str]:
+        """
+        Wait for every plot, log failures and release the pool
+
+        The fingerprints of the plots that rendered are recorded in the plots
+        directory's manifest. Safe to call more than once.
+
+        Returns:
+            Names of the plots that failed
+        """
+        if self.failed is not None:
+            return self.failed
+
+        self.failed = []
+        for save_path, future in self.futures.items():
+            try:
+                future.result()
+            except Exception as e:
+                # One broken plot must not take the others (or the run) down
+                logger.error(f"Failed to render {save_path.name}: {e}")
+                self.failed.append(save_path.name)
+
+        self.pool.shutdown()
+        shutil.rmtree(self.data_dir, ignore_errors=True)
+
+        if self.futures:
+            plots_dir = next(iter(self.futures)).parent
+            manifest = load_manifest(plots_dir)
+            for save_path in self.futures:
+                if save_path.name in self.failed:
+                    manifest.pop(save_path.name, None)
+                else:
+                    manifest.setdefault(save_path.name, {})['fingerprint'] = self.fingerprints[save_path.name]
+            save_manifest(plots_dir, manifest)
+
+        logger.info(f"{len(self.futures) - len(self.failed)} of {len(self.futures)} plots rendered, "
+                    f"{len(self.skipped)} unchanged")
+        return self.failed
+
+
+def importance_views(models: Dict) -> Dict:
+    """Coefficients and impurity importances of the models, without the models themselves"""
+    views = {}
+    for name, model in models.items():
+        attributes = {attr: getattr(model, attr) for attr in ('coef_', 'feature_importances_')
+                      if hasattr(model, attr)}
+        views[name] = SimpleNamespace(**attributes)
+    return views
+
+
+def generate_all_plots(comparison_df, y_test, predictions_dict, models, feature_cols, plots_dir: Path,
+                       segment_df: pd.DataFrame = None, equity_df: pd.DataFrame = None,
+                       importance_df: pd.DataFrame = None, max_points: int = 2000,
+                       n_workers: int = None, wait: bool = True) -> PlotJobs:
     """
     Generate all visualization plots
 
+    Every plot renders in its own worker process (Agg backend). The test
+    values, predictions and equity curves are written once as .npy files
+    and memory-mapped by the workers instead of being pickled per plot.
+    Plots whose inputs and plotting code match the fingerprint in the plots
+    directory's manifest are not redrawn.
+
     Args:
         comparison_df: DataFrame with model metrics
         y_test: True test values
@@ -195,14 +490,71 @@ def generate_all_plots(comparison_df, y_test, predictions_dict, models, feature_
         models: Dictionary of trained models
         feature_cols: List of feature names
         plots_dir: Directory to save plots
+        segment_df: Optional per-segment metrics from evaluate_segments
+        equity_df: Optional backtest equity curves from backtest_strategies
+        importance_df: Optional permutation importances from permutation_importance
+        max_points: Points drawn per series in the predictions vs actual plot
+        n_workers: Number of worker processes (default: one per plot, up to the CPU count)
+        wait: Block until every plot is rendered; otherwise call wait() on the result later
+
+    Returns:
+        PlotJobs handle of the running plots
     """
-    setup_plot_style()
-
     logger.info("Generating visualization plots...")
 
-    plot_metrics_comparison(comparison_df, plots_dir / "metrics_comparison.png")
-    plot_predictions_vs_actual(y_test, predictions_dict, plots_dir / "predictions_vs_actual.png")
-    plot_feature_importance(models, feature_cols, plots_dir / "feature_importance.png")
-    plot_residuals(y_test, predictions_dict, plots_dir / "residuals.png")
-
-    logger.info(f"All plots saved to {plots_dir}")
+    data_dir = Path(tempfile.mkdtemp(prefix="plots_"))
+    predictions_frame = pd.DataFrame(
+        {'__actual__': np.asarray(y_test), **{name: np.asarray(pred) for name, pred in predictions_dict.items()}},
+        index=y_test.index
+    )
+    predictions_args = {'predictions_spec': share_frame(predictions_frame, data_dir, 'predictions')}
+
+    # Binned once here; the residual and density plots only receive the counts
+    diagnostics = DiagnosticsAggregate.from_predictions(y_test, predictions_dict)
+
+    # save_path -> (plot function, worker kwargs, inputs to fingerprint)
+    jobs = {
+        plots_dir / "metrics_comparison.png": ('plot_metrics_comparison', {'comparison_df': comparison_df}, None),
+        plots_dir / "predictions_vs_actual.png": ('plot_predictions_vs_actual', {
+            **predictions_args, 'max_points': max_points
+        }, {'predictions': predictions_frame, 'max_points': max_points}),
+        plots_dir / "feature_importance.png": ('plot_feature_importance', {
+            # Only the fitted coefficients/importances are sent, never the models
+            'models': importance_views(models) if importance_df is None else {},
+            'feature_cols': feature_cols,
+            'importance_df': importance_df
+        }, None),
+        plots_dir / "residuals.png": ('plot_residuals', {'diagnostics': diagnostics}, None),
+        plots_dir / "actual_vs_predicted.png": ('plot_actual_vs_predicted', {'diagnostics': diagnostics}, None)
+    }
+    if segment_df is not None:
+        jobs[plots_dir / "segment_heatmap.png"] = ('plot_segment_heatmap', {'segment_df': segment_df}, None)
+    if equity_df is not None:
+        jobs[plots_dir / "equity_curves.png"] = ('plot_equity_curves', {
+            'equity_spec': share_frame(equity_df, data_dir, 'equity')
+        }, {'equity_df': equity_df})
+
+    # Skip plots whose inputs (and plotting code) match the manifest
+    manifest = load_manifest(plots_dir)
+    fingerprints, skipped = {}, []
+    for save_path, (plot_name, kwargs, inputs) in list(jobs.items()):
+        fingerprints[save_path.name] = fingerprint(
+            inspect.getsource(globals()[plot_name]), kwargs if inputs is None else inputs
+        )
+        if save_path.exists() and manifest.get(save_path.name, {}).get('fingerprint') == fingerprints[save_path.name]:
+            skipped.append(save_path.name)
+            del jobs[save_path]
+    if skipped:
+        logger.info(f"Skipping unchanged plots: {', '.join(skipped)}")
+
+    pool = ProcessPoolExecutor(max_workers=n_workers or max(1, min(len(jobs), os.cpu_count() or 1)))
+    futures = {
+        save_path: pool.submit(render_plot, plot_name, save_path, data_dir, kwargs)
+        for save_path, (plot_name, kwargs, _) in jobs.items()
+    }
+    plot_jobs = PlotJobs(pool, futures, data_dir, fingerprints=fingerprints, skipped=skipped)
+
+    if wait:
+        plot_jobs.wait()
+        logger.info(f"All plots saved to {plots_dir}")
+    return plot_jobs
@@ -0,0 +1,7 @@
+"""Shared pytest setup: make config and src importable from the project root"""
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('MPLBACKEND', 'Agg')
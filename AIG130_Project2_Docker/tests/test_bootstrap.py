@@ -0,0 +1,57 @@
+"""Tests of the moving-block bootstrap"""
+import numpy as np
+import pytest
+
+from src.bootstrap import block_bootstrap_metrics, moving_block_sums
+from src.evaluate import calculate_metrics
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    y = 30000 + rng.normal(0, 500, 600).cumsum()
+    return y, {'a': y + rng.normal(0, 100, len(y)), 'b': y + rng.normal(0, 400, len(y))}
+
+
+def test_moving_block_sums_match_window_sums():
+    values = np.random.default_rng(0).normal(size=(3, 50))
+
+    sums = moving_block_sums(values, 7)
+
+    expected = np.array([[row[i:i + 7].sum() for i in range(50 - 7 + 1)] for row in values])
+    np.testing.assert_allclose(sums, expected)
+
+
+def test_one_block_covering_everything_reproduces_the_point_metrics(data):
+    y, predictions = data
+
+    ci_df, _ = block_bootstrap_metrics(predictions, y, n_replicates=20, block_length=len(y), n_jobs=1)
+
+    for name, pred in predictions.items():
+        for metric, value in calculate_metrics(y, pred).items():
+            assert ci_df.loc[name, f'{metric} CI Low'] == pytest.approx(value, rel=1e-6)
+            assert ci_df.loc[name, f'{metric} CI High'] == pytest.approx(value, rel=1e-6)
+
+
+def test_intervals_are_ordered_and_reproducible(data):
+    y, predictions = data
+
+    ci_df, pairwise_df = block_bootstrap_metrics(predictions, y, n_replicates=300, n_jobs=1, seed=7)
+    again, _ = block_bootstrap_metrics(predictions, y, n_replicates=300, n_jobs=1, seed=7)
+
+    assert ci_df.equals(again)
+    for metric in ['RMSE', 'MAE', 'R²', 'MAPE']:
+        assert (ci_df[f'{metric} CI Low'] <= ci_df[f'{metric} CI High']).all()
+    assert ci_df['P(Best RMSE)'].sum() == pytest.approx(1.0)
+    assert ci_df.loc['a', 'P(Best RMSE)'] > 0.9
+    # One pair, four metrics; the much noisier model differs significantly in RMSE
+    assert len(pairwise_df) == 4
+    assert pairwise_df.set_index('Metric').loc['RMSE', 'Significant']
+
+
+def test_a_tiny_memory_budget_still_runs(data):
+    y, predictions = data
+
+    ci_df, _ = block_bootstrap_metrics(predictions, y, n_replicates=50, n_jobs=1, chunk_bytes=1)
+
+    assert ci_df[['RMSE CI Low', 'RMSE CI High']].notna().all().all()
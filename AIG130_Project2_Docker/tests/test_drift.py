@@ -0,0 +1,84 @@
+"""Tests of the histogram drift sketches"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.drift import HistogramSketch, drift_scores
+
+
+@pytest.fixture
+def reference_frame():
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({'price': rng.normal(100, 10, 5000), 'volume': rng.exponential(5, 5000)})
+
+
+def test_same_distribution_does_not_drift(reference_frame):
+    reference = HistogramSketch.from_reference(reference_frame, n_bins=10)
+    current = reference.empty_copy().update(reference_frame)
+
+    scores = drift_scores(reference, current)
+
+    np.testing.assert_allclose(scores['PSI'], 0, atol=1e-12)
+    np.testing.assert_allclose(scores['KS'], 0, atol=1e-12)
+    assert not scores['Drift'].any()
+
+
+def test_shifted_column_is_flagged(reference_frame):
+    reference = HistogramSketch.from_reference(reference_frame, n_bins=10)
+    shifted = reference_frame.assign(price=reference_frame['price'] + 15)
+
+    scores = drift_scores(reference, reference.empty_copy().update(shifted))
+
+    assert scores.loc['price', 'Drift'] and scores.loc['price', 'PSI'] > 0.2
+    assert not scores.loc['volume', 'Drift']
+
+
+def test_merged_batches_equal_one_update(reference_frame):
+    reference = HistogramSketch.from_reference(reference_frame, n_bins=10)
+    first = reference.empty_copy().update(reference_frame.iloc[:1234])
+    second = reference.empty_copy().update(reference_frame.iloc[1234:])
+
+    merged = first.merge(second)
+
+    np.testing.assert_array_equal(merged.counts, reference.counts)
+    assert merged.n_rows == len(reference_frame)
+
+
+def test_non_finite_values_are_ignored(reference_frame):
+    reference = HistogramSketch.from_reference(reference_frame, n_bins=10)
+    frame = reference_frame.iloc[:10].copy()
+    frame.iloc[0, 0] = np.nan
+
+    counts = reference.empty_copy().update(frame).counts.sum(axis=1)
+
+    np.testing.assert_array_equal(counts, [9, 10])
+
+
+def test_sketches_with_other_edges_cannot_be_combined(reference_frame):
+    reference = HistogramSketch.from_reference(reference_frame, n_bins=10)
+    other = HistogramSketch.from_reference(reference_frame * 2, n_bins=10)
+
+    with pytest.raises(ValueError):
+        reference.merge(other)
+    with pytest.raises(ValueError):
+        drift_scores(reference, other)
+
+
+def test_select_keeps_the_columns_counts(reference_frame):
+    reference = HistogramSketch.from_reference(reference_frame, n_bins=10)
+
+    volume = reference.select(['volume'])
+
+    assert volume.columns == ['volume']
+    np.testing.assert_array_equal(volume.counts[0], reference.counts[1])
+    np.testing.assert_array_equal(volume.edges[0], reference.edges[1])
+
+
+def test_save_and_load_round_trip(reference_frame, tmp_path):
+    reference = HistogramSketch.from_reference(reference_frame, n_bins=10)
+    reference.save(tmp_path / "sketch.npz")
+
+    loaded = HistogramSketch.load(tmp_path / "sketch.npz")
+
+    assert loaded.columns == reference.columns
+    np.testing.assert_array_equal(loaded.counts, reference.counts)
@@ -0,0 +1,99 @@
+"""Tests of the streaming metric accumulator and the segment metrics"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.evaluate import MetricAccumulator, calculate_metrics, evaluate_segments
+
+
+def direct_metrics(y, pred):
+    """Metrics computed in one go, as the reference for the accumulator"""
+    errors = pred - y
+    return {
+        'RMSE': np.sqrt(np.mean(errors ** 2)),
+        'MAE': np.mean(np.abs(errors)),
+        'R²': 1 - np.sum(errors ** 2) / np.sum((y - y.mean()) ** 2),
+        'MAPE': np.mean(np.abs(errors / y)) * 100
+    }
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    y = 30000 + rng.normal(0, 500, 1000).cumsum()
+    predictions = np.stack([y + rng.normal(0, 100, len(y)), y + rng.normal(50, 300, len(y))])
+    return y, predictions
+
+
+def test_chunked_updates_match_direct_metrics(data):
+    y, predictions = data
+    accumulator = MetricAccumulator(['a', 'b'])
+    for start in range(0, len(y), 137):
+        accumulator.update(y[start:start + 137], predictions[:, start:start + 137])
+
+    results = accumulator.result()
+    for i, name in enumerate(['a', 'b']):
+        expected = direct_metrics(y, predictions[i])
+        for metric, value in expected.items():
+            assert results[name][metric] == pytest.approx(value, rel=1e-9)
+
+
+def test_merge_matches_a_single_accumulator(data):
+    y, predictions = data
+    whole = MetricAccumulator(['a', 'b']).update(y, predictions)
+    merged = MetricAccumulator(['a', 'b']).update(y[:400], predictions[:, :400])
+    merged.merge(MetricAccumulator(['a', 'b']).update(y[400:], predictions[:, 400:]))
+
+    assert merged.n == whole.n
+    for name, metrics in whole.result().items():
+        for metric, value in metrics.items():
+            assert merged.result()[name][metric] == pytest.approx(value, rel=1e-9)
+
+
+def test_merge_rejects_other_models(data):
+    y, predictions = data
+    with pytest.raises(ValueError):
+        MetricAccumulator(['a', 'b']).merge(MetricAccumulator(['b', 'a']).update(y, predictions))
+
+
+def test_multi_horizon_output_matches_single_column(data):
+    y, predictions = data
+    y_2d = np.column_stack([y, y * 1.01])
+    predictions_2d = np.stack([predictions, predictions * 1.02], axis=-1)
+
+    accumulator = MetricAccumulator(['a', 'b']).update(y_2d, predictions_2d)
+
+    for i, name in enumerate(['a', 'b']):
+        expected = direct_metrics(y_2d[:, 1], predictions_2d[i, :, 1])
+        for metric, value in expected.items():
+            assert accumulator.result(output=1)[name][metric] == pytest.approx(value, rel=1e-9)
+
+
+def test_calculate_metrics_of_a_perfect_model():
+    y = np.array([100.0, 110.0, 120.0])
+    metrics = calculate_metrics(y, y)
+    assert metrics['RMSE'] == 0 and metrics['MAE'] == 0 and metrics['MAPE'] == 0
+    assert metrics['R²'] == pytest.approx(1.0)
+
+
+def test_segments_match_metrics_of_each_month(data):
+    y, predictions = data
+    index = pd.date_range('2024-01-01', periods=len(y), freq='3H')
+    y_true = pd.Series(y, index=index)
+    volatility = np.random.default_rng(1).uniform(0, 5, len(y))
+
+    segment_df = evaluate_segments({'a': predictions[0], 'b': predictions[1]}, y_true,
+                                   volatility=volatility, n_volatility_buckets=4)
+
+    periods = segment_df[segment_df['Segment Type'] == 'Period']
+    months = index.to_period('M')
+    assert set(periods['Segment']) == set(months.astype(str))
+    for _, row in periods.iterrows():
+        mask = np.asarray(months.astype(str) == row['Segment'])
+        i = ['a', 'b'].index(row['Model'])
+        assert row['Rows'] == mask.sum()
+        for metric, value in direct_metrics(y[mask], predictions[i][mask]).items():
+            assert row[metric] == pytest.approx(value, rel=1e-6)
+
+    buckets = segment_df[segment_df['Segment Type'] == 'Volatility']
+    assert buckets.groupby('Model')['Rows'].sum().tolist() == [len(y), len(y)]
@@ -0,0 +1,29 @@
+"""Tests of the partitioned prediction output"""
+import pandas as pd
+
+from src.inference import partition_overlaps, write_prediction_partitions
+
+
+def test_partition_overlaps_the_scored_range():
+    start, end = pd.Timestamp('2025-03-15 12:00'), pd.Timestamp('2025-05-02')
+
+    assert partition_overlaps('year=2025/month=03/part.parquet', start, end)
+    assert partition_overlaps('year=2025/month=05/part.parquet', start, end)
+    assert not partition_overlaps('year=2025/month=02/part.parquet', start, end)
+    assert not partition_overlaps('year=2025/month=06/part.parquet', start, end)
+    assert partition_overlaps('year=2020/month=01/part.parquet', None, end)
+    assert not partition_overlaps('_watermark.json', None, None)
+
+
+def test_rescoring_replaces_rows_instead_of_duplicating(tmp_path):
+    first = pd.DataFrame({'prediction': 1.0}, index=pd.date_range('2025-01-30', periods=72, freq='H'))
+    second = pd.DataFrame({'prediction': 2.0}, index=pd.date_range('2025-01-31', periods=24, freq='H'))
+
+    assert len(write_prediction_partitions(first, tmp_path)) == 2
+    written = write_prediction_partitions(second, tmp_path)
+
+    assert written == [tmp_path / "year=2025" / "month=01"]
+    result = pd.concat(pd.read_parquet(path) for path in sorted(tmp_path.rglob("*.parquet")))
+    assert len(result) == 72 and result.index.is_unique
+    assert (result.loc['2025-01-31', 'prediction'] == 2.0).all()
+    assert (result.loc['2025-01-30', 'prediction'] == 1.0).all()
@@ -0,0 +1,57 @@
+"""Tests of the checkpointed stage pipeline"""
+import pytest
+
+from src.pipeline import Stage, StagePipeline
+
+
+def build_pipeline(checkpoint_dir, calls, settings_hash='settings'):
+    """Three stages: load (checkpointed) -> plots (not checkpointed) -> upload"""
+    def stage(name, result):
+        def func(**inputs):
+            calls.append(name)
+            return result(**inputs)
+        return func
+
+    stages = [
+        Stage('load', stage('load', lambda x: {'data': x + 1}), ['x'], ['data']),
+        Stage('plots', stage('plots', lambda data: {'plots': [data]}), ['data'], ['plots'], checkpoint=False),
+        Stage('upload', stage('upload', lambda data, plots: {'uploaded': data + len(plots)}),
+              ['data', 'plots'], ['uploaded']),
+    ]
+    return StagePipeline(stages, checkpoint_dir, settings_hash)
+
+
+def test_full_run_checkpoints_and_resumes(tmp_path):
+    calls = []
+    state = build_pipeline(tmp_path, calls).run({'x': 1})
+    assert calls == ['load', 'plots', 'upload'] and state['uploaded'] == 3
+
+    calls.clear()
+    state = build_pipeline(tmp_path, calls).run({'x': 1}, resume=True)
+    assert calls == [] and state['uploaded'] == 3
+
+
+def test_from_stage_reruns_prerequisites_without_checkpoint(tmp_path):
+    calls = []
+    build_pipeline(tmp_path, calls).run({'x': 1})
+
+    calls.clear()
+    state = build_pipeline(tmp_path, calls).run({'x': 1}, from_stage='upload')
+
+    assert calls == ['plots', 'upload']
+    assert state['uploaded'] == 3
+
+
+def test_changed_settings_invalidate_checkpoints(tmp_path):
+    build_pipeline(tmp_path, []).run({'x': 1})
+
+    with pytest.raises(FileNotFoundError):
+        build_pipeline(tmp_path, [], settings_hash='other').run({'x': 1}, from_stage='upload')
+
+    build_pipeline(tmp_path, [], settings_hash='other').run({'x': 1})
+    assert len(list(tmp_path.glob('load-*.pkl'))) == 1
+
+
+def test_unknown_stage_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        build_pipeline(tmp_path, []).run({'x': 1}, from_stage='train')
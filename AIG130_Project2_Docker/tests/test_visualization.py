@@ -0,0 +1,29 @@
+"""Tests of the plot downsampling helpers"""
+import numpy as np
+import pytest
+
+from src.visualization import minmax_downsample
+
+
+@pytest.mark.parametrize('n_rows', [1999, 2000, 2001, 2999, 4001, 5020, 9999, 10000, 123457])
+def test_minmax_downsample_keeps_extremes_within_budget(n_rows):
+    values = np.random.default_rng(n_rows).normal(size=n_rows).cumsum()
+
+    positions = minmax_downsample(values, 2000)
+
+    assert len(positions) <= 2000
+    assert np.all(np.diff(positions) > 0)
+    assert positions[0] >= 0 and positions[-1] < n_rows
+    assert np.argmin(values) in positions
+    assert np.argmax(values) in positions
+
+
+def test_minmax_downsample_returns_every_position_when_series_fits():
+    np.testing.assert_array_equal(minmax_downsample(np.arange(10.0), 2000), np.arange(10))
+
+
+def test_minmax_downsample_keeps_a_spike_in_the_last_partial_bucket():
+    values = np.zeros(5020)
+    values[-1] = 100.0
+
+    assert 5019 in minmax_downsample(values, 2000)